@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Fioddor Superconcentrado
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Purpose: Throughput and memory benchmarks of the fetch pipeline.
+# Usage..: ./bench_taiga.py --sizes 1000 10000 100000 --output after.json --compare before.json
+#
+# Design.: - Synthetic projects (taiga_datagen.py) are served by a local stand-in (taiga_standin.py),
+#            so that the network and the real service don't blur the results.
+#          - Each scenario runs in a fresh (spawned) process, so that its peak RSS is its own.
+#          - Best of --repeat runs is kept.
+#          - Results are saved as JSON for later runs to --compare with.
+#
+# Scenarios: rq       : TaigaMinClient.rq of the project's tasks.
+#            proj     : TaigaMinClient.proj of the whole project.
+#            fetch    : Taiga.fetch of the project's tasks (which calls the metadata_* functions).
+#            metadata : Taiga.metadata_category and metadata_updated_on of the project's tasks.
+#            lines    : Taiga.fetch of the project's tasks written as JSON lines (as --json-line does).
+#            raw      : Taiga.fetch_raw of the project's tasks (as --raw does).
+#            --decoders times each available JSON decoder (TaigaMinClient.DECODERS) on pages of tasks,
+#            and TaigaMinClient.split_items on the same pages (which decodes each item too).
+#            --analytics times the lead time, cycle time and burndown of taiga_analytics.py against
+#            the same computations looping over the items, for projects of each --analytics-sizes (in
+#            user stories).
+#----------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+from perceval.backends.core.taiga import Taiga , TaigaMinClient
+
+from taiga_analytics import DAY , TaigaAnalytics
+from taiga_columns import TaigaColumns
+from taiga_datagen import TaigaDataGen
+from taiga_standin import TaigaStandIn
+
+
+SCENARIOS = ( 'rq' , 'proj' , 'fetch' , 'metadata' , 'lines' , 'raw' )
+PROJECT   = 1
+
+
+def project_sizes(size):
+    '''Returns the items of each category of a benchmark project of the given size (in tasks).'''
+    return { 'tasks': size , 'userstories': size // 5 , 'epics': size // 100 , 'wiki': max( 1 , size // 1000 ) }
+
+
+def peak_rss():
+    '''Returns the peak resident set size of this process in MB.'''
+    peak = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+    return peak / 2**20 if 'darwin' == sys.platform else peak / 2**10     # bytes in macOS, KB elsewhere.
+
+
+def measure(scenario , url , project=PROJECT):
+    '''Runs a scenario against a Taiga API. Returns its measures.
+
+    :returns: a dict with the items got, the seconds it took, the seconds until the first item was
+              available (None for the scenarios that get them all at once) and the peak RSS of the
+              process (MB).
+    '''
+    started = time.perf_counter()
+    first   = None
+    count   = 0
+
+    if 'rq' == scenario:
+        count = len( TaigaMinClient( url=url , token='a_token' ).rq( 'tasks?project={}'.format( project ) ) )
+    elif 'proj' == scenario:
+        data  = TaigaMinClient( url=url , token='a_token' ).proj( project )
+        count = sum( len(value) if isinstance( value , list ) else 1 for value in data.values() )
+    elif 'fetch' == scenario:
+        for item in Taiga( str(project) , url=url , api_token='a_token' ).fetch( category='tasks' ):
+            if first is None:
+                first = time.perf_counter() - started
+            count += 1
+    elif 'metadata' == scenario:
+        items   = TaigaMinClient( url=url , token='a_token' ).rq( 'tasks?project={}'.format( project ) )
+        started = time.perf_counter()
+        for item in items:
+            Taiga.metadata_category( item )
+            Taiga.metadata_updated_on( item )
+        count = len(items)
+    elif scenario in ( 'lines' , 'raw' ):
+        backend = Taiga( str(project) , url=url , api_token='a_token' )
+        lines   = backend.fetch_raw( 'tasks' ) if 'raw' == scenario else ( json.dumps( item , sort_keys=True ) for item in backend.fetch( category='tasks' ) )
+        for line in lines:
+            if first is None:
+                first = time.perf_counter() - started
+            count += 1
+    else:
+        raise ValueError( 'Unknown scenario: {}'.format( scenario ) )
+
+    seconds = time.perf_counter() - started
+    return { 'items'              : count
+           , 'seconds'            : seconds
+           , 'time_to_first_item' : first
+           , 'peak_rss_mb'        : peak_rss()
+           }
+
+
+def spawned(scenario , url , queue):
+    '''Runs measure in a child process and puts its measures (or its exception) in the queue.'''
+    try:
+        queue.put( measure( scenario , url ) )
+    except Exception as e:
+        queue.put( e )
+
+
+def run(scenario , url):
+    '''Runs measure in a fresh process. Returns its measures.'''
+    context = multiprocessing.get_context( 'spawn' )
+    queue   = context.Queue()
+    child   = context.Process( target=spawned , args=( scenario , url , queue ) )
+    child.start()
+    result = queue.get()
+    child.join()
+    if isinstance( result , Exception ):
+        raise result
+    return result
+
+
+def benchmark(sizes , scenarios=SCENARIOS , repeat=3 , per_page=30 , seed=1 , isolated=True):
+    '''Runs the scenarios for projects of each size. Returns a list of results.
+
+    :param: isolated: run each scenario in a fresh process. Otherwise peak RSS is the one of this process.
+    '''
+    generator = TaigaDataGen( seed=seed )
+    results   = []
+    for size in sizes:
+        server = TaigaStandIn( { str(PROJECT): generator.project( PROJECT , **project_sizes( size ) ) } , per_page=per_page )
+        url    = server.start()
+        try:
+            for scenario in scenarios:
+                best = None
+                for n in range( repeat ):
+                    served = server.served
+                    result = run( scenario , url ) if isolated else measure( scenario , url )
+                    # metadata times no request:
+                    result['requests'] = 0 if 'metadata' == scenario else server.served - served
+                    if best is None or result['seconds'] < best['seconds']:
+                        best = result
+                best.update( scenario=scenario , size=size
+                           , items_per_s    = best['items']    / best['seconds'] if best['seconds'] else None
+                           , requests_per_s = best['requests'] / best['seconds'] if best['seconds'] else None
+                           )
+                results.append( best )
+        finally:
+            server.stop()
+    return results
+
+
+def decoders(per_page=30 , pages=100 , repeat=3 , seed=1):
+    '''Times the JSON decoders and split_items on pages of tasks. Returns a list of results.'''
+    items = TaigaDataGen( seed=seed ).project( PROJECT , tasks=per_page * pages )['tasks']
+    # as the stand-in serves them:
+    bodies = [ json.dumps( items[ n : n + per_page ] ).encode( 'utf-8' ) for n in range( 0 , len(items) , per_page ) ]
+    
+    results = []
+    splitting = lambda body: list( TaigaMinClient.split_items( body.decode( 'utf-8' ) ) )
+    for name , decode in sorted( TaigaMinClient.DECODERS.items() ) + [ ( 'split_items' , splitting ) ]:
+        best = None
+        for n in range( repeat ):
+            started = time.perf_counter()
+            for body in bodies:
+                decode( body )
+            seconds = time.perf_counter() - started
+            best = seconds if best is None else min( best , seconds )
+        results.append( { 'decoder'     : name
+                        , 'pages'       : len(bodies)
+                        , 'page_bytes'  : sum( len(body) for body in bodies ) / len(bodies)
+                        , 'ms_per_page' : 1000 * best / len(bodies)
+                        } )
+    return results
+
+
+def looping(stories , tasks):
+    '''Computes lead times, cycle times and burndowns (as TaigaAnalytics does) looping over the items.
+
+    :param: stories , tasks: lists of dicts with the values of the columns of each item.
+    '''
+    MISSING = TaigaColumns.MISSING
+    started = {}
+    for task in tasks:
+        if MISSING != task['user_story']:
+            started[ task['user_story'] ] = min( started.get( task['user_story'] , task['created_date'] ) , task['created_date'] )
+
+    lead , cycle , sprints = [] , [] , {}
+    for story in stories:
+        done = MISSING != story['finish_date']
+        lead.append( story['finish_date'] - story['created_date'] if done else math.nan )
+        cycle.append( story['finish_date'] - started[ story['id'] ] if done and story['id'] in started else math.nan )
+        if MISSING != story['milestone']:
+            sprints.setdefault( story['milestone'] , [] ).append( story )
+
+    burndowns = {}
+    for milestone , members in sprints.items():
+        start  = min( story['created_date'] for story in members )
+        points = [ ( 0 if math.isnan( story['total_points'] ) else story['total_points'] , story['finish_date'] ) for story in members ]
+        days   = max( [ 0 ] + [ math.ceil( (finish - start) / DAY ) for value , finish in points if MISSING != finish ] )
+        burndowns[ milestone ] = [ sum( value for value , finish in points if MISSING == finish or start + day * DAY < finish )
+                                   for day in range( days + 1 ) ]
+    return lead , cycle , burndowns
+
+
+def analytics(sizes , projects=10 , repeat=3 , seed=1):
+    '''Times TaigaAnalytics and looping for projects of each size. Returns a list of results.
+
+    :param: sizes: user stories of each project (with 3 tasks each, and 10 sprints).
+    '''
+    generator = TaigaDataGen( seed=seed )
+    results   = []
+    for size in sizes:
+        stories , tasks = [] , []
+        for project in range( 1 , projects + 1 ):
+            data = generator.project( project , userstories=size , tasks=3 * size )
+            for n , story in enumerate( data['userstories'] ):
+                story['milestone'] = project * 100 + n % 10
+            stories.extend( data['userstories'] )
+            tasks.extend( data['tasks'] )
+
+        with tempfile.TemporaryDirectory() as folder:
+            TaigaColumns.export( stories , 'userstories' , folder )
+            TaigaColumns.export( tasks , 'tasks' , folder )
+            columns = { category: TaigaColumns.load( folder , category ) for category in ( 'userstories' , 'tasks' ) }
+            rows    = { category: [ dict( zip( values , row ) ) for row in zip( *( column.tolist() for column in values.values() ) ) ]
+                        for category , values in columns.items() }
+
+            best = {}
+            for n in range( repeat ):
+                started = time.perf_counter()
+                computed = TaigaAnalytics( columns['userstories'] , columns['tasks'] )
+                computed.per_project( computed.lead_times() )
+                computed.per_project( computed.cycle_times() )
+                computed.burndown()
+                vectorised = time.perf_counter() - started
+
+                started = time.perf_counter()
+                looping( rows['userstories'] , rows['tasks'] )
+                looped = time.perf_counter() - started
+                best = { 'vectorised': min( vectorised , best.get( 'vectorised' , vectorised ) )
+                       , 'looping'   : min( looped     , best.get( 'looping'    , looped ) )
+                       }
+        results.append( { 'size'               : size
+                        , 'projects'           : projects
+                        , 'userstories'        : len(stories)
+                        , 'tasks'              : len(tasks)
+                        , 'vectorised_seconds' : best['vectorised']
+                        , 'looping_seconds'    : best['looping']
+                        , 'speedup'            : best['looping'] / best['vectorised'] if best['vectorised'] else None
+                        } )
+    return results
+
+
+def compare(results , previous):
+    '''Returns lines comparing the items/s of results with those of previous ones.'''
+    before = { ( r['scenario'] , r['size'] ): r for r in previous }
+    lines  = []
+    for r in results:
+        old = before.get( ( r['scenario'] , r['size'] ) )
+        if old and old['items_per_s'] and r['items_per_s']:
+            lines.append( '{:>9} {:>8}: {:>12.0f} items/s ({:+.1%}), {:>8.1f} MB ({:+.1f})'.format(
+                          r['scenario'] , r['size'] , r['items_per_s'] , r['items_per_s'] / old['items_per_s'] - 1
+                          , r['peak_rss_mb'] , r['peak_rss_mb'] - old['peak_rss_mb'] ) )
+    return lines
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Benchmarks the Taiga fetch pipeline against a local stand-in server.' )
+    parser.add_argument( '--sizes'     , type=int , nargs='+' , default=[ 1000 , 10000 , 100000 ] , help='tasks per project.' )
+    parser.add_argument( '--scenarios' , nargs='+' , choices=SCENARIOS , default=list( SCENARIOS ) )
+    parser.add_argument( '--repeat'    , type=int , default=3 )
+    parser.add_argument( '--per-page'  , type=int , default=30 )
+    parser.add_argument( '--seed'      , type=int , default=1 )
+    parser.add_argument( '--output'    , default='bench_taiga.json' )
+    parser.add_argument( '--compare'   , help='JSON file of a previous run.' )
+    parser.add_argument( '--decoders'  , action='store_true' , help='also time the JSON decoders per page.' )
+    parser.add_argument( '--analytics' , action='store_true' , help='also time taiga_analytics.py.' )
+    parser.add_argument( '--analytics-sizes' , type=int , nargs='+' , default=[ 1000 , 10000 , 100000 ] , help='user stories per project for --analytics.' )
+    parser.add_argument( '--projects'  , type=int , default=10 , help='projects for --analytics.' )
+    args = parser.parse_args()
+
+    results = benchmark( args.sizes , args.scenarios , args.repeat , args.per_page , args.seed )
+    decoding = decoders( args.per_page , repeat=args.repeat , seed=args.seed ) if args.decoders else []
+    flows    = analytics( args.analytics_sizes , args.projects , args.repeat , args.seed ) if args.analytics else []
+
+    for r in results:
+        first = 'n/a' if r['time_to_first_item'] is None else '{:.3f}'.format( r['time_to_first_item'] )
+        print( '{scenario:>9} {size:>8}: {items_per_s:>12.0f} items/s {requests_per_s:>8.1f} rq/s'
+               ' {first:>8} s to 1st item {peak_rss_mb:>8.1f} MB peak RSS'.format( first=first , **r ) )
+
+    for r in decoding:
+        print( '{decoder:>11}: {ms_per_page:>8.3f} ms per page of {page_bytes:.0f} bytes'.format( **r ) )
+
+    for r in flows:
+        print( '{userstories:>9} stories, {tasks:>9} tasks: {vectorised_seconds:>8.3f} s vectorised'
+               ' {looping_seconds:>8.3f} s looping (x{speedup:.1f})'.format( **r ) )
+
+    if args.compare:
+        with open( args.compare ) as f:
+            print( '\n'.join( [ 'Compared to {}:'.format( args.compare ) ] + compare( results , json.load( f )['results'] ) ) )
+
+    with open( args.output , 'w' ) as f:
+        json.dump( { 'python'   : platform.python_version()
+                   , 'platform' : platform.platform()
+                   , 'date'     : time.strftime( '%Y-%m-%dT%H:%M:%S' )
+                   , 'per_page' : args.per_page
+                   , 'seed'     : args.seed
+                   , 'results'  : results
+                   , 'decoders' : decoding
+                   , 'analytics': flows
+                   } , f , indent=2 )
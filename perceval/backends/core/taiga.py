@@ -23,20 +23,218 @@
 #----------------------------------------------------------------------------------------------------------------------
 
 import requests
+import queue
+import threading
 import time
+import base64, json, os, re, tempfile
+import cProfile, pstats, tracemalloc
+from bisect import bisect_left
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler , ThreadingHTTPServer
 from math import ceil
 
+try:
+    import orjson                                   # optional, for faster JSON decoding.
+except ImportError:
+    orjson = None
+
 import logging
-logging.basicConfig( level=logging.INFO ) #DEBUG )
 logger = logging.getLogger(__name__)
 
+from grimoirelab_toolkit.introspect import find_signature_parameters
 from grimoirelab_toolkit.datetime import ( datetime_to_utc
                                          , datetime_utcnow
                                          , str_to_datetime
                                          , unixtime_to_datetime
                                          )
 
-from ...backend import (Backend , BackendCommand , BackendCommandArgumentParser , OriginUniqueField )
+from ...backend import (Backend , BackendCommand , BackendCommandArgumentParser , OriginUniqueField , uuid )
+from ..._version import __version__ as perceval_version
+
+
+
+class TaigaProgress():
+    '''Reports the progress of paginated requests, at most once every interval seconds.
+    
+    Reports are dicts with: url      : the request's first page.
+                            done     : items retrieved so far.
+                            total    : items to retrieve (as of x-pagination-count and max_page).
+                            elapsed  : seconds since the request started.
+                            rate     : items per second.
+                            eta      : estimated seconds to complete (None while unknown).
+    The last page of each request is always reported.
+    '''
+    
+    
+    def __init__(self, callback=None , interval=10 , clock=None):
+        '''Init progress.
+        
+        :param: callback: callable receiving each report. Logs it (INFO) if missing.
+        :param: interval: minimum seconds between reports.
+        :param: clock: time source (seconds). time.monotonic by default. Should be the one of the
+                       clients reporting here.
+        '''
+        self.callback    = callback or self.log
+        self.interval    = interval
+        self.clock       = clock or time.monotonic
+        self.last_report = None
+        self.lock        = threading.Lock()
+    
+    
+    @staticmethod
+    def log(report):
+        '''Default callback.'''
+        logger.info( '%s: %d items out of %d (%.1f items/s, ETA %s s).'
+                   , report['url'] , report['done'] , report['total'] , report['rate']
+                   , '?' if report['eta'] is None else '{:.0f}'.format( report['eta'] )
+                   )
+    
+    
+    def update(self, url , done , total , started):
+        '''Reports, unless another report happened less than interval seconds ago.
+        
+        :param: started: clock time when the request started.
+        '''
+        now = self.clock()
+        with self.lock:
+            if done < total and self.last_report is not None and now - self.last_report < self.interval:
+                return
+            self.last_report = now
+        
+        elapsed = now - started
+        rate    = done / elapsed if 0 < elapsed else 0.0
+        self.callback( { 'url'     : url
+                       , 'done'    : done
+                       , 'total'   : total
+                       , 'elapsed' : elapsed
+                       , 'rate'    : rate
+                       , 'eta'     : (total - done) / rate if 0 < rate else None
+                       } )
+
+
+
+class TaigaSingleFlight():
+    '''Coalesces concurrent identical calls.
+    
+    The first caller for a key (the leader) runs the call. Callers arriving with the same key
+    while it's in flight wait for it and get the same result (or exception). Calls arriving
+    after it has landed start a new flight.
+    '''
+    
+    
+    def __init__(self):
+        '''Init with no flights.'''
+        self.lock    = threading.Lock()
+        self.flights = {}
+    
+    
+    def do(self, key , call):
+        '''Returns call's result, sharing it with concurrent callers of the same key.
+        
+        :param: key: a hashable identifying the call.
+        :param: call: callable without arguments.
+        '''
+        with self.lock:
+            flight = self.flights.get( key )
+            leader = flight is None
+            if leader:
+                flight = { 'landed': threading.Event() , 'result': None , 'error': None }
+                self.flights[ key ] = flight
+        
+        if leader:
+            try:
+                flight['result'] = call()
+            except Exception as e:
+                flight['error'] = e
+            finally:
+                with self.lock:
+                    del self.flights[ key ]
+                flight['landed'].set()
+        else:
+            flight['landed'].wait()
+        
+        if flight['error']:
+            raise flight['error']
+        return flight['result']
+
+
+
+class TaigaPrefetcher():
+    '''Iterates over pages fetched by a background thread, a bounded number of pages ahead.
+    
+    Usage..: for page in TaigaPrefetcher( tc.pages( query ) , size=4 ): ...
+    
+    Design.: - The producer thread runs the given generator of pages and queues them. It blocks
+               while size pages wait in the queue (backpressure). Thus, at most size + 2 pages
+               are held at once: the queued ones, the one being fetched and the one being consumed.
+             - Exceptions raised by the generator are raised to the consumer, after the pages
+               queued before them.
+             - Consumers stopping early (closing or dropping the iteration) stop the producer
+               before its next page.
+    '''
+    
+    DONE = object()                              # end of pages mark.
+    POLL = 0.1                                   # seconds between checks for a stopped consumer while the queue is full.
+    
+    
+    def __init__(self, pages , size=2):
+        '''Starts producing.
+        
+        :param: pages: iterable of pages (e.g. TaigaMinClient.pages).
+        :param: size: maximum number of pages to fetch ahead of the consumer.
+        '''
+        if size < 1:
+            raise UsageError( 'A TaigaPrefetcher needs room for at least one page, not {}.'.format( size ) )
+        
+        self.pages   = pages
+        self.queue   = queue.Queue( maxsize=size )
+        self.stopped = threading.Event()
+        self.thread  = threading.Thread( target=self.__produce__ , name='taiga-prefetch' , daemon=True )
+        self.thread.start()
+    
+    
+    def __produce__(self):
+        '''Queues the pages, then the end mark with the exception that ended them (if any).'''
+        error = None
+        try:
+            for page in self.pages:
+                if not self.__put__( page ):
+                    break
+        except Exception as e:
+            error = e
+        finally:
+            if hasattr( self.pages , 'close' ):
+                self.pages.close()
+        self.__put__( self.DONE , error )
+    
+    
+    def __put__(self, page , error=None):
+        '''Queues a page, waiting while the queue is full. Returns False if the consumer has stopped.'''
+        while not self.stopped.is_set():
+            try:
+                self.queue.put( ( page , error ) , timeout=self.POLL )
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    
+    def __iter__(self):
+        try:
+            while True:
+                page , error = self.queue.get()
+                if error:
+                    raise error
+                if page is self.DONE:
+                    return
+                yield page
+        finally:
+            self.close()
+    
+    
+    def close(self):
+        '''Stops the producer (before its next page).'''
+        self.stopped.set()
 
 
 
@@ -53,6 +251,31 @@ class TaigaMinClient(): #HttpClient):
                - Signal server to close HTTP session.
                  See https://stackoverflow.com/questions/10115126/python-requests-close-http-connection#15511852
     
+             - Tokens expire. User&pswd-born clients login again (once) when the API rejects their token
+               and transparently retry the rejected request. Token-born clients can't.
+             - User&pswd-born clients with a token cache reuse the token of previous processes
+               instead of logging in at every start-up.
+             - Taiga throttles each token separately. Clients born with a list of tokens spread
+               their requests across them (see TaigaTokenPool). A throttled request is retried once
+               after waiting what the API said or, with a pool, with the next available token until
+               one gets through or every token was throttled (the last retry then waits as well).
+               Thus a pool never fails a request a single token would finish.
+             - Clients born with single_flight share concurrent identical requests (same url, tokens,
+               transport and result shaping settings) in the same process, even from different
+               clients: a single request and its decoded result (see TaigaSingleFlight). Thus, their
+               callers shouldn't modify the nested objects they get. The callers that waited count
+               as shared (not as requests) and fire the hooks of the request when it lands.
+             - All clients of the same Taiga instance share a circuit breaker, so that they fail
+               fast while it's down (see TaigaCircuitBreaker). The first one's failure_threshold,
+               cool_down and clock rule for all of them.
+             - Clients count what they do by endpoint category (see TaigaClientMetrics). Several
+               clients may share the same metrics.
+             - Tracing and profiling tools can hook into the lifecycle of requests (see add_hook).
+               Without hooks, firing them costs a single truth test.
+             - Progress of paginated requests is reported through an optional TaigaProgress.
+             - Raw pages (see pages) are left undecoded, for callers that pass items through as
+               they came. split_items finds their items' text (decoding them on the way).
+    
     Pending: - We don't yet see a compelling reason to implement application-token authentication.
              - In our reference Taiga instance (taiga.io) project export needs special permissions we don't have.
     '''
@@ -62,9 +285,25 @@ class TaigaMinClient(): #HttpClient):
     H_STANDARD_BASE = { 'Content-Type': 'application/json'
                       ,   'Connection': 'close'
                       }
+    FLIGHTS = TaigaSingleFlight()                   # shared by all clients in the process.
+    
+    HOOK_EVENTS = ( 'request' , 'headers' , 'decoded' , 'throttle' , 'retry' )
+    
+    # JSON decoders by name. They take the response bytes as they are (the stdlib one guesses
+    # their encoding and decodes them to str first, orjson parses them straight away):
+    DECODERS = { 'json': json.loads }
+    if orjson:
+        DECODERS['orjson'] = orjson.loads
+    DEFAULT_DECODER = 'orjson' if orjson else 'json'
+    
+    # to split raw pages into their items (see split_items):
+    RAW_DECODER = json.JSONDecoder()
+    RAW_SKIP    = re.compile( r'[\s,]*' )
     
     token   = None
     headers = None
+    pool    = None
+    scope   = None
     
     
     def censor(self, uncensored ):
@@ -80,6 +319,15 @@ class TaigaMinClient(): #HttpClient):
         self.headers = self.H_STANDARD_BASE.copy()
         self.headers['Authorization'] = 'Bearer ' + self.token
         
+        if self.pool:
+            self.pool_headers = {}
+            for token in self.pool.tokens:
+                self.pool_headers[ token ] = self.H_STANDARD_BASE.copy()
+                self.pool_headers[ token ]['Authorization'] = 'Bearer ' + token
+            self.scope = tuple( self.pool.tokens )
+        else:
+            self.scope = self.token
+        
         logger.debug( self.ME+'.set_headers as ' + str(self.headers) )
     
     
@@ -89,13 +337,48 @@ class TaigaMinClient(): #HttpClient):
                 , sleep_time=1, max_retries=5
                 , extra_retry_after_status=[500 , 502]
                 , archive=False, from_archive=None
+                , token_cache=None
+                , token_rate=None
+                , single_flight=False
+                , failure_threshold=5, cool_down=30
+                , metrics=None
+                , progress=None
+                , clock=None, sleeper=None
+                , transport=None
+                , records=False
+                , flyweight=None
+                , projection=None
+                , decoder=None
                 ):
         '''Init client.
         
         :param:   url: url of the Taiga instance. Mandatory.
-        :param: token: API token for client authentication.
+        :param: token: API token for client authentication. Or a list of them to be pooled.
         :param:  user: API user to be used along with pswd to get a token.
         :param:  pswd: API pswd to be used along with user to get a token.
+        :param: token_cache: optional TaigaTokenCache for login to reuse tokens across processes.
+        :param: token_rate: optional maximum number of requests per second for each pooled token.
+        :param: single_flight: share in-flight identical requests with other callers in the process
+                               (of clients with the same settings and single_flight too).
+        :param: failure_threshold: consecutive failures (5xx replies or connection errors) that
+                                   open the instance's circuit breaker.
+        :param: cool_down: seconds an open circuit breaker waits before letting a probe through.
+        These two only apply if this is the first client of the instance in the process.
+        :param: metrics: optional TaigaClientMetrics to count into. A new one by default.
+        :param: progress: optional TaigaProgress to report the progress of paginated requests to.
+        :param: clock: time source (seconds) for waits and timings. time.monotonic by default.
+        :param: sleeper: function waiting the given seconds. time.sleep by default.
+        These two let simulations run throttled crawls without actually waiting (see taiga_sim.py).
+        :param: transport: sends the requests. Anything with the get and post functions of requests
+                           (e.g. a requests.Session, or a TaigaCassette to replay recorded responses).
+                           The requests module by default.
+        :param: records: rq returns the items of list categories as compact TaigaRecords instead
+                         of dicts.
+        :param: flyweight: a TaigaFlyweight to share the equal nested values of items with (e.g.
+                           across the clients of a crawl), or True for one of this client's own.
+        :param: projection: a TaigaProjection of the fields to keep from the items of each category.
+        :param: decoder: name of the JSON decoder (one of DECODERS) or a function decoding bytes.
+                         The fastest one installed by default.
         If all optional parameters are missing raises Exception.
         If all optional parameters are provided token is taken while user and pswd
         are ignored.
@@ -108,11 +391,38 @@ class TaigaMinClient(): #HttpClient):
         
         ME = self.ME + '.__init__'
         
+        self.auth_lock     = threading.Lock()
+        self.token_cache   = token_cache
+        self.single_flight = single_flight
+        self.metrics       = metrics or TaigaClientMetrics()
+        self.hooks         = {}
+        self.progress      = progress
+        self.clock         = clock   or time.monotonic
+        self.sleeper       = sleeper or time.sleep
+        self.transport     = transport or requests
+        self.records       = records
+        self.flyweight     = TaigaFlyweight() if flyweight is True else flyweight
+        self.projection    = projection
+        if decoder is None or decoder in self.DECODERS:
+            self.decoder = self.DECODERS[ decoder or self.DEFAULT_DECODER ]
+        elif callable( decoder ):
+            self.decoder = decoder
+        else:
+            raise UsageError( 'Unknown JSON decoder {}. Expected one of {}.'.format( decoder , sorted( self.DECODERS ) ) )
+        # results of clients with different settings can't be shared:
+        self.shape         = ( self.transport , self.decoder , self.flyweight , records
+                             , projection.key() if projection else None
+                             )
+        
         if not url:
             raise Missing_Init_Arguments( 'url (Taiga API base URL).')
         self.base_url = url
+        self.breaker  = TaigaCircuitBreaker.for_url( url , failure_threshold , cool_down , self.clock )
         
         if token:
+            if isinstance( token , (list , tuple) ):
+                self.pool = TaigaTokenPool( token , 1 / token_rate if token_rate else 0 , self.clock , self.sleeper )
+                token     = token[0]
             self.token = token
             self.__set_headers__()
             logger.debug( ME+'( ' + self.censor(self.token) + ' ).' ) 
@@ -124,13 +434,49 @@ class TaigaMinClient(): #HttpClient):
             raise Missing_Init_Arguments( 'either API token or Taiga user and pswd.' )
         
     
+    def add_hook(self, event , hook):
+        '''Registers a hook to be called on the given event of every request.
+        
+        Events..: request  : right before sending a request.             Timing: -
+                  headers  : when the response's headers have arrived,   Timing: wait (for its headers), status
+                             before its body is read.
+                  decoded  : when rq has decoded a page of results.      Timing: decode, items
+                  throttle : when waiting for throttling.                Timing: sleep
+                  retry    : right before repeating a rejected request.  Timing: status
+        
+        :param: event: one of HOOK_EVENTS.
+        :param: hook: callable receiving the url and a dict with timing data (in seconds).
+                      Hooks run in the requesting thread. They shouldn't raise.
+        '''
+        if event not in self.HOOK_EVENTS:
+            raise UsageError( 'Unknown hook event {}. Expected one of {}.'.format( event , self.HOOK_EVENTS ) )
+        self.hooks.setdefault( event , [] ).append( hook )
+    
+    
+    def remove_hook(self, event , hook):
+        '''Unregisters a hook.'''
+        self.hooks[ event ].remove( hook )
+        if not self.hooks[ event ]:
+            del self.hooks[ event ]
+    
+    
+    def __fire__(self, event , url , timing):
+        '''Calls the hooks of the event. Guard calls with 'if self.hooks' to keep them cheap.'''
+        for hook in self.hooks.get( event , () ):
+            hook( url , timing )
+    
+    
     def get_token(self):
         '''Returns session token for reuse.'''
         return self.token
      
      
-    def login(self):
-        '''Gets session token from API and (re)sets session headers accordingly.'''
+    def login(self, cached=True):
+        '''Gets session token from API and (re)sets session headers accordingly.
+        
+        :param: cached: if the client has a token cache, take the token from it when available.
+                        False forces a new token from the API (which is then cached).
+        '''
         
         TEMPLATE = '"type": "normal", "username": "{}", "password": "{}"'
         
@@ -138,14 +484,25 @@ class TaigaMinClient(): #HttpClient):
             data_str = '{ ' + TEMPLATE.format( self.user , self.pswd ) + ' }'
         except AttributeError:
             raise Login_Lacks_Credentials
+        
+        if cached and self.token_cache:
+            token = self.token_cache.get( self.base_url , self.user )
+            if token:
+                logger.debug( self.ME + '.login reuses a cached token.' )
+                self.token = token
+                self.__set_headers__()
+                return
+        
         data_ba = bytearray( data_str , encoding='utf-8' )
         
-        rs = requests.post( self.base_url+'auth' , data=data_ba , headers=self.H_STANDARD_BASE )
+        rs = self.__send__( 'post' , self.base_url+'auth' , data=data_ba , headers=self.H_STANDARD_BASE )
         rs.close()
         
         if 200 == rs.status_code:
-            self.token = rs.json()['auth_token']
+            self.token = self.decode( rs )['auth_token']
             self.__set_headers__()
+            if self.token_cache:
+                self.token_cache.put( self.base_url , self.user , self.token )
         else:
             censored = str(rs.request.body).replace(self.pswd , self.censor(self.pswd))
             
@@ -158,6 +515,110 @@ class TaigaMinClient(): #HttpClient):
             raise Exception( ME + 'failed. Check the log!' )
     
     
+    def __refresh_token__(self, stale):
+        '''Logs in again after the API rejected the token sent within the given headers.
+        
+        Concurrent requests rejected with the same token share a single login: the first one
+        to get the lock logs in and the rest just reuse the fresh headers.
+        :param: stale: the headers sent along with the rejected request.
+        :returns: True if there's a fresh token worth a retry. False for token-born clients.
+        '''
+        if not getattr( self , 'pswd' , None ):
+            return False
+        
+        with self.auth_lock:
+            if self.headers is stale:
+                logger.info( self.ME + '.refresh_token: token rejected. Logging in again.' )
+                self.login( cached=False )
+        
+        return True
+    
+    
+    def __send__(self, method , url , **kwargs):
+        '''Sends a request through the instance's circuit breaker.
+        
+        :param: method: 'get' or 'post'.
+        :returns: the requests response. Raises Circuit_Open if the breaker doesn't let it through.
+        '''
+        category = self.endpoint_category( url )
+        if self.hooks:
+            self.__fire__( 'request' , url , {} )
+        
+        # between allow and its outcome nothing but the request may raise. Otherwise a probe
+        # request would leave the breaker half open for good. Thus, hooks' errors are kept aside:
+        self.breaker.allow()
+        started  = self.clock()
+        hook_error = None
+        self.metrics.count( category , in_flight=1 )
+        try:
+            # stream, so that the headers arrive before the body is read:
+            response = getattr( self.transport , method )( url , stream=True , **kwargs )
+            wait     = self.clock() - started
+            if self.hooks:
+                try:
+                    self.__fire__( 'headers' , url , { 'wait': wait , 'status': response.status_code } )
+                except Exception as e:
+                    hook_error = e
+            size = 0 if hook_error else len(response.content)
+        except (requests.exceptions.ConnectionError , requests.exceptions.Timeout):
+            self.breaker.failure()
+            self.metrics.count( category , errors=1 )
+            raise
+        except BaseException:
+            # e.g. a broken body (ChunkedEncodingError) or a failing transport:
+            self.breaker.failure()
+            raise
+        finally:
+            self.metrics.count( category , in_flight=-1 )
+        
+        if 500 <= response.status_code:
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+        
+        if hook_error:
+            response.close()
+            raise hook_error
+        
+        self.metrics.count( category , requests=1 , bytes=size )
+        self.metrics.latency( category , self.clock() - started )
+        
+        return response
+    
+    
+    def __acquire_token__(self, url , category):
+        '''Returns the pooled token for the next request (None if not pooled), counting the wait.'''
+        if not self.pool:
+            return None
+        
+        started = self.clock()
+        token   = self.pool.acquire()
+        waited  = self.clock() - started
+        if 0.001 < waited:
+            self.metrics.count( category , sleep_seconds=waited )
+            if self.hooks:
+                self.__fire__( 'throttle' , url , { 'sleep': waited } )
+        
+        return token
+    
+    
+    def endpoint_category(self, url):
+        '''Returns the endpoint category of a url (as in Taiga.TAIGA_MAP when mapped there).
+        
+        E.g.: projects/{id} is 'basics', projects/{id}/stats is 'stats', tasks?project={id}&page=2
+        is 'tasks' and auth is 'auth'.
+        '''
+        if url.startswith( self.base_url ):
+            url = url[ len(self.base_url): ]
+        parts = url.split( '?' )[0].strip( '/' ).split( '/' )
+        
+        if 'projects' == parts[0] and 2 == len(parts):
+            return 'basics'
+        if 'projects' == parts[0] and 3 == len(parts):
+            return parts[2]
+        return parts[0]
+    
+    
     def __http_get__(self, url , caller ):
         '''Wrap the request debugging and failure handling.
 
@@ -171,7 +632,8 @@ class TaigaMinClient(): #HttpClient):
                         the logger messages.
         :returns: an open requests response. The full object is returned
                   (whether successful or not) for further analysis. Only
-                  raises an exception if the client is not initiated.
+                  raises an exception if the client is not initiated, the
+                  connection fails or the instance's circuit is open.
         '''
         me = self.ME + caller
         
@@ -180,35 +642,108 @@ class TaigaMinClient(): #HttpClient):
         
         logger.debug(  '/ {}({})'.format( me , url ) )
         
-        response = requests.get( url , headers=self.headers )
+        category = self.endpoint_category( url )
+        
+        token    = self.__acquire_token__( url , category )
+        headers  = self.pool_headers[ token ] if token else self.headers
+        response = self.__send__( 'get' , url , headers=headers )
+        
+        if 401 == response.status_code and self.__refresh_token__( headers ):
+            response.close()
+            self.metrics.count( category , retries=1 )
+            if self.hooks:
+                self.__fire__( 'retry' , url , { 'status': 401 } )
+            headers  = self.headers               # the fresh token, for any later retry too.
+            response = self.__send__( 'get' , url , headers=headers )
         
-        if 429 == response.status_code:
-            words = response.json()['_error_message'].split()
+        # a single token retries once, after waiting. A pool retries with the next available token
+        # until every token was throttled once. By then, that means waiting too:
+        retries = len(self.pool.tokens) if token else 1
+        while 429 == response.status_code:
+            self.metrics.count( category , throttled=1 )
+            words = self.decode( response )['_error_message'].split()
             nums = [ int(w) for w in words if w.isdigit() ]
-            if 1 == len(nums):
-                delay = nums[0]
+            if 1 != len(nums) or not retries:
+                break
+            
+            delay    = nums[0]
+            retries -= 1
+            if token:
+                self.pool.throttled( token , delay )
+                token   = self.__acquire_token__( url , category )
+                headers = self.pool_headers[ token ]
+            else:
                 logger.info( 'Sleeping for {} seconds...'.format( delay ) )
-                time.sleep( delay )
-
-                response = requests.get( url , headers=self.headers )
+                if self.hooks:
+                    self.__fire__( 'throttle' , url , { 'sleep': delay } )
+                self.sleeper( delay )
+                self.metrics.count( category , sleep_seconds=delay )
+            
+            self.metrics.count( category , retries=1 )
+            if self.hooks:
+                self.__fire__( 'retry' , url , { 'status': 429 } )
+            response = self.__send__( 'get' , url , headers=headers )
         
         logger.debug( '\\ {}({})'.format( me , url ) )
         
         return response
     
     
+    def __coalesce__(self, kind , url , fetch):
+        '''Runs fetch or, if an identical request is already in flight, waits for its result.
+        
+        Callers that waited count as shared and fire the request's hooks when it lands.
+        
+        :param: kind: a (hashable) name of the kind of result fetch returns.
+        :param: url: URL to retrieve.
+        :param: fetch: callable retrieving the url. Returns a response and its page (or None).
+        :returns: whatever fetch returns (or raises).
+        '''
+        if not self.single_flight:
+            return fetch()
+        
+        led = []
+        def lead():
+            led.append( True )
+            return fetch()
+        
+        started = self.clock()
+        try:
+            response , page = self.FLIGHTS.do( (kind , url , self.scope , self.shape) , lead )
+        finally:
+            if not led:
+                self.metrics.count( self.endpoint_category( url ) , shared=1 )
+        
+        if not led and self.hooks:
+            self.__fire__( 'request' , url , {} )
+            self.__fire__( 'headers' , url , { 'wait': self.clock() - started , 'status': response.status_code } )
+            if 'page' == kind:
+                self.__fire__( 'decoded' , url , { 'decode': 0
+                                                 , 'items' : len(page) if isinstance( page , list ) else 1
+                                                 } )
+        return response , page
+    
+    
+    def decode(self, response):
+        '''Returns the decoded JSON body of a response, with the client's decoder.'''
+        return self.decoder( response.content )
+    
+    
     def basic_rq(self, query):
         '''Most basic exposed request handler.
          
         :returns: a closed requests response. The full object is returned
-                  (whether successful or not) for further analysis.
+                  (whether successful or not) for further analysis. Decode
+                  its body with decode.
         '''
-        api_command = self.base_url + query
+        def fetch():
+            response = self.__http_get__( api_command , '.basic_rq.' )
+            response.close()
+            return response , None
         
-        response = self.__http_get__( api_command , '.basic_rq.' )
-        response.close()
+        api_command = self.base_url + query
         
-        return response
+        return self.__coalesce__( 'response' , api_command , fetch )[0]
      
      
     def rq(self, query, max_page=None):
@@ -217,16 +752,75 @@ class TaigaMinClient(): #HttpClient):
         :param max_page: maximum number of page to request. All pages, if this argument is missing.
         :returns: a list of Taiga JSON objects. Raises exceptions if anything fails.
         '''
+        output = None
+        for page in self.pages( query , max_page ):
+            if output is None:
+                # pages might be shared with other callers. Thus, copy before extending:
+                output = list( page ) if isinstance( page , list ) else dict( page )
+            else:
+                output.extend( page )
+        return output
+     
+     
+    def pages(self, query, max_page=None , raw=False):
+        '''Page by page request handler.
+         
+        :param max_page: maximum number of page to request. All pages, if this argument is missing.
+        :param raw: yield the JSON text of each page instead of decoding it.
+        :returns: a generator of pages: a list of Taiga JSON objects each (or a single object for
+                  unpaginated answers). Pages might be shared with other callers: don't modify them.
+                  Raises exceptions if anything fails.
+        '''
         def get_page( url ):
-            response = self.__http_get__( url , '.rq.get_page' )
-            if 200 != response.status_code:
-                raise Unexpected_HTTPcode( url , response )
-            return response
+            def fetch():
+                response = self.__http_get__( url , '.rq.get_page' )
+                if 200 != response.status_code:
+                    self.metrics.http_error( self.endpoint_category( url ) , response.status_code )
+                    raise Unexpected_HTTPcode( url , response )
+                
+                if raw:
+                    return response , response.content.decode( 'utf-8' )
+                
+                started = self.clock()
+                page    = self.decode( response )
+                if self.projection:
+                    page = self.projection.page( self.endpoint_category( url ) , page )
+                if self.flyweight and isinstance( page , list ):
+                    page = [ self.flyweight.item( item ) for item in page ]
+                if self.records and isinstance( page , list ):
+                    record = TaigaRecord.for_category( self.endpoint_category( url ) )
+                    if record:
+                        page = [ record( item ) for item in page ]
+                if self.hooks:
+                    self.__fire__( 'decoded' , url , { 'decode': self.clock() - started
+                                                     , 'items' : len(page) if isinstance( page , list ) else 1
+                                                     } )
+                return response , page
+            return self.__coalesce__( 'raw' if raw else 'page' , url , fetch )
+        
+        def size( response , page ):
+            '''Returns the number of items in a page.'''
+            if not raw:
+                return len(page) if isinstance( page , list ) else 1
+            if 'x-pagination-count' not in response.headers:
+                return None                      # unknown until split (see split_items).
+            # Taiga's pages are full but the last one:
+            per_page = int(response.headers['x-paginated-by'])
+            return min( per_page , int(response.headers['x-pagination-count'])
+                                 - per_page * (int(response.headers['x-pagination-current']) - 1)
+                      )
         
         api_command = self.base_url + query
         
-        response = get_page( api_command )
-        output = response.json()
+        category = self.endpoint_category( api_command )
+        started  = self.clock()
+        
+        response , page = get_page( api_command )
+        done = size( response , page )
+        if done is None:
+            self.metrics.count( category , pages=1 )
+        else:
+            self.metrics.count( category , pages=1 , items=done )
         
         if all(key in response.headers for key in ( 'x-paginated' , 'x-pagination-count' , 'x-paginated-by' )):
             max_taiga = ceil( int(response.headers['x-pagination-count'])
@@ -237,18 +831,59 @@ class TaigaMinClient(): #HttpClient):
             else:
                 maximum = max_taiga
             
+            if self.progress:
+                total = min( int(response.headers['x-pagination-count'])
+                           , int(response.headers['x-paginated-by']) * maximum
+                           )
+                self.progress.update( api_command , done , total , started )
+            yield page
+            
             while int(response.headers['x-pagination-current']) < maximum:
                 next_url = response.headers['X-Pagination-Next']
-                response = get_page( next_url )
+                response , page = get_page( next_url )
 
                 # print( response.headers )
-                output.extend( response.json() )
-                logger.info( self.ME+'.rp_pages got yet {} items out of {}.'.
-                       format( len(output) , response.headers['x-pagination-count'] )
-                     )
+                done += size( response , page )
+                self.metrics.count( category , pages=1 , items=size( response , page ) )
+                if self.progress:
+                    self.progress.update( api_command , done , total , started )
+                yield page
+        else:
+            yield page
         
         response.close()
-        return output
+     
+     
+    @classmethod
+    def split_items(cls, text):
+        '''Splits the JSON text of a page into its items.
+        
+        The C decoder finds each item's boundaries much faster than any scan in Python would (a
+        bracket and string aware scan of the bytes measured about 7 times slower). Thus, the items
+        are decoded anyway: raw pages save encoding them back, not decoding them (see
+        bench_taiga.py --decoders and its raw scenario).
+        
+        :param text: JSON text of a page (a list of objects or a single one).
+        :returns: a generator of ( item's JSON text , decoded item ) tuples.
+        '''
+        end = cls.RAW_SKIP.match( text ).end()
+        if not text.startswith( '[' , end ):
+            item , stop = cls.RAW_DECODER.raw_decode( text , end )
+            yield text[ end : stop ] , item
+            return
+        
+        position = cls.RAW_SKIP.match( text , end + 1 ).end()
+        while not text.startswith( ']' , position ):
+            item , stop = cls.RAW_DECODER.raw_decode( text , position )
+            yield text[ position : stop ] , item
+            position = cls.RAW_SKIP.match( text , stop ).end()
+     
+     
+    def stats(self):
+        '''Returns a snapshot of the client's state as a dict.'''
+        return { 'circuit_breaker': self.breaker.snapshot()
+               , 'metrics'        : self.metrics.snapshot()
+               }
      
      
     def get_lst_data_from_api(self, endpoint , project_id ):
@@ -309,6 +944,774 @@ class TaigaMinClient(): #HttpClient):
 
 
 
+class TaigaClientMetrics():
+    '''Counts what clients do, by endpoint category.
+    
+    Counters..: requests      : HTTP requests sent (retries included).
+                pages         : pages of results retrieved by rq.
+                items         : items in those pages.
+                bytes         : bytes of response bodies.
+                throttled     : HTTP 429 replies.
+                retries       : requests repeated after a 401 or a 429.
+                shared        : requests answered by an identical one in flight (see single_flight).
+                errors        : requests failed for connection errors or timeouts.
+                sleep_seconds : time waited because of throttling or token rate limits.
+                emitted       : items emitted by the backend.
+                http_errors   : unexpected HTTP codes (as raised in Unexpected_HTTPcode), by code.
+    Gauges....: in_flight     : requests waiting for their response.
+    Histogram.: latency of requests in seconds, with LATENCY_BUCKETS as upper bounds.
+    
+    Design.: thread safe, so that several clients (e.g. those created by the backend) can share it.
+    '''
+    
+    COUNTERS        = ( 'requests' , 'pages' , 'items' , 'bytes' , 'throttled' , 'retries' , 'shared' , 'errors' , 'sleep_seconds' , 'emitted' )
+    GAUGES          = ( 'in_flight' , )
+    LATENCY_BUCKETS = ( 0.05 , 0.1 , 0.25 , 0.5 , 1 , 2.5 , 5 , 10 , 30 )
+    
+    
+    def __init__(self):
+        '''Init with no counts.'''
+        self.lock       = threading.Lock()
+        self.categories = {}
+    
+    
+    def __category__(self, category):
+        '''Returns the counts of the category, initializing them if missing. Call with the lock.'''
+        counts = self.categories.get( category )
+        if counts is None:
+            counts = dict.fromkeys( self.COUNTERS + self.GAUGES , 0 )
+            counts['http_errors']     = {}
+            counts['latency_buckets'] = [ 0 ] * (len(self.LATENCY_BUCKETS) + 1)
+            counts['latency_sum']     = 0
+            self.categories[ category ] = counts
+        return counts
+    
+    
+    def count(self, category , **amounts):
+        '''Adds the given amounts to the counters of the category, e.g. count( 'tasks' , pages=1 ).'''
+        with self.lock:
+            counts = self.__category__( category )
+            for counter , amount in amounts.items():
+                counts[ counter ] += amount
+    
+    
+    def http_error(self, category , code):
+        '''Counts an unexpected HTTP code replied to a request of the category.'''
+        with self.lock:
+            errors = self.__category__( category )['http_errors']
+            errors[ str(code) ] = errors.get( str(code) , 0 ) + 1
+    
+    
+    def latency(self, category , seconds):
+        '''Records the latency of a request of the category.'''
+        with self.lock:
+            counts = self.__category__( category )
+            counts['latency_buckets'][ bisect_left( self.LATENCY_BUCKETS , seconds ) ] += 1
+            counts['latency_sum'] += seconds
+    
+    
+    def snapshot(self):
+        '''Returns the current counts as a dict of categories.
+        
+        Latency histograms are cumulative, keyed by bucket upper bound as in OpenMetrics.
+        '''
+        output = {}
+        with self.lock:
+            for category , counts in self.categories.items():
+                snapshot = { counter: counts[ counter ] for counter in self.COUNTERS + self.GAUGES }
+                snapshot['http_errors'] = dict( counts['http_errors'] )
+                
+                histogram  = {}
+                cumulative = 0
+                for bound , n in zip( self.LATENCY_BUCKETS + ('+Inf',) , counts['latency_buckets'] ):
+                    cumulative += n
+                    histogram[ str(bound) ] = cumulative
+                snapshot['latency'] = { 'buckets': histogram
+                                      , 'count'  : cumulative
+                                      , 'sum'    : counts['latency_sum']
+                                      }
+                output[ category ] = snapshot
+        return output
+
+
+
+class TaigaOpenMetrics():
+    '''Exposes TaigaClientMetrics in OpenMetrics text format.
+    
+    Usage..: Either render the exposition, write it to a file, keep refreshing a file (start_file)
+             or serve it from a local HTTP endpoint (start_http) for Prometheus to scrape.
+    
+    Design.: - Files are replaced atomically, so that readers never get half written ones. Their
+               temporary files are uniquely named (mkstemp), so that nothing planted under a
+               predictable name is written through.
+             - Background refreshing and serving run in daemon threads. Stop them with stop.
+    '''
+    
+    PREFIX       = 'taiga_client'
+    CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+    
+    #               snapshot key    , metric name                    , type      , help
+    FAMILIES = ( (      'requests' , 'requests'                     , 'counter' , 'HTTP requests sent, retries included.'               )
+               , (         'pages' , 'pages'                        , 'counter' , 'Pages of results retrieved.'                         )
+               , (         'items' , 'items'                        , 'counter' , 'Items in the retrieved pages.'                       )
+               , (       'emitted' , 'items_emitted'                , 'counter' , 'Items emitted by the backend.'                       )
+               , (         'bytes' , 'response_bytes'               , 'counter' , 'Bytes of response bodies.'                           )
+               , (     'throttled' , 'throttled'                    , 'counter' , 'HTTP 429 replies.'                                   )
+               , (       'retries' , 'retries'                      , 'counter' , 'Requests repeated after a 401 or a 429.'             )
+               , (        'shared' , 'shared_requests'              , 'counter' , 'Requests answered by an identical one in flight.'    )
+               , (        'errors' , 'connection_errors'            , 'counter' , 'Requests failed for connection errors or timeouts.'  )
+               , ( 'sleep_seconds' , 'throttle_wait_seconds'        , 'counter' , 'Time waited because of throttling.'                  )
+               , (     'in_flight' , 'in_flight_requests'           , 'gauge'   , 'Requests waiting for their response.'                )
+               )
+    
+    
+    def __init__(self, metrics):
+        '''Init exposition.
+        
+        :param: metrics: the TaigaClientMetrics to expose.
+        '''
+        self.metrics = metrics
+        self.stopped = threading.Event()
+        self.threads = []
+        self.server  = None
+    
+    
+    def render(self):
+        '''Returns the current metrics in OpenMetrics text format.'''
+        snapshot = self.metrics.snapshot()
+        lines    = []
+        
+        def family( name , kind , text ):
+            lines.append( '# TYPE {}_{} {}'.format( self.PREFIX , name , kind ) )
+            lines.append( '# HELP {}_{} {}'.format( self.PREFIX , name , text ) )
+        
+        for key , name , kind , text in self.FAMILIES:
+            family( name , kind , text )
+            suffix = '_total' if 'counter' == kind else ''
+            for category , counts in sorted( snapshot.items() ):
+                lines.append( '{}_{}{}{{category="{}"}} {}'.format( self.PREFIX , name , suffix , category , counts[ key ] ) )
+        
+        family( 'http_errors' , 'counter' , 'Unexpected HTTP codes replied, by code.' )
+        for category , counts in sorted( snapshot.items() ):
+            for code , n in sorted( counts['http_errors'].items() ):
+                lines.append( '{}_http_errors_total{{category="{}",code="{}"}} {}'.format( self.PREFIX , category , code , n ) )
+        
+        family( 'request_latency_seconds' , 'histogram' , 'Latency of HTTP requests.' )
+        for category , counts in sorted( snapshot.items() ):
+            latency = counts['latency']
+            for bound , n in latency['buckets'].items():
+                lines.append( '{}_request_latency_seconds_bucket{{category="{}",le="{}"}} {}'.format( self.PREFIX , category , bound , n ) )
+            lines.append( '{}_request_latency_seconds_sum{{category="{}"}} {}'.format( self.PREFIX , category , latency['sum'] ) )
+            lines.append( '{}_request_latency_seconds_count{{category="{}"}} {}'.format( self.PREFIX , category , latency['count'] ) )
+        
+        lines.append( '# EOF' )
+        return '\n'.join( lines ) + '\n'
+    
+    
+    def write(self, path):
+        '''Writes the current metrics to the given file.'''
+        # as TaigaTokenCache does, but readable by scrapers running as other users:
+        fd , tmp = tempfile.mkstemp( dir=os.path.dirname( path ) or '.' , prefix=os.path.basename( path ) + '.' , suffix='.tmp' )
+        try:
+            with os.fdopen( fd , 'w' ) as f:
+                f.write( self.render() )
+            os.chmod( tmp , 0o644 )
+            os.replace( tmp , path )
+        except BaseException:
+            os.unlink( tmp )
+            raise
+    
+    
+    def start_file(self, path , interval=15):
+        '''Keeps refreshing the given file every interval seconds, until stopped.'''
+        def refresh():
+            while not self.stopped.wait( interval ):
+                self.write( path )
+        
+        self.write( path )
+        self.__start__( refresh )
+    
+    
+    def start_http(self, port=9464 , host='127.0.0.1'):
+        '''Serves the metrics at http://host:port/metrics, until stopped.
+        
+        :param: port: port to listen at. 0 picks a free one.
+        :returns: the (host, port) actually listened at.
+        '''
+        exposition = self
+        
+        class Handler( BaseHTTPRequestHandler ):
+            def do_GET(self):
+                if '/metrics' != self.path.split( '?' )[0]:
+                    self.send_error( 404 )
+                    return
+                body = exposition.render().encode( 'utf-8' )
+                self.send_response( 200 )
+                self.send_header( 'Content-Type'   , exposition.CONTENT_TYPE )
+                self.send_header( 'Content-Length' , str(len(body)) )
+                self.end_headers()
+                self.wfile.write( body )
+            
+            def log_message(self, format , *args):
+                logger.debug( 'OpenMetrics endpoint: ' + format % args )
+        
+        self.server = ThreadingHTTPServer( (host , port) , Handler )
+        self.server.daemon_threads = True
+        self.__start__( self.server.serve_forever )
+        return self.server.server_address
+    
+    
+    def __start__(self, target):
+        '''Runs target in a daemon thread.'''
+        thread = threading.Thread( target=target , daemon=True )
+        thread.start()
+        self.threads.append( thread )
+    
+    
+    def stop(self):
+        '''Stops refreshing and serving.'''
+        self.stopped.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+
+
+class TaigaCircuitBreaker():
+    '''Fails fast while a Taiga instance looks down.
+    
+    Usage..: Get the breaker of an instance with for_url. Call allow before each request and then
+             either success or failure with its outcome.
+    
+    Design.: - One breaker per instance (base url) and process, shared by all its clients. It has
+               the settings of the first one (see for_url).
+             - Closed: requests go through. It opens after failure_threshold consecutive failures.
+             - Open: requests fail fast (Circuit_Open) until cool_down seconds have passed.
+             - Half open: a single probe request goes through. If it succeeds the circuit closes,
+               otherwise it opens again for another cool_down.
+    '''
+    
+    CLOSED    = 'closed'
+    OPEN      = 'open'
+    HALF_OPEN = 'half-open'
+    
+    BREAKERS      = {}
+    BREAKERS_LOCK = threading.Lock()
+    
+    
+    @classmethod
+    def for_url(cls, url , failure_threshold=5 , cool_down=30 , clock=None):
+        '''Returns the breaker of the given instance, creating it with the given settings if missing.
+        
+        The settings of the first client of an instance rule: later clients share its breaker
+        (so that they all fail fast at once) whatever settings they ask for.
+        '''
+        with cls.BREAKERS_LOCK:
+            if url not in cls.BREAKERS:
+                cls.BREAKERS[ url ] = cls( url , failure_threshold , cool_down , clock )
+            return cls.BREAKERS[ url ]
+    
+    
+    def __init__(self, url , failure_threshold=5 , cool_down=30 , clock=None):
+        '''Init a closed breaker.
+        
+        :param: url: base url of the instance.
+        :param: failure_threshold: consecutive failures opening the circuit.
+        :param: cool_down: seconds the circuit stays open before letting a probe through.
+        :param: clock: time source (seconds). time.monotonic by default.
+        '''
+        self.clock             = clock or time.monotonic
+        self.url               = url
+        self.failure_threshold = failure_threshold
+        self.cool_down         = cool_down
+        self.state             = self.CLOSED
+        self.failures          = 0
+        self.opened_at         = None
+        self.probing           = False
+        self.times_opened      = 0
+        self.rejected          = 0
+        self.lock              = threading.Lock()
+    
+    
+    def allow(self):
+        '''Lets a request through or raises Circuit_Open.'''
+        with self.lock:
+            if self.CLOSED == self.state:
+                return
+            
+            waited = self.clock() - self.opened_at
+            if self.OPEN == self.state and self.cool_down <= waited:
+                self.state = self.HALF_OPEN
+            
+            if self.HALF_OPEN == self.state and not self.probing:
+                logger.info( 'Probing {} after {:.1f} seconds open.'.format( self.url , waited ) )
+                self.probing = True
+                return
+            
+            self.rejected += 1
+            raise Circuit_Open( self.url , max( 0 , self.cool_down - waited ) )
+    
+    
+    def success(self):
+        '''Records a successful request.'''
+        with self.lock:
+            if self.CLOSED != self.state:
+                logger.info( 'Circuit to {} closed again.'.format( self.url ) )
+            self.state    = self.CLOSED
+            self.failures = 0
+            self.probing  = False
+    
+    
+    def failure(self):
+        '''Records a failed request.'''
+        with self.lock:
+            self.failures += 1
+            if self.HALF_OPEN == self.state or self.failure_threshold <= self.failures:
+                if self.OPEN != self.state:
+                    logger.warning( 'Circuit to {} open after {} consecutive failures.'.format( self.url , self.failures ) )
+                    self.times_opened += 1
+                self.state     = self.OPEN
+                self.opened_at = self.clock()
+                self.probing   = False
+    
+    
+    def snapshot(self):
+        '''Returns the breaker's state as a dict.'''
+        with self.lock:
+            return { 'url'          : self.url
+                   , 'state'        : self.state
+                   , 'failures'     : self.failures
+                   , 'times_opened' : self.times_opened
+                   , 'rejected'     : self.rejected
+                   }
+
+
+
+class TaigaTokenPool():
+    '''Schedules requests across several API tokens.
+    
+    Taiga throttles each token on its own. Thus, a pool of N tokens can run up to N times as many
+    requests as a single one without any token exceeding its limit.
+    
+    Design.: - Each token has its own rate budget, tracked as the time its next request slot opens.
+               A request takes the slot of the token that's available the earliest (round robin
+               among tokens available already) and pushes it forward by min_interval.
+             - A throttled token isn't used again until the API said it'd be available.
+             - Waits happen out of the lock, so that other threads can take other tokens meanwhile.
+    '''
+    
+    
+    def __init__(self, tokens , min_interval=0 , clock=None , sleeper=None):
+        '''Init pool.
+        
+        :param: tokens: API tokens to pool.
+        :param: min_interval: minimum seconds between two requests with the same token.
+        :param: clock: time source (seconds). time.monotonic by default.
+        :param: sleeper: function waiting the given seconds. time.sleep by default.
+        '''
+        if not tokens:
+            raise Missing_Init_Arguments( 'at least one token for a TaigaTokenPool.' )
+        
+        self.tokens       = list( tokens )
+        self.min_interval = min_interval
+        self.next_slot    = dict.fromkeys( self.tokens , 0 )
+        self.turn         = 0
+        self.clock        = clock   or time.monotonic
+        self.sleeper      = sleeper or time.sleep
+        self.lock         = threading.Lock()
+    
+    
+    def acquire(self):
+        '''Returns the token for the next request, once its slot opens (waiting if needed).'''
+        with self.lock:
+            now  = self.clock()
+            size = len(self.tokens)
+            
+            chosen = None
+            for i in range( size ):
+                candidate = self.tokens[ (self.turn + i) % size ]
+                if self.next_slot[ candidate ] <= now:
+                    chosen = candidate
+                    break
+                if not chosen or self.next_slot[ candidate ] < self.next_slot[ chosen ]:
+                    chosen = candidate
+            
+            self.turn = (self.tokens.index( chosen ) + 1) % size
+            slot = max( now , self.next_slot[ chosen ] )
+            self.next_slot[ chosen ] = slot + self.min_interval
+        
+        if now < slot:
+            logger.info( 'Sleeping for {:.1f} seconds...'.format( slot - now ) )
+            self.sleeper( slot - now )
+        
+        return chosen
+    
+    
+    def throttled(self, token , delay):
+        '''Blocks the token for the given seconds, as the API has just throttled it.'''
+        with self.lock:
+            self.next_slot[ token ] = max( self.next_slot[ token ] , self.clock() + delay )
+
+
+
+class TaigaTokenCache():
+    '''Session tokens persisted across processes.
+    
+    Tokens are keyed by Taiga instance url and user.
+    
+    Design.: - A single JSON file, readable and writable by its owner only (0600) in a directory
+               only accessible to its owner (0700). The file isn't encrypted: its permissions are
+               the protection, just as for ssh keys.
+             - Writes go to a new temporary file (uniquely named, as mkstemp does, so that nothing
+               planted under a predictable name is written through) which then replaces the old one,
+               so that concurrent processes never read a half written file.
+             - Taiga tokens are JWTs. Expired tokens (as per their 'exp' claim) are never returned.
+               Tokens that can't be decoded are returned and, if rejected, replaced on next login.
+    '''
+    
+    DEFAULT_PATH = '~/.perceval/taiga/tokens.json'
+    
+    
+    def __init__(self, path=None):
+        '''Init cache.
+        
+        :param: path: the cache file. Defaults to DEFAULT_PATH.
+        '''
+        self.path = os.path.expanduser( path or self.DEFAULT_PATH )
+        self.lock = threading.Lock()
+    
+    
+    @staticmethod
+    def key(url , user):
+        '''Returns the cache key for the given instance url and user.'''
+        return '{}@{}'.format( user , url )
+    
+    
+    @staticmethod
+    def expiration(token):
+        '''Returns the expiration unixtime of a JWT token or None if it can't be told.'''
+        parts = token.split( '.' )
+        if 3 != len(parts):
+            return None
+        
+        payload = parts[1] + '=' * (-len(parts[1]) % 4)
+        try:
+            claims = json.loads( base64.urlsafe_b64decode( payload ) )
+            return float( claims['exp'] )
+        except (ValueError , TypeError , KeyError):
+            return None
+    
+    
+    def __read__(self):
+        '''Returns the cached tokens as a dict.'''
+        try:
+            with open( self.path ) as f:
+                return json.load( f )
+        except (OSError , ValueError):
+            return {}
+    
+    
+    def __write__(self, tokens):
+        '''Replaces the cache file with the given dict of tokens.'''
+        folder = os.path.dirname( self.path )
+        if folder:
+            os.makedirs( folder , mode=0o700 , exist_ok=True )
+        
+        # mkstemp creates it exclusively, readable and writable by its owner only:
+        fd , tmp = tempfile.mkstemp( dir=folder or '.' , prefix=os.path.basename( self.path ) + '.' , suffix='.tmp' )
+        try:
+            with os.fdopen( fd , 'w' ) as f:
+                json.dump( tokens , f )
+            os.replace( tmp , self.path )
+        except BaseException:
+            os.unlink( tmp )
+            raise
+    
+    
+    def get(self, url , user):
+        '''Returns the cached token for the given instance url and user or None if missing or expired.'''
+        token = self.__read__().get( self.key( url , user ) )
+        if not token:
+            return None
+        
+        expiration = self.expiration( token )
+        if expiration and expiration <= time.time():
+            return None
+        
+        return token
+    
+    
+    def put(self, url , user , token):
+        '''Caches the token for the given instance url and user.'''
+        with self.lock:
+            tokens = self.__read__()
+            tokens[ self.key( url , user ) ] = token
+            self.__write__( tokens )
+
+
+
+class TaigaFlyweight():
+    '''Shares equal nested objects and strings across the items of a crawl.
+    
+    Usage..: give the same instance to the clients of a crawl (flyweight argument). Drop it when
+             the crawl is done, as it keeps every distinct nested object alive.
+    
+    Design.: - Items' own fields are left as they are. Their nested values (dicts, lists and the
+               strings within them) are replaced by a shared equal one: the first one seen.
+             - Equality takes types into account (1, 1.0 and True are told apart), so that items
+               look and serialize exactly as they would have.
+             - Shared objects are meant to be read only: changing one of them changes it for every
+               item sharing it.
+             - No lock: two threads racing for a new value may end up with two copies of it. They
+               are still equal.
+    '''
+    
+    
+    def __init__(self):
+        '''Init with nothing shared.'''
+        self.objects = {}                          # key => shared dict or list.
+        self.strings = {}
+        self.shared  = 0                           # values replaced by a shared one.
+    
+    
+    def item(self, item):
+        '''Shares the nested values of an item (in place). Returns the item.'''
+        for field , value in item.items():
+            if isinstance( value , ( dict , list ) ):
+                item[ field ] = self.share( value )[0]
+        return item
+    
+    
+    def share(self, value):
+        '''Returns (the shared value equal to the given one , its key).'''
+        if isinstance( value , str ):
+            shared = self.strings.setdefault( value , value )
+            return shared , shared
+        
+        if isinstance( value , dict ):
+            children = [ ( self.strings.setdefault( k , k ) , ) + self.share( v ) for k , v in value.items() ]
+            key      = ( dict , tuple( ( k , child_key ) for k , child , child_key in children ) )
+        elif isinstance( value , list ):
+            children = [ self.share( v ) for v in value ]
+            key      = ( list , tuple( child_key for child , child_key in children ) )
+        else:
+            return value , ( type(value) , value )
+        
+        shared = self.objects.get( key )
+        if shared is None:
+            if dict is key[0]:
+                shared = { k: child for k , child , child_key in children }
+            else:
+                shared = [ child for child , child_key in children ]
+            shared = self.objects.setdefault( key , shared )
+        else:
+            self.shared += 1
+        return shared , key
+    
+    
+    def snapshot(self):
+        '''Returns figures of the sharing as a dict.'''
+        return { 'objects': len(self.objects) , 'strings': len(self.strings) , 'shared': self.shared }
+
+
+
+class TaigaProjection():
+    '''Keeps only some fields of the items of each category.
+    
+    Usage..: TaigaProjection( include={ 'tasks': [ 'subject' , 'status' ] } , exclude={ 'wiki': [ 'content' , 'html' ] } )
+             or, as on the command line, TaigaProjection.from_specs( [ 'tasks:subject,status' ] , [ 'wiki:content,html' ] ).
+    
+    Design.: - Per category, either the listed fields are included or they are excluded (or both: the
+               included ones but the excluded).
+             - id, modified_date and the fields identifying the category in Taiga.TAIGA_MAP are always
+               kept, so that the backend can still tell items' id, date and category.
+             - Applied to each page right after it's decoded, so that the dropped fields are freed
+               with the page instead of being held for the whole request. The stdlib JSON decoder
+               can't skip fields, so they are still decoded once.
+    '''
+    
+    ALWAYS = ( 'id' , 'modified_date' )
+    
+    
+    def __init__(self, include=None , exclude=None):
+        '''Init projection.
+        
+        :param: include: dict of field lists to include by category.
+        :param: exclude: dict of field lists to exclude by category.
+        '''
+        include = include or {}
+        exclude = exclude or {}
+        
+        self.fields = {}
+        for config in Taiga.TAIGA_MAP:
+            category = config[ 0 ]
+            keep     = set( self.ALWAYS ) | set( config[ 2 ] )
+            self.fields[ category ] = ( set( include[ category ] ) | keep if category in include else None
+                                      , set( exclude.get( category , () ) ) - keep
+                                      )
+        
+        unknown = ( set( include ) | set( exclude ) ) - set( self.fields )
+        if unknown:
+            raise UsageError( 'Unknown categories to project: {}.'.format( ', '.join( sorted( unknown ) ) ) )
+    
+    
+    @classmethod
+    def from_specs(cls, include=None , exclude=None):
+        '''Returns the projection of lists of specs like 'category:field,field'.'''
+        def parse( specs ):
+            fields = {}
+            for spec in specs or ():
+                category , colon , names = spec.partition( ':' )
+                if not colon:
+                    raise UsageError( 'Wrong projection "{}". Expected category:field,field...'.format( spec ) )
+                fields.setdefault( category.strip() , [] ).extend( name.strip() for name in names.split( ',' ) if name.strip() )
+            return fields
+        return cls( parse( include ) , parse( exclude ) )
+    
+    
+    def key(self):
+        '''Returns a hashable summary of the projection.'''
+        return tuple( ( category , frozenset( included or () ) if included is not None else None , frozenset( excluded ) )
+                      for category , ( included , excluded ) in sorted( self.fields.items() )
+                    )
+    
+    
+    def apply(self, category , item):
+        '''Returns the projection of an item of the category (the item itself if nothing is dropped).'''
+        included , excluded = self.fields.get( category , ( None , () ) )
+        if included is None and not excluded:
+            return item
+        return { field: value for field , value in item.items()
+                 if ( included is None or field in included ) and field not in excluded
+               }
+    
+    
+    def page(self, category , page):
+        '''Returns the projection of a page (a list of items or a single one).'''
+        if isinstance( page , list ):
+            return [ self.apply( category , item ) for item in page ]
+        return self.apply( category , page )
+
+
+
+class TaigaRecord():
+    '''Compact representation of an item of a list category.
+    
+    Usage..: get the class of a category with for_category. Records read like dicts (record['id'],
+             'id' in record, record.get, keys) and to_dict converts them back for Perceval.
+    
+    Design.: - __slots__ classes, one per list category in Taiga.TAIGA_MAP.
+             - Hot fields (FIELDS) are kept as attributes. The rest of the item is kept as a compact
+               JSON buffer, only decoded when some of it is read.
+             - Reading a cold field decodes the whole buffer every time. Convert records to dicts
+               (to_dict) to read them repeatedly.
+    '''
+    
+    __slots__ = ( 'raw' , )
+    
+    CATEGORY = None
+    COMMON   = ( 'id' , 'ref' , 'version' , 'project' , 'subject' , 'status' , 'is_closed' , 'created_date' , 'modified_date' )
+    FIELDS   = COMMON
+    MISSING  = object()                            # value of the hot fields the item lacks.
+    
+    
+    @classmethod
+    def for_category(cls, category):
+        '''Returns the record class of a list category, or None if it hasn't one.'''
+        for subclass in cls.__subclasses__():
+            if category == subclass.CATEGORY:
+                return subclass
+        return None
+    
+    
+    def __init__(self, item):
+        '''Init from an item as decoded from the API (which isn't modified).'''
+        rest = dict( item )
+        for field in self.FIELDS:
+            setattr( self , field , rest.pop( field , self.MISSING ) )
+        self.raw = json.dumps( rest , separators=( ',' , ':' ) , ensure_ascii=False ).encode( 'utf-8' )
+    
+    
+    def rest(self):
+        '''Returns the cold fields, decoded.'''
+        return json.loads( self.raw )
+    
+    
+    def __getitem__(self, field):
+        if field in self.FIELDS:
+            value = getattr( self , field )
+            if value is self.MISSING:
+                raise KeyError( field )
+            return value
+        return self.rest()[ field ]
+    
+    
+    def __contains__(self, field):
+        try:
+            self[ field ]
+        except KeyError:
+            return False
+        return True
+    
+    
+    def get(self, field , default=None):
+        try:
+            return self[ field ]
+        except KeyError:
+            return default
+    
+    
+    def keys(self):
+        return self.to_dict().keys()
+    
+    
+    def to_dict(self):
+        '''Returns the item as a plain dict.'''
+        item = { field: getattr( self , field ) for field in self.FIELDS if getattr( self , field ) is not self.MISSING }
+        item.update( self.rest() )
+        return item
+    
+    
+    def __repr__(self):
+        return '{}({})'.format( type(self).__name__ , self.to_dict() )
+
+
+
+class TaigaEpic( TaigaRecord ):
+    '''Compact epic.'''
+    CATEGORY  = 'epics'
+    FIELDS    = TaigaRecord.COMMON + ( 'epics_order' , )
+    __slots__ = FIELDS
+
+
+
+class TaigaUserStory( TaigaRecord ):
+    '''Compact userstory.'''
+    CATEGORY  = 'userstories'
+    FIELDS    = TaigaRecord.COMMON + ( 'backlog_order' , 'sprint_order' , 'milestone' , 'finish_date' )
+    __slots__ = FIELDS
+
+
+
+class TaigaTask( TaigaRecord ):
+    '''Compact task.'''
+    CATEGORY  = 'tasks'
+    FIELDS    = TaigaRecord.COMMON + ( 'user_story' , 'milestone' , 'finished_date' )
+    __slots__ = FIELDS
+
+
+
+class TaigaWikiPage( TaigaRecord ):
+    '''Compact wiki page.'''
+    CATEGORY  = 'wiki'
+    FIELDS    = ( 'id' , 'version' , 'project' , 'slug' , 'created_date' , 'modified_date' )
+    __slots__ = FIELDS
+
+
+
 class Taiga(Backend):
     '''Taiga backend for Perceval.
     
@@ -340,9 +1743,21 @@ class Taiga(Backend):
     CATEGORIES = [ cat for cat, q, i, t in TAIGA_MAP ]
     
     
-    def __init__(self, origin , url=None , api_token=None , tag=None , archive=None ):
+    def __init__(self, origin , url=None , api_token=None , tag=None , archive=None , metrics=None
+                , progress_interval=None , records=False , flyweight=False , include=None , exclude=None
+                , prefetch=0
+                ):
         """Initiates this backend.
         
+        api_token may also be a list of tokens, for the client to spread the requests across them.
+        metrics is an optional TaigaClientMetrics for the clients of this backend to count into.
+        progress_interval (seconds) enables logging the progress of paginated requests.
+        records makes the clients hold list items as compact TaigaRecords until they are emitted.
+        flyweight makes each fetch share the equal nested values of its items (see TaigaFlyweight).
+        include and exclude are lists of 'category:field,field' specs of the fields to keep or drop
+        from the items of each category (see TaigaProjection).
+        prefetch is the number of pages to fetch in the background ahead of the consumer of the items
+        (see TaigaPrefetcher). None are, with 0: pages are fetched as the items are consumed.
         keywords (archive) to be ignored!
         """
         
@@ -352,6 +1767,13 @@ class Taiga(Backend):
         if not (self.api_url and self.token):
             raise Missing_Init_Arguments('Both, url and token are mandatory')
         
+        self.metrics    = metrics or TaigaClientMetrics()
+        self.progress   = TaigaProgress( interval=progress_interval ) if progress_interval else None
+        self.records    = records
+        self.flyweight  = flyweight
+        self.projection = TaigaProjection.from_specs( include , exclude ) if include or exclude else None
+        self.prefetch   = prefetch
+        
         # initiate standard backend:
         super().__init__( origin , tag=tag )
        
@@ -364,7 +1786,9 @@ class Taiga(Backend):
         
         Implicitly required by Perceval's Backend.
         """
-        return TaigaMinClient( url=self.api_url , token=self.token )
+        return TaigaMinClient( url=self.api_url , token=self.token , metrics=self.metrics , progress=self.progress
+                             , records=self.records , projection=self.projection
+                             )
     
     
     @staticmethod
@@ -435,23 +1859,91 @@ class Taiga(Backend):
                 break
         
         # retrieve data:
-        tc = TaigaMinClient( url=self.api_url , token=self.token )
-        items = tc.rq( query.format( self.origin ) ) 
+        tc = TaigaMinClient( url=self.api_url , token=self.token , metrics=self.metrics , progress=self.progress
+                           , records=self.records , flyweight=TaigaFlyweight() if self.flyweight else None
+                           , projection=self.projection
+                           )
         
         # hold data:
-        if isinstance( items , list ):
-            for item in items:
-                yield item
-        elif isinstance( items , dict ):
-            # these are standard fields for most Taiga items, but some lack them. Thus, we
-            # inject them with default values first and then overlay the actual values on
-            # top, so that defaults only remain in items for which Taiga doesn't provide the
-            # actual ones:
-            completed = { 'id':int(self.origin) , 'modified_date':datetime_utcnow().isoformat(sep='T') }
-            completed.update( items )
-            yield completed
-        else:
-            raise Canary_Exception(details='{} is no list nor a dict.'.format( type(items) ))
+        for items in self.__pages__( tc , query.format( self.origin ) ):
+            if isinstance( items , list ):
+                for item in items:
+                    self.metrics.count( name , emitted=1 )
+                    yield item.to_dict() if isinstance( item , TaigaRecord ) else item
+            elif isinstance( items , dict ):
+                # these are standard fields for most Taiga items, but some lack them. Thus, we
+                # inject them with default values first and then overlay the actual values on
+                # top, so that defaults only remain in items for which Taiga doesn't provide the
+                # actual ones:
+                completed = { 'id':int(self.origin) , 'modified_date':datetime_utcnow().isoformat(sep='T') }
+                completed.update( items )
+                self.metrics.count( name , emitted=1 )
+                yield completed
+            else:
+                raise Canary_Exception(details='{} is no list nor a dict.'.format( type(items) ))
+    
+    
+    def __pages__(self, tc , query , raw=False):
+        '''Returns the pages of a query, prefetched in the background if requested.'''
+        pages = tc.pages( query , raw=raw )
+        return TaigaPrefetcher( pages , self.prefetch ) if self.prefetch else pages
+    
+    
+    def fetch_raw(self, category):
+        """Fetch items as Perceval JSON lines, passing the items of list categories through as Taiga served them.
+        
+        Their text goes into the envelope as is, instead of being encoded back from dicts (they're
+        still decoded, for the fields of the envelope: see split_items).
+        The envelope is the one of metadata (but for 'data' keeping Taiga's order of fields), built
+        from what's known beforehand (as the category) and the few fields it needs from the items.
+        
+        :param category: category of the items to fetch.
+        :returns: a generator of JSON lines (without the line break).
+        """
+        if self.projection:
+            raise UsageError( 'Raw items are passed through as served. They can\'t be projected.' )
+        
+        query , kind = { c: ( q , t ) for c , q , i , t in self.TAIGA_MAP }.get( category , ( None , None ) )
+        if self.LIST != kind:
+            # nothing to gain for single items (nor for unknown categories, which fetch rejects):
+            for item in self.fetch( category=category ):
+                yield json.dumps( item , separators=(',',':') , sort_keys=True )
+            return
+        if not ( self.api_url and self.token):
+            raise Uninitiated_TaigaClient
+        
+        # the envelope's fields before 'data' (in sort order) are the same for every item:
+        head = json.dumps( { 'backend_name'               : self.__class__.__name__
+                           , 'backend_version'            : self.version
+                           , 'category'                   : category
+                           , 'classified_fields_filtered' : None
+                           } , separators=(',',':') , sort_keys=True )[ :-1 ]
+        
+        tc = TaigaMinClient( url=self.api_url , token=self.token , metrics=self.metrics , progress=self.progress )
+        for page in self.__pages__( tc , query.format( self.origin ) , raw=True ):
+            for text , item in tc.split_items( page ):
+                tail = json.dumps( { 'origin'           : self.origin
+                                   , 'perceval_version' : perceval_version
+                                   , 'search_fields'    : self.search_fields( item )
+                                   , 'tag'              : self.tag
+                                   , 'timestamp'        : datetime_utcnow().timestamp()
+                                   , 'updated_on'       : self.raw_updated_on( item )
+                                   , 'uuid'             : uuid( self.origin , self.metadata_id( item ) )
+                                   } , separators=(',',':') , sort_keys=True )[ 1: ]
+                self.metrics.count( category , emitted=1 )
+                yield '{},"data":{},{}'.format( head , text , tail )
+    
+    
+    @classmethod
+    def raw_updated_on(cls, item):
+        """Extracts the update time from a Taiga item as metadata_updated_on does, but faster for Taiga's ISO dates."""
+        try:
+            date = datetime.fromisoformat( item['modified_date'].replace( 'Z' , '+00:00' ) )
+        except ValueError:
+            date = None
+        if date is None or date.tzinfo is None:
+            return cls.metadata_updated_on( item )          # it knows other formats (and that naive ones are UTC).
+        return date.timestamp()
     
     
     @staticmethod
@@ -484,6 +1976,103 @@ class Taiga(Backend):
 
 
 
+class TaigaProfiler():
+    '''Profiles CPU time and memory of a run.
+    
+    Output.: Beside the given base path:
+             - <base>.prof            : cProfile stats (for pstats, snakeviz, etc).
+             - <base>.memory.txt      : tracemalloc high-water mark and top allocations.
+             - <base>.profile.txt     : summary of CPU time by phase (see PHASES).
+    
+    Design.: - Phases are told by the cumulative time of the functions that mark them. They're
+               not nested, so that they can be added up. The rest of the time is reported as other.
+             - tracemalloc slows the run down a lot. Take times with a grain of salt.
+             - Only the calling thread is profiled. Thus, TaigaCommand refuses to profile runs
+               that fetch in the background (--prefetch).
+    '''
+    
+    TOP_ALLOCATIONS = 25
+    
+    #          phase                     , marking functions (file name ending , function name start)
+    PHASES = ( ( 'network wait'          , ( ( 'taiga.py'          , '__send__'              ) , ) )
+             , ( 'throttling sleep'      , ( ( '~'                 , '<built-in method time.sleep>' ) , ) )
+             , ( 'JSON decoding'         , ( ( 'taiga.py'          , 'decode'                ) , ) )
+             , ( 'metadata_* extraction' , ( ( 'taiga.py'          , 'metadata_'             ) , ) )
+             , ( 'output serialisation'  , ( ( 'json/__init__.py'  , 'dumps'                 )
+                                           , ( '~'                 , "<method 'write' of '_io.TextIOWrapper' objects>" )
+                                           )
+               )
+             )
+    
+    
+    def __init__(self, base):
+        '''Init profiler.
+        
+        :param: base: path the output file names are based on.
+        '''
+        self.base     = base
+        self.profile  = cProfile.Profile()
+        self.snapshot = None
+        self.peak     = None
+    
+    
+    def run(self, target):
+        '''Runs target (without arguments) while profiling it. Returns whatever target does.'''
+        tracemalloc.start()
+        self.profile.enable()
+        try:
+            return target()
+        finally:
+            self.profile.disable()
+            self.peak     = tracemalloc.get_traced_memory()[1]
+            self.snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+    
+    
+    def phases(self):
+        '''Returns a list of (phase , seconds) pairs, ending with other and total.'''
+        stats = pstats.Stats( self.profile )
+        
+        output = []
+        for phase , markers in self.PHASES:
+            seconds = 0
+            for ( filename , line , function ) , ( cc , nc , tt , ct , callers ) in stats.stats.items():
+                for file_end , function_start in markers:
+                    if filename.endswith( file_end ) and function.startswith( function_start ):
+                        seconds += ct
+            output.append( ( phase , seconds ) )
+        
+        total = stats.total_tt
+        output.append( ( 'other' , max( 0 , total - sum( seconds for phase , seconds in output ) ) ) )
+        output.append( ( 'total' , total ) )
+        return output
+    
+    
+    def write(self):
+        '''Writes the profiling results. Returns the list of written files.'''
+        files = [ self.base + '.prof' , self.base + '.memory.txt' , self.base + '.profile.txt' ]
+        
+        self.profile.dump_stats( files[0] )
+        
+        with open( files[1] , 'w' ) as f:
+            f.write( 'Peak traced memory: {:.1f} KiB\n\n'.format( self.peak / 1024 ) )
+            f.write( 'Top {} allocations (by line):\n'.format( self.TOP_ALLOCATIONS ) )
+            for stat in self.snapshot.statistics( 'lineno' )[ :self.TOP_ALLOCATIONS ]:
+                f.write( '{}\n'.format( stat ) )
+        
+        phases = self.phases()
+        total  = phases[-1][1] or 1
+        with open( files[2] , 'w' ) as f:
+            f.write( 'CPU time by phase:\n' )
+            for phase , seconds in phases:
+                f.write( '{:>24}: {:10.3f} s {:6.1f} %\n'.format( phase , seconds , 100 * seconds / total ) )
+            f.write( '\nPeak traced memory: {:.1f} KiB\n'.format( self.peak / 1024 ) )
+        
+        logger.info( 'Profile written to {}'.format( ', '.join( files ) ) )
+        return files
+
+
+
 class TaigaCommand(BackendCommand):
     """Run Taiga backend from the command line."""
     
@@ -508,11 +2097,92 @@ class TaigaCommand(BackendCommand):
         group.add_argument( '--url' , dest='url'
                           , help="URL of the exposed API in the Taiga instance."
                           )
+        group.add_argument( '--progress-interval' , dest='progress_interval' , type=float
+                          , help="Log the progress of paginated requests at most once every these seconds."
+                          )
+        group.add_argument( '--metrics-file' , dest='metrics_file'
+                          , help="File where to dump the client metrics (as JSON) at the end of the run."
+                          )
+        group.add_argument( '--openmetrics-file' , dest='openmetrics_file'
+                          , help="File where to keep the client metrics refreshed in OpenMetrics text format."
+                          )
+        group.add_argument( '--openmetrics-interval' , dest='openmetrics_interval' , type=float , default=15
+                          , help="Seconds between refreshes of the OpenMetrics file."
+                          )
+        group.add_argument( '--openmetrics-port' , dest='openmetrics_port' , type=int
+                          , help="Local port where to serve the client metrics for Prometheus (at /metrics)."
+                          )
+        group.add_argument( '--include' , dest='include' , action='append' , metavar='CATEGORY:FIELD,...'
+                          , help="Keep only these fields (and the identifying ones) of the items of the category. Repeatable."
+                          )
+        group.add_argument( '--exclude' , dest='exclude' , action='append' , metavar='CATEGORY:FIELD,...'
+                          , help="Drop these fields (but the identifying ones) from the items of the category. Repeatable."
+                          )
+        group.add_argument( '--prefetch' , dest='prefetch' , type=int , default=0 , metavar='PAGES'
+                          , help="Fetch up to these pages in the background, ahead of the output of the items."
+                          )
+        group.add_argument( '--raw' , dest='raw' , action='store_true'
+                          , help="Write the items as JSON lines, passing them through as served instead of decoding and encoding them."
+                          )
+        group.add_argument( '--profile' , dest='profile' , action='store_true'
+                          , help="Profile CPU and memory of the run. Results are written beside the output."
+                          )
         
         # positional arguments:
         parser.parser.add_argument( 'origin' , help='project id' )
         
         return parser
+    
+    
+    def _post_init(self):
+        '''Shares a metrics object with the backend, if they're to be dumped or exposed.'''
+        args = self.parsed_args
+        if args.profile and args.prefetch:
+            raise UsageError( 'Profiles only see the main thread, not the one prefetching. --profile can\'t be combined with --prefetch.' )
+        if args.metrics_file or args.openmetrics_file or args.openmetrics_port:
+            args.metrics = TaigaClientMetrics()
+    
+    
+    def run(self):
+        '''Fetches and writes items while exposing the client metrics and then dumps them, as requested.'''
+        args = self.parsed_args
+        
+        exposition = None
+        if args.openmetrics_file or args.openmetrics_port:
+            exposition = TaigaOpenMetrics( args.metrics )
+            if args.openmetrics_file:
+                exposition.start_file( args.openmetrics_file , args.openmetrics_interval )
+            if args.openmetrics_port:
+                exposition.start_http( args.openmetrics_port )
+        
+        target = self.__run_raw__ if args.raw else super().run
+        try:
+            if args.profile:
+                output   = args.outfile.name
+                base     = output if os.path.isfile( output ) else 'perceval-taiga'
+                profiler = TaigaProfiler( base )
+                profiler.run( target )
+                profiler.write()
+            else:
+                target()
+        finally:
+            if exposition:
+                exposition.stop()
+                if args.openmetrics_file:
+                    exposition.write( args.openmetrics_file )
+        
+        if args.metrics_file:
+            with open( args.metrics_file , 'w' ) as f:
+                json.dump( args.metrics.snapshot() , f , indent=4 , sort_keys=True )
+    
+    
+    def __run_raw__(self):
+        '''Fetches and writes items as JSON lines, passing them through as served (see Taiga.fetch_raw).'''
+        args    = vars( self.parsed_args )
+        backend = self.BACKEND( **find_signature_parameters( self.BACKEND.__init__ , args ) )
+        for line in backend.fetch_raw( args.get( 'category' ) ):
+            self.outfile.write( line )
+            self.outfile.write( '\n' )
 
 
 
@@ -556,6 +2226,15 @@ class Unexpected_HTTPcode(Exception):
         super().__init__( ERR_MESSAGE )
 
 
+class Circuit_Open(Exception):
+    '''The circuit breaker of a Taiga instance doesn't let requests through.'''
+    def __init__(self, url , retry_in , details=None):
+        ERR_MESSAGE = 'Circuit to {} is open after repeated failures. Next probe in {:.1f} seconds.'.format( url , retry_in )
+        if details:
+            ERR_MESSAGE += ' ' + details
+        super().__init__( ERR_MESSAGE )
+
+
 class Canary_Exception(Exception):
     '''This exception should never happen.
     
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Fioddor Superconcentrado
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Purpose: Lead time, cycle time and sprint burndown of any number of projects at once.
+# Usage..: - From python: analytics = TaigaAnalytics( TaigaColumns.load( 'columns' , 'userstories' )
+#                                                    , TaigaColumns.load( 'columns' , 'tasks' ) )
+#                         summary = analytics.per_project( analytics.lead_times() )
+#          - Standalone.: ./taiga_analytics.py columns
+#          - Scaling....: ./bench_taiga.py --analytics --analytics-sizes 1000 10000 100000
+#
+# Design.: - Runs on the columns of taiga_columns.py (numpy arrays, memory-mapped or not), all
+#            projects at once: no loop goes through items, only through numpy calls.
+#          - Times are milliseconds (as the date columns), NaN where they don't apply.
+#          - Lead time : from the creation of a user story to its finish_date.
+#            Cycle time: from the creation of its first task (work started) to its finish_date.
+#            Taiga's items carry no status history, so work can't be told to start otherwise.
+#          - Burndown  : points of each sprint (milestone) not yet finished each day since it started.
+#            Items carry no sprint dates either: sprints start when their first user story was
+#            created (unless told otherwise).
+#          - Needs numpy (an optional dependency of the rest).
+#----------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import json
+
+try:
+    import numpy                                    # optional, for the arrays.
+except ImportError:
+    numpy = None
+
+from perceval.backends.core.taiga import UsageError
+
+from taiga_columns import TaigaColumns
+
+
+DAY = 24 * 60 * 60 * 1000                           # in milliseconds.
+
+
+
+class TaigaAnalytics():
+    '''Flow metrics of user stories, vectorised over their columns.
+
+    :param: stories: userstories columns (as TaigaColumns.load returns them).
+    :param: tasks: tasks columns. Only needed for cycle times.
+    '''
+
+    MISSING = TaigaColumns.MISSING
+
+
+    def __init__(self, stories , tasks=None):
+        if not numpy:
+            raise UsageError( 'TaigaAnalytics needs numpy.' )
+        self.stories = stories
+        self.tasks   = tasks
+
+
+    def lead_times(self):
+        '''Returns the lead time of each user story (NaN for unfinished ones).'''
+        created  = self.stories['created_date']
+        finished = self.stories['finish_date']
+        done     = (finished != self.MISSING) & (created != self.MISSING)
+        return numpy.where( done , finished - created , numpy.nan )
+
+
+    def work_started(self):
+        '''Returns when work started on each user story: the creation of its first task (MISSING if none).'''
+        if self.tasks is None:
+            raise UsageError( 'Cycle times need the tasks columns.' )
+        ids    = numpy.asarray( self.stories['id'] )
+        order  = numpy.argsort( ids , kind='stable' )
+        sorted_ids = ids[ order ]
+
+        # tasks of known stories, by story position:
+        story   = numpy.asarray( self.tasks['user_story'] )
+        created = numpy.asarray( self.tasks['created_date'] )
+        linked  = story != self.MISSING
+        story , created = story[ linked ] , created[ linked ]
+        position = numpy.searchsorted( sorted_ids , story )
+        known    = position < len(sorted_ids)
+        known[ known ] = sorted_ids[ position[ known ] ] == story[ known ]
+        position , created = position[ known ] , created[ known ]
+
+        # the first task of each story comes first when sorted by story and creation:
+        by_story = numpy.lexsort( ( created , position ) )
+        first_positions , first = numpy.unique( position[ by_story ] , return_index=True )
+
+        started = numpy.full( len(ids) , self.MISSING , dtype=numpy.int64 )
+        started[ order[ first_positions ] ] = created[ by_story ][ first ]
+        return started
+
+
+    def cycle_times(self):
+        '''Returns the cycle time of each user story (NaN for unfinished ones and those without tasks).'''
+        started  = self.work_started()
+        finished = self.stories['finish_date']
+        done     = (finished != self.MISSING) & (started != self.MISSING)
+        return numpy.where( done , finished - started , numpy.nan )
+
+
+    def per_project(self, values , projects=None):
+        '''Returns a summary by project of values of the user stories (e.g. lead_times), NaNs left out.
+
+        :param: projects: project of each value (the user stories' ones, if missing).
+        :returns: a dict of arrays, aligned by project: project , count , mean , median , p85.
+        '''
+        values   = numpy.asarray( values , dtype=numpy.float64 )
+        projects = numpy.asarray( self.stories['project'] if projects is None else projects )
+        valid    = ~numpy.isnan( values )
+        values , projects = values[ valid ] , projects[ valid ]
+
+        ids , group = numpy.unique( projects , return_inverse=True )
+        group  = group.reshape( -1 )
+        counts = numpy.bincount( group , minlength=len(ids) )
+        sums   = numpy.bincount( group , weights=values , minlength=len(ids) )
+
+        # percentiles from the values sorted within each project:
+        ordered = values[ numpy.lexsort( ( values , group ) ) ]
+        starts  = numpy.concatenate( ( [ 0 ] , numpy.cumsum( counts )[ :-1 ] ) ).astype( numpy.int64 )
+        def percentile( q ):
+            rank  = (counts - 1) * q
+            low   = numpy.floor( rank ).astype( numpy.int64 )
+            high  = numpy.ceil( rank ).astype( numpy.int64 )
+            if not len(ordered):
+                return numpy.zeros( 0 )
+            return ordered[ starts + low ] + (ordered[ starts + high ] - ordered[ starts + low ]) * (rank - low)
+
+        return { 'project' : ids
+               , 'count'   : counts
+               , 'mean'    : sums / numpy.maximum( counts , 1 )
+               , 'median'  : percentile( 0.5 )
+               , 'p85'     : percentile( 0.85 )
+               }
+
+
+    def burndown(self, days=None , starts=None):
+        '''Returns the burndown of every sprint.
+
+        :param: days: length of the burndowns in days. Up to the latest finish, if missing.
+        :param: starts: { milestone: start (ms) } of sprints. The creation of their first story, if missing.
+        :returns: a dict with the arrays of milestone (ids) , start (ms) , total (points) and remaining:
+                  a sprints x (days + 1) array of the points not yet finished d days after their start.
+        '''
+        milestone = numpy.asarray( self.stories['milestone'] )
+        in_sprint = milestone != self.MISSING
+        milestone = milestone[ in_sprint ]
+        points    = numpy.nan_to_num( numpy.asarray( self.stories['total_points'] , dtype=numpy.float64 )[ in_sprint ] )
+        created   = numpy.asarray( self.stories['created_date'] )[ in_sprint ]
+        finished  = numpy.asarray( self.stories['finish_date'] )[ in_sprint ]
+
+        ids , sprint = numpy.unique( milestone , return_inverse=True )
+        sprint = sprint.reshape( -1 )
+        total  = numpy.bincount( sprint , weights=points , minlength=len(ids) )
+
+        start = numpy.full( len(ids) , numpy.iinfo( numpy.int64 ).max , dtype=numpy.int64 )
+        numpy.minimum.at( start , sprint , created )
+        for n , m in enumerate( ids.tolist() ):
+            if starts and m in starts:
+                start[ n ] = starts[ m ]
+
+        done = finished != self.MISSING
+        day  = numpy.ceil( (finished[ done ] - start[ sprint[ done ] ]) / DAY ).astype( numpy.int64 )
+        day  = numpy.maximum( day , 0 )
+        if days is None:
+            days = int( day.max() ) if len(day) else 0
+        kept = day <= days
+
+        burnt = numpy.bincount( sprint[ done ][ kept ] * (days + 1) + day[ kept ]
+                              , weights=points[ done ][ kept ] , minlength=len(ids) * (days + 1)
+                              ).reshape( len(ids) , days + 1 )
+        return { 'milestone' : ids
+               , 'start'     : start
+               , 'total'     : total
+               , 'remaining' : total[ : , None ] - numpy.cumsum( burnt , axis=1 )
+               }
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Lead time, cycle time and burndown of exported columns (see taiga_columns.py).' )
+    parser.add_argument( 'folder' )
+    args = parser.parse_args()
+
+    analytics = TaigaAnalytics( TaigaColumns.load( args.folder , 'userstories' ) , TaigaColumns.load( args.folder , 'tasks' ) )
+    output = {}
+    for name , values in ( ( 'lead_time_days' , analytics.lead_times() ) , ( 'cycle_time_days' , analytics.cycle_times() ) ):
+        summary = analytics.per_project( values / DAY )
+        output[ name ] = { str(project): { 'count': int(count) , 'mean': mean , 'median': median , 'p85': p85 }
+                           for project , count , mean , median , p85
+                           in zip( *( summary[ key ].tolist() for key in ( 'project' , 'count' , 'mean' , 'median' , 'p85' ) ) ) }
+    print( json.dumps( output , indent=2 ) )
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Fioddor Superconcentrado
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Purpose: Offline replay of the recorded responses (data/taiga/*.RS).
+# Usage..: cassette = TaigaCassette()
+#          tc = TaigaMinClient( url=cassette.base_url , token='any' , transport=cassette )
+#
+# Design.: - The whole corpus is read and indexed by url once. Replays come from memory.
+#          - A transport is anything with the get and post functions of requests (as the module itself
+#            or a requests.Session). Responses have what the client uses of requests' ones.
+#          - Urls are the ones the recordings link to (see their X-Pagination-Next headers). Query
+#            parameters may come in any order. Unknown urls get a 404.
+#          - Recordings are found and told apart as the stand-in does (see taiga_standin.fixture_pages).
+#----------------------------------------------------------------------------------------------------------------------
+
+import ast
+import json
+import os
+from types import SimpleNamespace
+from urllib.parse import parse_qsl , urlencode , urlsplit
+
+from requests.structures import CaseInsensitiveDict
+
+from perceval.backends.core.taiga import Taiga
+
+from taiga_standin import FIXTURES_DIR , fixture_pages
+
+
+
+class TaigaCassette():
+    '''Replays recorded Taiga responses.
+
+    :param: folder: folder with the recorded .RS files.
+    :param: base_url: url of the recorded instance.
+    '''
+
+    RECORDED_URL = 'https://a.taiga.instance/API/V9/'
+
+
+    def __init__(self, folder=FIXTURES_DIR , base_url=RECORDED_URL):
+        '''Reads and indexes the recorded responses.'''
+        self.base_url = base_url
+        self.folder   = folder
+        self.index    = {}                       # ( method , url key ) => ( headers , body ).
+        self.played   = []                       # urls requested, in order.
+
+        queries = { category: query for category , query , items , kind in Taiga.TAIGA_MAP }
+        for filename , project , category , page in fixture_pages( folder , queries ):
+            url = base_url + queries[ category ].format( project )
+            if 1 < page:
+                url += '&page={}'.format( page )
+            self.index[ ( 'get' , self.key( url ) ) ] = self.read( filename )
+
+        if os.path.exists( os.path.join( folder , 'login.body.RS' ) ):
+            self.index[ ( 'post' , self.key( base_url + 'auth' ) ) ] = self.read( 'login.body.RS' )
+
+
+    def read(self, filename):
+        '''Returns the recorded headers and body (bytes) of a .body.RS file.'''
+        with open( os.path.join( self.folder , filename ) , 'rb' ) as f:
+            body = f.read()
+        with open( os.path.join( self.folder , filename.replace( '.body.' , '.head.' ) ) ) as f:
+            headers = ast.literal_eval( f.read() )
+        # bodies are stored decoded:
+        headers.pop( 'Content-Encoding' , None )
+        headers.pop( 'Transfer-Encoding' , None )
+        return headers , body.replace( b"'" , b'"' ) if filename.startswith( 'login.' ) else body
+
+
+    @staticmethod
+    def key(url):
+        '''Returns the index key of a url: the same for any order of its query parameters.'''
+        parts = urlsplit( url )
+        return '{}://{}{}?{}'.format( parts.scheme , parts.netloc , parts.path , urlencode( sorted( parse_qsl( parts.query ) ) ) )
+
+
+    def request(self, method , url , **kwargs):
+        '''Returns the recorded response for a request, or a 404 one.'''
+        self.played.append( url )
+        recorded = self.index.get( ( method , self.key( url ) ) )
+        if recorded:
+            headers , body = recorded
+            return TaigaCassetteResponse( 200 , headers , body , method , url , kwargs )
+        return TaigaCassetteResponse( 404 , { 'Content-Type': 'application/json' }
+                                    , b'{"_error_message": "Not found.", "_error_type": "taiga.base.exceptions.NotFound"}'
+                                    , method , url , kwargs
+                                    )
+
+
+    def get(self, url , **kwargs):
+        return self.request( 'get' , url , **kwargs )
+
+
+    def post(self, url , **kwargs):
+        return self.request( 'post' , url , **kwargs )
+
+
+
+class TaigaCassetteResponse():
+    '''A replayed response, with what TaigaMinClient uses of requests' ones.'''
+
+    def __init__(self, status_code , headers , content , method , url , kwargs):
+        self.status_code = status_code
+        self.headers     = CaseInsensitiveDict( headers )
+        self.content     = content
+        self.url         = url
+        self.request     = SimpleNamespace( method=method.upper() , url=url
+                                          , headers=kwargs.get( 'headers' , {} ) , body=kwargs.get( 'data' )
+                                          )
+
+
+    @property
+    def text(self):
+        return self.content.decode( 'utf-8' )
+
+
+    def json(self):
+        return json.loads( self.content )
+
+
+    def close(self):
+        pass
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Fioddor Superconcentrado
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Purpose: Columnar export of the list categories, for analytics to load typed arrays instead of JSON.
+# Usage..: - From python: TaigaColumns.export( mirror.items( 'tasks' ) , 'tasks' , 'columns' )
+#                         tasks = TaigaColumns.load( 'columns' , 'tasks' )      # { column: numpy array }
+#          - Standalone.: ./taiga_columns.py columns --mirror taiga.sqlite
+#                         ./taiga_columns.py columns --url URL --token TOKEN --projects 123 456
+#
+# Design.: - A folder per category under the export folder, with a .npy file per column and a
+#            columns.json manifest (rows and dtypes).
+#          - .npy files are loaded memory-mapped (read only): columns are paged in from disk as
+#            they're read, with no parsing nor copying.
+#          - Ids, foreign keys and orders are int64, with MISSING for null. Dates are int64
+#            milliseconds since the epoch (UTC), with MISSING for null. Points are float64, with NaN
+#            for null. Flags are bool.
+#          - Items are read as a stream. Columns grow as compact stdlib arrays (8 bytes per value)
+#            until written.
+#          - Needs numpy (an optional dependency of the rest).
+#----------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+from array import array
+from datetime import datetime
+
+try:
+    import numpy                                    # optional, for the arrays.
+except ImportError:
+    numpy = None
+
+from grimoirelab_toolkit.datetime import str_to_datetime
+
+from perceval.backends.core.taiga import Taiga , TaigaMinClient , UsageError
+
+from taiga_mirror import TaigaMirror
+
+
+
+def timestamp_ms(value):
+    '''Returns a Taiga date as int milliseconds since the epoch (MISSING for null).'''
+    if value is None:
+        return TaigaColumns.MISSING
+    try:
+        date = datetime.fromisoformat( value.replace( 'Z' , '+00:00' ) )
+    except ValueError:
+        date = None
+    if date is None or date.tzinfo is None:
+        date = str_to_datetime( value )                   # it knows other formats (and that naive ones are UTC).
+    return round( date.timestamp() * 1000 )
+
+
+
+class TaigaColumns():
+    '''Exports items of list categories as typed columns and loads them back as numpy arrays.'''
+
+    MISSING  = -1                                # null ids and dates.
+    MANIFEST = 'columns.json'
+
+    # kinds of column: ( numpy dtype , array typecode , null )
+    KINDS = { 'int'   : ( 'int64'   , 'q' , MISSING )
+            , 'date'  : ( 'int64'   , 'q' , MISSING )
+            , 'float' : ( 'float64' , 'd' , float( 'nan' ) )
+            , 'bool'  : ( 'bool'    , 'B' , 0 )
+            }
+    COMMON  = ( ( 'id' , 'int' ) , ( 'project' , 'int' ) , ( 'version' , 'int' ) , ( 'owner' , 'int' )
+              , ( 'created_date' , 'date' ) , ( 'modified_date' , 'date' )
+              )
+    ISSUED  = ( ( 'ref' , 'int' ) , ( 'status' , 'int' ) , ( 'assigned_to' , 'int' ) , ( 'is_closed' , 'bool' ) )
+    COLUMNS = { 'epics'       : COMMON + ISSUED + ( ( 'epics_order' , 'int' ) , )
+              , 'userstories' : COMMON + ISSUED + ( ( 'total_points' , 'float' ) , ( 'milestone' , 'int' )
+                                                  , ( 'finish_date' , 'date' ) , ( 'sprint_order' , 'int' )
+                                                  , ( 'backlog_order' , 'int' ) , ( 'kanban_order' , 'int' )
+                                                  )
+              , 'tasks'       : COMMON + ISSUED + ( ( 'user_story' , 'int' ) , ( 'milestone' , 'int' )
+                                                  , ( 'finished_date' , 'date' ) , ( 'us_order' , 'int' )
+                                                  )
+              , 'wiki'        : COMMON + ( ( 'last_modifier' , 'int' ) , ( 'editions' , 'int' ) )
+              }
+
+
+    @classmethod
+    def columns(cls, category):
+        '''Returns the ( column , kind ) of a category. Raises UsageError for other categories.'''
+        if category not in cls.COLUMNS:
+            raise UsageError( 'No columns for {}. Expected one of {}.'.format( category , sorted( cls.COLUMNS ) ) )
+        return cls.COLUMNS[ category ]
+
+
+    @classmethod
+    def export(cls, items , category , folder):
+        '''Writes the columns of items of a category under folder. Returns the number of rows.
+
+        :param: items: iterable of items (their data, not Perceval's envelopes).
+        '''
+        if not numpy:
+            raise UsageError( 'Columnar export needs numpy.' )
+        columns = cls.columns( category )
+        values  = { column: array( cls.KINDS[ kind ][1] ) for column , kind in columns }
+
+        rows = 0
+        for item in items:
+            for column , kind in columns:
+                value = item.get( column )
+                if value is None:
+                    value = cls.KINDS[ kind ][2]
+                elif 'date' == kind:
+                    value = timestamp_ms( value )
+                values[ column ].append( value )
+            rows += 1
+
+        path = os.path.join( folder , category )
+        os.makedirs( path , exist_ok=True )
+        for column , kind in columns:
+            dtype = cls.KINDS[ kind ][0]
+            numpy.save( os.path.join( path , column + '.npy' ) , numpy.frombuffer( values[ column ] , dtype=values[ column ].typecode ).astype( dtype , copy=False ) )
+        with open( os.path.join( path , cls.MANIFEST ) , 'w' ) as f:
+            json.dump( { 'category': category , 'rows': rows
+                       , 'columns': { column: cls.KINDS[ kind ][0] for column , kind in columns }
+                       } , f , indent=2 )
+        return rows
+
+
+    @classmethod
+    def load(cls, folder , category , columns=None):
+        '''Returns the exported columns of a category as memory-mapped (read only) numpy arrays.
+
+        :param: columns: names of the columns to load (all, if missing).
+        :returns: a dict of arrays by column.
+        '''
+        if not numpy:
+            raise UsageError( 'Columnar loading needs numpy.' )
+        path = os.path.join( folder , category )
+        with open( os.path.join( path , cls.MANIFEST ) ) as f:
+            manifest = json.load( f )
+        return { column: numpy.load( os.path.join( path , column + '.npy' ) , mmap_mode='r' )
+                 for column in columns or manifest['columns'] }
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Exports Taiga list categories as memory-mappable columns.' )
+    parser.add_argument( 'folder' )
+    parser.add_argument( '--categories' , nargs='+' , choices=sorted( TaigaColumns.COLUMNS ) , default=sorted( TaigaColumns.COLUMNS ) )
+    parser.add_argument( '--mirror'   , help='TaigaMirror database to export from.' )
+    parser.add_argument( '--url'      , help='Taiga API url to export from.' )
+    parser.add_argument( '--token'    , help='Taiga API token.' )
+    parser.add_argument( '--projects' , nargs='+' , help='projects to export (all mirrored ones, if missing).' )
+    args = parser.parse_args()
+
+    queries = { category: query for category , query , items , kind in Taiga.TAIGA_MAP }
+    for category in args.categories:
+        if args.mirror:
+            with TaigaMirror( args.mirror ) as mirror:
+                projects = args.projects or list( mirror.projects() )
+                items    = ( item for project in projects for item in mirror.items( category , project=project ) )
+                rows     = TaigaColumns.export( items , category , args.folder )
+        else:
+            client = TaigaMinClient( url=args.url , token=args.token )
+            items  = ( item for project in args.projects or []
+                            for page in client.pages( queries[ category ].format( project ) ) for item in page )
+            rows   = TaigaColumns.export( items , category , args.folder )
+        print( category , rows )
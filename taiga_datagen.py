@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Fioddor Superconcentrado
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Purpose: Synthetic Taiga projects of any size, for scaling measurements.
+# Usage..: - From python: TaigaStandIn( TaigaDataGen( seed=1 ).projects( tasks=100000 ) )
+#          - Standalone.: ./taiga_datagen.py --tasks 100000 --userstories 20000 --large-wiki 3 big.json
+#                         ./taiga_standin.py --data big.json
+#
+# Design.: - Items are built from the recorded ones (data/taiga/*.RS), so they have their shapes and
+#            values: a random recorded item of the category is copied and its identity, relations,
+#            dates and text are overwritten.
+#          - modified_date - created_date delays are sampled from the recorded ones. Creation grows
+#            along the project's life, as activity does in real projects.
+#          - Seeded, so that runs can be compared.
+#----------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import json
+import random
+from datetime import timedelta
+
+from grimoirelab_toolkit.datetime import str_to_datetime
+
+from taiga_standin import FIXTURES_DIR , LISTS , load_fixtures
+
+
+def format_date(date):
+    '''Returns a datetime as Taiga does (milliseconds precision).'''
+    return date.strftime( '%Y-%m-%dT%H:%M:%S.%f' )[ :-3 ] + 'Z'
+
+
+
+class TaigaDataGen():
+    '''Generates Taiga projects shaped like the recorded ones.
+
+    :param: fixtures: projects to learn from, as loaded by taiga_standin.load_fixtures.
+    :param: seed: seed for the random generator.
+    '''
+
+    def __init__(self, fixtures=None , seed=None):
+        '''Learns from the recorded projects.'''
+        if fixtures is None:
+            fixtures = load_fixtures( FIXTURES_DIR )
+
+        self.random    = random.Random( seed )
+        self.templates = { category: [] for category in LISTS }
+        self.dicts     = {}
+        for project in fixtures.values():
+            for category , data in project.items():
+                if category in LISTS:
+                    self.templates[ category ].extend( data )
+                else:
+                    self.dicts.setdefault( category , data )
+
+        items         = [ item for category in LISTS for item in self.templates[ category ] ]
+        self.delays   = sorted( ( str_to_datetime( i['modified_date'] ) - str_to_datetime( i['created_date'] ) ).total_seconds()
+                                for i in items if i.get( 'created_date' ) )
+        self.subjects = [ i['subject'] for i in items if i.get( 'subject' ) ]
+        self.texts    = [ i['content'] for i in self.templates['wiki'] if i.get( 'content' ) ]
+        self.statuses = {}
+        for category in LISTS:
+            pairs = { ( i['status'] , json.dumps( i['status_extra_info'] , sort_keys=True ) )
+                      for i in self.templates[ category ] if 'status_extra_info' in i }
+            self.statuses[ category ] = [ ( status , json.loads( info ) ) for status , info in sorted( pairs ) ]
+
+
+    def dates(self, start , end):
+        '''Returns (created , modified) dates within the project's life.
+
+        Creation is more likely late in the project (density grows linearly). Modification follows
+        after one of the recorded delays, but never after the end.
+        '''
+        span     = (end - start).total_seconds()
+        created  = start + timedelta( seconds=span * self.random.triangular( 0 , 1 , 1 ) )
+        modified = min( end , created + timedelta( seconds=self.random.choice( self.delays ) ) )
+        return created , modified
+
+
+    def text(self, size):
+        '''Returns a text of (about) the given size in characters, made of the recorded wiki texts.'''
+        parts , length = [] , 0
+        while length < size:
+            part = self.random.choice( self.texts )
+            parts.append( part )
+            length += len(part) + 2
+        return '\n\n'.join( parts )[ :size ]
+
+
+    def item(self, category , project , number , start , end):
+        '''Returns a new item of the category for the project.'''
+        item = dict( self.random.choice( self.templates[ category ] ) )
+        created , modified = self.dates( start , end )
+
+        item['id']                 = project['id'] * 10**7 + LISTS.index( category ) * 10**6 + number
+        item['project']            = project['id']
+        item['project_extra_info'] = project['extra_info']
+        item['created_date']       = format_date( created )
+        item['modified_date']      = format_date( modified )
+        item['version']            = self.random.randint( 1 , 20 )
+
+        if 'ref' in item:
+            item['ref'] = number
+        if 'subject' in item:
+            item['subject'] = self.random.choice( self.subjects )
+        if self.statuses.get( category ) and 'status' in item:
+            item['status'] , item['status_extra_info'] = self.random.choice( self.statuses[ category ] )
+            if 'is_closed' in item:
+                item['is_closed'] = item['status_extra_info']['is_closed']
+            for field in ( 'finished_date' , 'finish_date' ):
+                if field in item:
+                    item[ field ] = item['modified_date'] if item['is_closed'] else None
+        return item
+
+
+    def project(self, project_id , start='2016-01-01' , days=3 * 365
+               , epics=0 , userstories=0 , tasks=0 , wiki=0 , large_wiki=0 , wiki_size=4 * 2**20
+               ):
+        '''Returns a project with the given number of items of each category.
+
+        :param: large_wiki: how many of the wiki pages are wiki_size characters long. The others
+                            are as long as the recorded ones.
+        '''
+        start = str_to_datetime( start )
+        end   = start + timedelta( days=days )
+
+        basics = dict( self.dicts.get( 'basics' , {} ) )
+        basics.update( id=project_id , slug='synthetic-{}'.format( project_id ) , name='Synthetic {}'.format( project_id )
+                     , created_date=format_date( start ) , modified_date=format_date( end )
+                     )
+        project = { 'id': project_id
+                  , 'extra_info': { 'name': basics['name'] , 'slug': basics['slug'] , 'logo_small_url': None , 'id': project_id }
+                  }
+
+        data = { 'basics'       : basics
+               , 'stats'        : dict( self.dicts.get( 'stats'        , {} ) )
+               , 'issues_stats' : dict( self.dicts.get( 'issues_stats' , {} ) )
+               }
+        sizes = { 'epics': epics , 'userstories': userstories , 'tasks': tasks , 'wiki': wiki }
+        for category in LISTS:
+            data[ category ] = [ self.item( category , project , n + 1 , start , end ) for n in range( sizes[ category ] ) ]
+
+        # relations:
+        stories = data['userstories']
+        for task in data['tasks']:
+            if stories and self.random.random() < 0.7:
+                story = self.random.choice( stories )
+                task['user_story'] = story['id']
+                task['user_story_extra_info'] = { 'id': story['id'] , 'ref': story['ref'] , 'subject': story['subject'] , 'epics': None }
+            else:
+                task['user_story'] , task['user_story_extra_info'] = None , None
+
+        for n , page in enumerate( data['wiki'] ):
+            page['slug']    = 'page-{}'.format( n + 1 )
+            page['content'] = self.text( wiki_size if n < large_wiki else len(page['content']) )
+            page['html']    = '<p>{}</p>'.format( page['content'] )
+
+        # lists are served (as Taiga does) by id:
+        for category in LISTS:
+            data[ category ].sort( key=lambda i: i['id'] )
+        return data
+
+
+    def projects(self, count=1 , first_id=1 , **sizes):
+        '''Returns {project id: project} with count projects of the given sizes (see project).'''
+        return { str(project_id): self.project( project_id , **sizes )
+                 for project_id in range( first_id , first_id + count )
+               }
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Generates synthetic Taiga projects for taiga_standin.py.' )
+    parser.add_argument( 'output' , help='JSON file to write.' )
+    parser.add_argument( '--fixtures'    , default=FIXTURES_DIR , help='folder with recorded .RS responses to learn from.' )
+    parser.add_argument( '--seed'        , type=int , default=1 )
+    parser.add_argument( '--projects'    , type=int , default=1 )
+    parser.add_argument( '--epics'       , type=int , default=100 )
+    parser.add_argument( '--userstories' , type=int , default=20000 )
+    parser.add_argument( '--tasks'       , type=int , default=100000 )
+    parser.add_argument( '--wiki'        , type=int , default=50 )
+    parser.add_argument( '--large-wiki'  , type=int , default=3 , help='wiki pages of --wiki-size characters.' )
+    parser.add_argument( '--wiki-size'   , type=int , default=4 * 2**20 )
+    parser.add_argument( '--days'        , type=int , default=3 * 365 , help='project life span.' )
+    args = parser.parse_args()
+
+    generator = TaigaDataGen( load_fixtures( args.fixtures ) , seed=args.seed )
+    projects  = generator.projects( args.projects , epics=args.epics , userstories=args.userstories , tasks=args.tasks
+                                  , wiki=args.wiki , large_wiki=args.large_wiki , wiki_size=args.wiki_size , days=args.days
+                                  )
+    with open( args.output , 'w' ) as f:
+        json.dump( projects , f )
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Fioddor Superconcentrado
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Purpose: Local mirror of Taiga projects in SQLite, for repeated questions to be answered from disk.
+# Usage..: - From python: with TaigaMirror( 'taiga.sqlite' , TaigaMinClient( url , token ) ) as mirror:
+#                             mirror.sync( '123' )
+#                             for task in mirror.items( 'tasks' , project='123' ): ...
+#          - Standalone.: ./taiga_mirror.py taiga.sqlite --url URL --token TOKEN sync 123 456
+#                         ./taiga_mirror.py taiga.sqlite count tasks
+#
+# Design.: - A table per category of Taiga.TAIGA_MAP. Lists are keyed by item id and indexed by
+#            (project , modified_date). Dicts are keyed by project. Items are kept as JSON text: as
+#            served (see TaigaMinClient.split_items) for lists.
+#          - Projects are named as synced (as Perceval origins), whatever id their items carry.
+#          - Syncs of INCREMENTAL categories only ask for the items modified since the latest one
+#            mirrored (Taiga's modified_date__gte filter). An instance ignoring the filter would
+#            just answer all items: slower, but as right. Items modified at that very date come
+#            again and are overwritten.
+#          - Incremental syncs can't notice deleted items. Full syncs (the first one, those of other
+#            categories and those asked for) replace all the items of the project.
+#          - Each category of each project syncs in a transaction: a failed sync leaves the mirror
+#            as it was.
+#----------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import json
+import sqlite3
+import time
+from urllib.parse import quote
+
+from perceval.backends.core.taiga import Taiga , TaigaMinClient , UsageError
+
+
+
+class TaigaMirror():
+    '''Local mirror of Taiga projects in a SQLite database.
+
+    :param: path: database file (':memory:' for a transient one).
+    :param: client: TaigaMinClient to sync from. Not needed to read.
+    '''
+
+    INCREMENTAL = ( 'epics' , 'userstories' , 'tasks' )
+    QUERIES     = { category: query for category , query , items , kind in Taiga.TAIGA_MAP }
+    KINDS       = { category: kind  for category , query , items , kind in Taiga.TAIGA_MAP }
+
+
+    def __init__(self, path , client=None):
+        '''Opens (or creates) the database.'''
+        self.client = client
+        self.db     = sqlite3.connect( path , check_same_thread=False )
+        self.db.execute( 'PRAGMA journal_mode=WAL' )
+        with self.db:
+            for category , kind in self.KINDS.items():
+                if Taiga.LIST == kind:
+                    self.db.execute( 'CREATE TABLE IF NOT EXISTS {0} ( id INTEGER PRIMARY KEY , project TEXT NOT NULL'
+                                     ' , modified_date TEXT , data TEXT NOT NULL )'.format( category ) )
+                    self.db.execute( 'CREATE INDEX IF NOT EXISTS {0}_by_project ON {0} ( project , modified_date )'.format( category ) )
+                else:
+                    self.db.execute( 'CREATE TABLE IF NOT EXISTS {0} ( project TEXT PRIMARY KEY'
+                                     ' , modified_date TEXT , data TEXT NOT NULL )'.format( category ) )
+            self.db.execute( 'CREATE TABLE IF NOT EXISTS syncs ( project TEXT , category TEXT , synced_on REAL'
+                             ' , items INTEGER , full INTEGER , PRIMARY KEY ( project , category ) )' )
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        self.db.close()
+
+
+    def table(self, category):
+        '''Returns the table of a category. Raises UsageError for unknown ones.'''
+        if category not in self.KINDS:
+            raise UsageError( 'Unknown category {}. Expected one of {}.'.format( category , sorted( self.KINDS ) ) )
+        return category
+
+
+    def sync(self, project , categories=None , full=False):
+        '''Brings the mirror of a project up to date.
+
+        :param: project: project id (as a Perceval origin).
+        :param: categories: categories to sync. All of Taiga.TAIGA_MAP, if missing.
+        :param: full: refetch all the items, even of INCREMENTAL categories.
+        :returns: a dict with the number of items fetched by category.
+        '''
+        if not self.client:
+            raise UsageError( 'A TaigaMirror needs a client to sync.' )
+
+        fetched = {}
+        for category in categories or self.KINDS:
+            table = self.table( category )
+            query = self.QUERIES[ category ].format( project )
+            since = None if full or category not in self.INCREMENTAL else self.high_water( category , project )
+            with self.db:
+                if Taiga.DICT == self.KINDS[ category ]:
+                    data = self.client.rq( query )
+                    self.db.execute( 'INSERT OR REPLACE INTO {} VALUES ( ? , ? , ? )'.format( table )
+                                   , ( project , data.get( 'modified_date' ) , json.dumps( data ) ) )
+                    fetched[ category ] = 1
+                else:
+                    if since:
+                        query += '&modified_date__gte={}'.format( quote( since ) )
+                    else:
+                        self.db.execute( 'DELETE FROM {} WHERE project = ?'.format( table ) , ( project , ) )
+                    fetched[ category ] = 0
+                    for page in self.client.pages( query , raw=True ):
+                        rows = [ ( item['id'] , project , item.get( 'modified_date' ) , text )
+                                 for text , item in self.client.split_items( page ) ]
+                        self.db.executemany( 'INSERT OR REPLACE INTO {} VALUES ( ? , ? , ? , ? )'.format( table ) , rows )
+                        fetched[ category ] += len(rows)
+                self.db.execute( 'INSERT OR REPLACE INTO syncs VALUES ( ? , ? , ? , ? , ? )'
+                               , ( project , category , time.time() , fetched[ category ] , not since ) )
+        return fetched
+
+
+    def high_water(self, category , project):
+        '''Returns the latest modified_date mirrored for a list category of a project (None if none).'''
+        row = self.db.execute( 'SELECT MAX( modified_date ) FROM {} WHERE project = ?'.format( self.table( category ) )
+                             , ( project , ) ).fetchone()
+        return row[0]
+
+
+    def items(self, category , project=None , since=None):
+        '''Yields the mirrored items of a category (by id).
+
+        :param: project: only those of this project.
+        :param: since: only those modified at or after this date (as Taiga writes them).
+        '''
+        where , params = [] , []
+        if project is not None:
+            where.append( 'project = ?' )
+            params.append( project )
+        if since is not None:
+            where.append( 'modified_date >= ?' )
+            params.append( since )
+        order = 'id' if Taiga.LIST == self.KINDS.get( category ) else 'project'
+        sql   = 'SELECT data FROM {}{} ORDER BY {}'.format( self.table( category )
+                                                         , ' WHERE ' + ' AND '.join( where ) if where else ''
+                                                         , order
+                                                         )
+        for ( data , ) in self.db.execute( sql , params ):
+            yield json.loads( data )
+
+
+    def item(self, category , key):
+        '''Returns a mirrored item (None if missing): by id for lists, by project for dicts.'''
+        column = 'id' if Taiga.LIST == self.KINDS.get( category ) else 'project'
+        row = self.db.execute( 'SELECT data FROM {} WHERE {} = ?'.format( self.table( category ) , column ) , ( key , ) ).fetchone()
+        return json.loads( row[0] ) if row else None
+
+
+    def count(self, category , project=None):
+        '''Returns the number of mirrored items of a category (of a project, if given).'''
+        if project is None:
+            return self.db.execute( 'SELECT COUNT(*) FROM {}'.format( self.table( category ) ) ).fetchone()[0]
+        return self.db.execute( 'SELECT COUNT(*) FROM {} WHERE project = ?'.format( self.table( category ) )
+                              , ( project , ) ).fetchone()[0]
+
+
+    def projects(self):
+        '''Returns the mirrored projects with the time they were last synced.'''
+        return dict( self.db.execute( 'SELECT project , MAX( synced_on ) FROM syncs GROUP BY project ORDER BY project' ) )
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Mirrors Taiga projects in a local SQLite database.' )
+    parser.add_argument( 'database' )
+    parser.add_argument( '--url'   , help='Taiga API url (to sync).' )
+    parser.add_argument( '--token' , help='Taiga API token (to sync).' )
+    commands = parser.add_subparsers( dest='command' , required=True )
+    syncing  = commands.add_parser( 'sync' , help='sync projects.' )
+    syncing.add_argument( 'projects' , nargs='+' )
+    syncing.add_argument( '--categories' , nargs='+' , choices=sorted( TaigaMirror.KINDS ) )
+    syncing.add_argument( '--full' , action='store_true' , help='refetch all items.' )
+    counting = commands.add_parser( 'count' , help='count mirrored items.' )
+    counting.add_argument( 'category' , choices=sorted( TaigaMirror.KINDS ) )
+    counting.add_argument( '--project' )
+    args = parser.parse_args()
+
+    client = TaigaMinClient( url=args.url , token=args.token ) if 'sync' == args.command else None
+    with TaigaMirror( args.database , client ) as mirror:
+        if 'sync' == args.command:
+            for project in args.projects:
+                print( project , mirror.sync( project , args.categories , args.full ) )
+        else:
+            print( mirror.count( args.category , args.project ) )
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Fioddor Superconcentrado
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Purpose: Simulated time, for throttling and retry paths to run hours of crawling in milliseconds.
+# Usage..: - Clients: clock = SimClock() ; TaigaMinClient( url , token , clock=clock , sleeper=clock.sleep )
+#          - Policies: ./taiga_sim.py --requests 10000 --limit 100 --window 60 --tokens 1 2 4 --rates 0 1.5
+#
+# Design.: - SimClock is a time source whose sleeps just move it forward.
+#          - simulate crawls with a real TaigaMinClient on the simulated clock, whose transport answers
+#            as SimThrottle says: it throttles each token as Taiga does (a number of requests per time
+#            window). Thus the figures are those of the client's own retry policies (see
+#            TaigaMinClient): a request still throttled when they give up fails (Unexpected_HTTPcode).
+#----------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import itertools
+import json
+import random
+import threading
+from math import ceil
+
+from perceval.backends.core.taiga import TaigaMinClient , Unexpected_HTTPcode
+
+from taiga_cassette import TaigaCassetteResponse
+
+
+
+class SimClock():
+    '''Simulated time source. Call it for the current time, sleep to move it forward.'''
+
+    def __init__(self, start=0):
+        '''Init at start seconds.'''
+        self.now    = start
+        self.slept  = 0                          # total seconds slept.
+        self.sleeps = 0                          # number of sleeps.
+        self.lock   = threading.Lock()
+
+
+    def __call__(self):
+        return self.now
+
+
+    def advance(self, seconds):
+        '''Moves time forward (as work does).'''
+        with self.lock:
+            self.now += seconds
+
+
+    def sleep(self, seconds):
+        '''Moves time forward (as waits do), counting it.'''
+        with self.lock:
+            self.now    += seconds
+            self.slept  += seconds
+            self.sleeps += 1
+
+
+
+class SimThrottle():
+    '''Throttles each token to limit requests per window seconds of a SimClock, as Taiga does.'''
+
+    def __init__(self, clock , limit=100 , window=60):
+        self.clock   = clock
+        self.limit   = limit
+        self.window  = window
+        self.windows = {}                        # (start , count) by token.
+
+
+    def check(self, token):
+        '''Counts a request. Returns the seconds the 429 reply would announce, or 0 if not throttled.'''
+        now = self.clock()
+        start , count = self.windows.get( token , ( now , 0 ) )
+        if self.window <= now - start:
+            start , count = now , 0
+        if self.limit <= count:
+            return max( 1 , ceil( self.window - (now - start) ) )
+        self.windows[ token ] = ( start , count + 1 )
+        return 0
+
+
+
+class SimTransport():
+    '''Transport for TaigaMinClient (its transport argument) answering as a SimThrottle says.
+
+    :param: latency , jitter: seconds each request takes, plus a random part up to jitter.
+    '''
+
+    THROTTLED = 'Request was throttled.Expected available in {} seconds.'
+
+
+    def __init__(self, throttle , latency=0.05 , jitter=0 , seed=None):
+        self.throttle  = throttle
+        self.latency   = latency
+        self.jitter    = jitter
+        self.randomly  = random.Random( seed )
+        self.requests  = 0
+        self.throttled = 0                       # 429 replies.
+
+
+    def get(self, url , headers=None , **kwargs):
+        self.requests += 1
+        self.throttle.clock.advance( self.latency + self.randomly.uniform( 0 , self.jitter ) )
+        delay = self.throttle.check( headers['Authorization'].split()[-1] )
+        if delay:
+            self.throttled += 1
+            status , body = 429 , { '_error_message': self.THROTTLED.format( delay ) }
+        else:
+            status , body = 200 , {}
+        return TaigaCassetteResponse( status , {} , json.dumps( body ).encode( 'utf-8' ) , 'get' , url , dict( kwargs , headers=headers ) )
+
+
+
+RUNS = itertools.count()                         # each simulation has its own instance (and circuit breaker).
+
+
+def simulate(requests=1000 , tokens=1 , rate=None , limit=100 , window=60 , latency=0.05 , jitter=0 , seed=None):
+    '''Simulates a crawl of a TaigaMinClient. Returns its figures.
+
+    :param: tokens: number of pooled tokens.
+    :param: rate: maximum requests per second for each token (as TaigaMinClient's token_rate).
+    :param: latency , jitter: seconds each request takes, plus a random part up to jitter.
+    :returns: a dict with requests, throttled (429 replies), failed (requests still throttled when
+              retried), seconds (simulated), slept (seconds waited) and throughput (successful
+              requests per second).
+    '''
+    clock     = SimClock()
+    transport = SimTransport( SimThrottle( clock , limit , window ) , latency , jitter , seed )
+    names     = [ 'token_{}'.format( n ) for n in range( tokens ) ]
+    client    = TaigaMinClient( url='https://simulated-{}.taiga/api/v1/'.format( next( RUNS ) )
+                              , token=names if 1 < tokens or rate else names[0] , token_rate=rate
+                              , clock=clock , sleeper=clock.sleep , transport=transport
+                              )
+    failed = 0
+    for n in range( requests ):
+        try:
+            client.rq( 'projects/{}'.format( n ) )
+        except Unexpected_HTTPcode:
+            failed += 1
+
+    return { 'requests'   : requests
+           , 'throttled'  : transport.throttled
+           , 'failed'     : failed
+           , 'seconds'    : clock()
+           , 'slept'      : clock.slept
+           , 'throughput' : (requests - failed) / clock() if clock() else None
+           }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Simulates throttled crawls to compare scheduling policies.' )
+    parser.add_argument( '--requests' , type=int   , default=10000 )
+    parser.add_argument( '--limit'    , type=int   , default=100 , help='requests a token may send per window.' )
+    parser.add_argument( '--window'   , type=float , default=60  , help='throttling window in seconds.' )
+    parser.add_argument( '--latency'  , type=float , default=0.05 )
+    parser.add_argument( '--jitter'   , type=float , default=0 )
+    parser.add_argument( '--tokens'   , type=int   , nargs='+' , default=[ 1 , 2 , 4 ] )
+    parser.add_argument( '--rates'    , type=float , nargs='+' , default=[ 0 ] , help='token rates (0 for none).' )
+    parser.add_argument( '--seed'     , type=int   , default=1 )
+    args = parser.parse_args()
+
+    for tokens in args.tokens:
+        for rate in args.rates:
+            r = simulate( args.requests , tokens , rate , args.limit , args.window , args.latency , args.jitter , args.seed )
+            print( '{:>3} tokens at {:>6} rq/s: {:>6} x 429, {:>6} failed, {:>10.0f} s ({:>10.0f} s waiting), {:>8.2f} rq/s'.format(
+                   tokens , rate or '-' , r['throttled'] , r['failed'] , r['seconds'] , r['slept'] , r['throughput'] ) )
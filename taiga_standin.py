@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Fioddor Superconcentrado
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Purpose: Local stand-in for a Taiga API service, for offline load testing.
+# Usage..: - From python: with TaigaStandIn.from_fixtures() as server: ... server.url ...
+#          - Standalone.: ./taiga_standin.py --port 8000 --latency 0.05 --throttle 100 60
+#
+# Design.: - Serves the endpoints this backend uses (see Taiga.TAIGA_MAP) plus auth.
+#          - Lists are paginated with Taiga's x-pagination-* headers.
+#          - Lists of FILTERED categories take Taiga's modified_date__gte/__gt/__lt filters. Dates
+#            compare as strings, as they're all written alike (see taiga_datagen.format_date).
+#          - Throttling, latency and errors can be injected to load test the client.
+#          - Standard library only, so that it runs on any machine with no network.
+#----------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import ast
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler , ThreadingHTTPServer
+from math import ceil
+from urllib.parse import parse_qs , urlsplit
+
+
+FIXTURES_DIR = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ) , 'data' , 'taiga' )
+
+LISTS = ( 'epics' , 'userstories' , 'tasks' , 'wiki' )
+DICTS = ( 'basics' , 'stats' , 'issues_stats' )
+
+FILTERED = ( 'epics' , 'userstories' , 'tasks' )
+FILTERS  = { 'modified_date__gte': lambda date , limit: limit <= date
+           , 'modified_date__gt' : lambda date , limit: limit <  date
+           , 'modified_date__lt' : lambda date , limit: date  <  limit
+           }
+
+
+
+class TaigaStandIn():
+    '''Local stand-in for a Taiga API service.
+
+    Data...: a dict of projects by id (as a string). Each project is a dict with the data of its
+             categories: dicts for basics, stats and issues_stats, lists for epics, userstories,
+             tasks and wiki. Missing categories are served empty.
+
+    Faults.: - throttle : (requests , seconds). Each token can send that many requests every that many
+                          seconds. Excess requests get Taiga's 429 reply.
+             - latency  : seconds to wait before each reply, plus a random jitter up to latency_jitter.
+             - error_rate , error_code : probability of replying error_code instead.
+             - tokens   : if given, other tokens get Taiga's 401 reply.
+    '''
+
+    API_PATH = '/api/v1/'
+
+
+    def __init__(self, projects=None , per_page=30
+                , throttle=None , latency=0 , latency_jitter=0
+                , error_rate=0 , error_code=500 , tokens=None , seed=None
+                ):
+        '''Init stand-in (not yet serving).'''
+        self.projects       = projects or {}
+        self.per_page       = per_page
+        self.throttle       = throttle
+        self.latency        = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate     = error_rate
+        self.error_code     = error_code
+        self.tokens         = tokens
+        self.random         = random.Random( seed )
+
+        self.lock     = threading.Lock()
+        self.windows  = {}                       # throttling window (start , count) by token.
+        self.served   = 0
+        self.replies  = {}                       # count of replies by HTTP code.
+        self.server   = None
+        self.thread   = None
+        self.url      = None
+
+
+    @classmethod
+    def from_fixtures(cls, folder=FIXTURES_DIR , **kwargs):
+        '''Returns a stand-in serving the recorded responses under folder.'''
+        return cls( load_fixtures( folder ) , **kwargs )
+
+
+    def start(self, host='127.0.0.1' , port=0):
+        '''Starts serving in a daemon thread. Returns the API base url.
+
+        :param: port: port to listen at. 0 picks a free one.
+        '''
+        standin = self
+
+        class Handler( StandInHandler ):
+            server_data = standin
+
+        self.server = ThreadingHTTPServer( (host , port) , Handler )
+        self.server.daemon_threads = True
+        self.thread = threading.Thread( target=self.server.serve_forever , daemon=True )
+        self.thread.start()
+
+        host , port = self.server.server_address[ :2 ]
+        self.url = 'http://{}:{}{}'.format( host , port , self.API_PATH )
+        return self.url
+
+
+    def stop(self):
+        '''Stops serving.'''
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+    def throttled(self, token):
+        '''Returns the seconds the token has to wait if it's throttled now, or 0.'''
+        if not self.throttle:
+            return 0
+
+        limit , window = self.throttle
+        now = time.monotonic()
+        with self.lock:
+            start , count = self.windows.get( token , ( now , 0 ) )
+            if window <= now - start:
+                start , count = now , 0
+            if limit <= count:
+                return max( 1 , ceil( window - (now - start) ) )
+            self.windows[ token ] = ( start , count + 1 )
+        return 0
+
+
+    def count(self, code):
+        '''Counts a reply.'''
+        with self.lock:
+            self.served += 1
+            self.replies[ code ] = self.replies.get( code , 0 ) + 1
+
+
+    def resolve(self, path , query):
+        '''Returns (category , project data) for an API path and query, or (None , None).'''
+        if path.startswith( self.API_PATH ):
+            path = path[ len(self.API_PATH): ]
+        parts = path.strip( '/' ).split( '/' )
+
+        if 'projects' == parts[0] and 2 == len(parts):
+            return 'basics' , self.projects.get( parts[1] )
+        if 'projects' == parts[0] and 3 == len(parts) and parts[2] in DICTS:
+            return parts[2] , self.projects.get( parts[1] )
+        if 1 == len(parts) and parts[0] in LISTS and 'project' in query:
+            return parts[0] , self.projects.get( query['project'][0] )
+        return None , None
+
+
+    def page(self, category , project , query , url):
+        '''Returns (body , headers) of the requested page of a list.'''
+        items = project.get( category , [] ) if project else []
+        if category in FILTERED:
+            for name , test in FILTERS.items():
+                if name in query:
+                    items = [ i for i in items if test( i['modified_date'] , query[ name ][0] ) ]
+
+        page  = int( query.get( 'page' , [ '1' ] )[0] )
+        size  = int( query.get( 'page_size' , [ self.per_page ] )[0] )
+        first = (page - 1) * size
+
+        headers = { 'x-paginated'          : 'true'
+                  , 'x-paginated-by'       : str(size)
+                  , 'x-pagination-count'   : str(len(items))
+                  , 'x-pagination-current' : str(page)
+                  }
+        if first + size < len(items):
+            headers['X-Pagination-Next'] = page_url( url , page + 1 )
+        if 1 < page:
+            headers['X-Pagination-Prev'] = page_url( url , page - 1 )
+
+        return items[ first : first + size ] , headers
+
+
+
+class StandInHandler( BaseHTTPRequestHandler ):
+    '''Handles the requests to a TaigaStandIn (as its server_data).'''
+
+    server_data = None
+    protocol_version = 'HTTP/1.1'
+
+
+    def reply(self, code , body , headers=None):
+        '''Sends a JSON reply.'''
+        # counted first, so that clients never get ahead of the counters:
+        self.server_data.count( code )
+        data = json.dumps( body ).encode( 'utf-8' )
+        self.send_response( code )
+        self.send_header( 'Content-Type'   , 'application/json' )
+        self.send_header( 'Content-Length' , str(len(data)) )
+        for name , value in (headers or {}).items():
+            self.send_header( name , value )
+        self.end_headers()
+        self.wfile.write( data )
+
+
+    def fault(self):
+        '''Injects latency and returns a faulty reply (code , body) if due, else None.'''
+        standin = self.server_data
+
+        if standin.latency or standin.latency_jitter:
+            time.sleep( standin.latency + standin.random.uniform( 0 , standin.latency_jitter ) )
+
+        if standin.error_rate and standin.random.random() < standin.error_rate:
+            return standin.error_code , { '_error_message': 'Injected error.' , '_error_type': 'standin.InjectedError' }
+
+        token = self.headers.get( 'Authorization' , '' ).replace( 'Bearer ' , '' )
+        if standin.tokens is not None and token not in standin.tokens:
+            return 401 , { '_error_message': 'Invalid token' , '_error_type': 'taiga.base.exceptions.NotAuthenticated' }
+
+        delay = standin.throttled( token )
+        if delay:
+            return 429 , { '_error_message': 'Request was throttled.Expected available in {} seconds.'.format( delay )
+                         , '_error_type'   : 'taiga.base.exceptions.Throttled'
+                         }
+        return None
+
+
+    def do_GET(self):
+        standin = self.server_data
+
+        faulty = self.fault()
+        if faulty:
+            self.reply( *faulty )
+            return
+
+        parts = urlsplit( self.path )
+        query = parse_qs( parts.query )
+        category , project = standin.resolve( parts.path , query )
+
+        if not category or (category in DICTS and project is None):
+            self.reply( 404 , { '_error_message': 'No Project matches the given query.' , '_error_type': 'taiga.base.exceptions.NotFound' } )
+        elif category in DICTS:
+            self.reply( 200 , project.get( category , {} ) )
+        else:
+            url = 'http://{}{}'.format( self.headers.get( 'Host' ) , self.path )
+            self.reply( 200 , *standin.page( category , project , query , url ) )
+
+
+    def do_POST(self):
+        length = int( self.headers.get( 'Content-Length' , 0 ) )
+        self.rfile.read( length )
+
+        if self.server_data.API_PATH + 'auth' != urlsplit( self.path ).path:
+            self.reply( 404 , { '_error_message': 'Not found.' } )
+        else:
+            self.reply( 200 , { 'auth_token': 'a_standin_token' } )
+
+
+    def log_message(self, format , *args):
+        '''Quiet.'''
+        pass
+
+
+
+def page_url(url , page):
+    '''Returns the url of the given page of a paginated url.'''
+    url = re.sub( r'[?&]page=\d+' , '' , url )
+    return '{}{}page={}'.format( url , '&' if '?' in url else '?' , page )
+
+
+FIXTURE = re.compile( r'^(?:pj(?P<project>\d+)_)?(?P<category>[a-z_]+)\.P(?P<page>\d+)\.body\.RS$' )
+
+
+def fixture_pages(folder=FIXTURES_DIR , categories=None):
+    '''Yields ( filename , project , category , page ) of the .RS fixtures (their bodies) under folder.
+
+    Pages of pjNN_<category>.P<page> files are for project NN. Those of <category>.P<page> files are
+    for the project named in their pagination urls.
+
+    :param: categories: only those of these categories (all, if missing).
+    '''
+    for filename in sorted( os.listdir( folder ) ):
+        match = FIXTURE.match( filename )
+        if not match or (categories is not None and match.group( 'category' ) not in categories):
+            continue
+
+        project = match.group( 'project' )
+        if not project:
+            with open( os.path.join( folder , filename.replace( '.body.' , '.head.' ) ) ) as f:
+                head = ast.literal_eval( f.read() )
+            link = head.get( 'X-Pagination-Next' ) or head.get( 'X-Pagination-Prev' )
+            project = parse_qs( urlsplit( link ).query )['project'][0]
+        yield filename , project , match.group( 'category' ) , int( match.group( 'page' ) )
+
+
+def load_fixtures(folder=FIXTURES_DIR):
+    '''Returns the projects recorded in the .RS fixtures under folder (see fixture_pages).'''
+    pages = {}
+    for filename , project , category , page in fixture_pages( folder , LISTS + DICTS ):
+        with open( os.path.join( folder , filename ) ) as f:
+            body = json.load( f )
+        pages.setdefault( ( project , category ) , [] ).append( ( page , body ) )
+
+    projects = {}
+    for ( project , category ) , bodies in pages.items():
+        data = projects.setdefault( project , {} )
+        if category in DICTS:
+            data[ category ] = bodies[0][1]
+        else:
+            data[ category ] = [ item for page , body in sorted( bodies , key=lambda b: b[0] ) for item in body ]
+    return projects
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Local stand-in for a Taiga API service.' )
+    parser.add_argument( '--host'       , default='127.0.0.1' )
+    parser.add_argument( '--port'       , type=int   , default=8000 )
+    parser.add_argument( '--fixtures'   , default=FIXTURES_DIR , help='folder with recorded .RS responses.' )
+    parser.add_argument( '--data'       , help='JSON file with projects to serve (instead of fixtures).' )
+    parser.add_argument( '--per-page'   , type=int   , default=30 )
+    parser.add_argument( '--throttle'   , type=float , nargs=2 , metavar=('REQUESTS' , 'SECONDS') )
+    parser.add_argument( '--latency'    , type=float , default=0 )
+    parser.add_argument( '--jitter'     , type=float , default=0 )
+    parser.add_argument( '--error-rate' , type=float , default=0 )
+    parser.add_argument( '--error-code' , type=int   , default=500 )
+    args = parser.parse_args()
+
+    if args.data:
+        with open( args.data ) as f:
+            projects = json.load( f )
+    else:
+        projects = load_fixtures( args.fixtures )
+
+    standin = TaigaStandIn( projects , per_page=args.per_page , throttle=args.throttle
+                          , latency=args.latency , latency_jitter=args.jitter
+                          , error_rate=args.error_rate , error_code=args.error_code
+                          )
+    print( 'Serving {} projects at {}'.format( len(projects) , standin.start( args.host , args.port ) ) )
+    try:
+        while True:
+            time.sleep( 3600 )
+    except KeyboardInterrupt:
+        standin.stop()
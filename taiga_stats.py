@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Fioddor Superconcentrado
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# Purpose: Projects' stats and issues_stats computed locally from their items, instead of asking Taiga.
+# Usage..: - From python: engine = TaigaStats.from_mirror( mirror )
+#                         differences = engine.cross_check( { p: mirror.item( 'stats' , p ) for p in mirror.projects() } )
+#                         engine.add( project , basics , userstories , issues )    # for issues_stats too.
+#          - Standalone.: ./taiga_stats.py taiga.sqlite --check
+#
+# Design.: - Projects are added one by one, but computed all at once: their items are held as
+#            columns (one row per user story , role points or issue) tagged with the project's index.
+#            Columns grow as compact stdlib arrays, and are turned into the ones computed on only
+#            once after adding.
+#          - With numpy (optional), sums and counts by project are single bincount calls over the
+#            columns. Without it, the same columns are summed in Python.
+#          - As Taiga does: points are those of the user stories (their total_points, or their role
+#            points for the *_per_role breakdowns). Closed points are those of closed stories,
+#            assigned ones those of stories in a sprint. Speed is the average of the closed points
+#            of the closed sprints. Totals of milestones and points are the project's settings.
+#          - Breakdowns only have the values found in the items (as Taiga's). Issues are broken down
+#            by their ids, named after the project's definitions (see basics).
+#          - issues_stats are only computed for projects whose issues were added. Issues aren't a
+#            category of Taiga.TAIGA_MAP, so mirrors don't have them: from_mirror (and --check) only
+#            compute stats.
+#
+# Pending: - The milestones burndown of stats and the last_four_weeks_days of issues_stats.
+#          - Mirroring issues (they have to be fetched apart).
+#----------------------------------------------------------------------------------------------------------------------
+
+import argparse
+import json
+import math
+from array import array
+
+try:
+    import numpy                                    # optional, to compute vectorised.
+except ImportError:
+    numpy = None
+
+from perceval.backends.core.taiga import UsageError
+
+from taiga_mirror import TaigaMirror
+
+
+
+class TaigaStats():
+    '''Computes the stats and issues_stats of projects from their items, as Taiga does.
+
+    :param: vectorised: compute with numpy. If missing, whenever numpy is installed.
+    '''
+
+    MISSING   = -1                               # null ids.
+    STATS     = ( 'total_milestones' , 'total_points' , 'defined_points' , 'closed_points' , 'assigned_points' , 'speed' )
+    PER_ROLE  = ( 'defined_points' , 'closed_points' , 'assigned_points' )
+    # breakdown of issues_stats , issue field , basics list naming their values:
+    BREAKDOWN = ( ( 'issues_per_status'      , 'status'      , 'issue_statuses' )
+                , ( 'issues_per_priority'    , 'priority'    , 'priorities'     )
+                , ( 'issues_per_severity'    , 'severity'    , 'severities'     )
+                , ( 'issues_per_type'        , 'type'        , 'issue_types'    )
+                , ( 'issues_per_owner'       , 'owner'       , None             )
+                , ( 'issues_per_assigned_to' , 'assigned_to' , None             )
+                )
+
+
+    def __init__(self, vectorised=None):
+        '''Init with no projects.'''
+        if vectorised and not numpy:
+            raise UsageError( 'Vectorised stats need numpy.' )
+        self.vectorised = bool( numpy ) if vectorised is None else vectorised
+
+        self.projects = []                       # project ids, by index.
+        self.basics   = []                       # their basics, by index.
+        self.issued   = set()                    # indexes of the projects whose issues were added.
+        # speed: points of the stories closed in closed sprints.
+        self.stories  = { 'project': array( 'q' ) , 'points': array( 'd' ) , 'closed': array( 'B' ) , 'assigned': array( 'B' ) , 'speed': array( 'd' ) }
+        self.roles    = { 'project': array( 'q' ) , 'role': array( 'q' ) , 'value': array( 'd' ) , 'closed': array( 'B' ) , 'assigned': array( 'B' ) }
+        self.issues   = { 'project': array( 'q' ) , 'closed': array( 'B' ) }
+        self.issues.update( ( field , array( 'q' ) ) for name , field , listed in self.BREAKDOWN )
+        self.names    = {}                       # ( breakdown , value id ) => description.
+        self.frozen   = None                     # the columns computed on (see __columns__).
+
+
+    def add(self, project , basics , userstories=() , issues=None):
+        '''Adds a project: its basics and (iterables of) its items.
+
+        :param: issues: its issues. Without them, the project has no issues_stats.
+        '''
+        index = len(self.projects)
+        self.projects.append( project )
+        self.basics.append( basics )
+        self.frozen = None
+
+        values     = { p['id']: p['value'] for p in basics.get( 'points' , [] ) }
+        computable = { str(r['id']) for r in basics.get( 'roles' , [] ) if r.get( 'computable' ) }
+        closed     = { m['id'] for m in basics.get( 'milestones' , [] ) if m.get( 'closed' ) }
+
+        for story in userstories:
+            in_sprint = story.get( 'milestone' ) is not None
+            points    = story.get( 'total_points' ) or 0
+            self.stories['project'].append( index )
+            self.stories['points'].append( points )
+            self.stories['closed'].append( bool( story.get( 'is_closed' ) ) )
+            self.stories['assigned'].append( in_sprint )
+            self.stories['speed'].append( points if story.get( 'is_closed' ) and in_sprint and story['milestone'] in closed else 0 )
+            for role , point in (story.get( 'points' ) or {}).items():
+                if role in computable and values.get( point ) is not None:
+                    self.roles['project'].append( index )
+                    self.roles['role'].append( int(role) )
+                    self.roles['value'].append( values[ point ] )
+                    self.roles['closed'].append( bool( story.get( 'is_closed' ) ) )
+                    self.roles['assigned'].append( in_sprint )
+
+        for name , field , listed in self.BREAKDOWN:
+            for value in basics.get( listed , [] ) if listed else []:
+                self.names[ ( name , value['id'] ) ] = { 'name': value.get( 'name' ) , 'color': value.get( 'color' ) }
+        if issues is None:
+            return
+        self.issued.add( index )
+        for issue in issues:
+            self.issues['project'].append( index )
+            self.issues['closed'].append( bool( issue.get( 'is_closed' ) ) )
+            for name , field , listed in self.BREAKDOWN:
+                self.issues[ field ].append( self.MISSING if issue.get( field ) is None else issue[ field ] )
+                extra = issue.get( field + '_extra_info' )
+                if not listed and extra and issue.get( field ) is not None:
+                    self.names.setdefault( ( name , issue[ field ] ) , { 'name': extra.get( 'full_name_display' ) } )
+
+
+    @classmethod
+    def from_mirror(cls, mirror , projects=None , vectorised=None):
+        '''Returns an engine with the mirrored projects (all, if missing) added. Without issues (see Design).'''
+        engine = cls( vectorised )
+        for project in projects or mirror.projects():
+            engine.add( project , mirror.item( 'basics' , project ) or {} , mirror.items( 'userstories' , project=project ) )
+        return engine
+
+
+    def __columns__(self):
+        '''Returns the stories, roles and issues columns to compute on (numpy arrays if vectorised).
+
+        They're built once after adding, whatever the number of computations.
+        '''
+        if self.frozen is None:
+            def column( values ):
+                if not self.vectorised:
+                    return values
+                return numpy.array( values , dtype=bool if 'B' == values.typecode else values.typecode )
+            self.frozen = { name: { field: column( values ) for field , values in columns.items() }
+                            for name , columns in ( ( 'stories' , self.stories ) , ( 'roles' , self.roles ) , ( 'issues' , self.issues ) ) }
+        return self.frozen
+
+
+    def __sums__(self, keys , weights , size):
+        '''Returns the sums of weights (or counts, if None) by key (in range(size)), as a list.'''
+        if self.vectorised:
+            return numpy.bincount( keys , weights=weights , minlength=size ).tolist()
+        sums = [ 0.0 ] * size
+        for n , key in enumerate( keys ):
+            sums[ key ] += 1 if weights is None else weights[ n ]
+        return sums
+
+
+    def __masked__(self, values , mask):
+        '''Returns the values where mask is true, 0 elsewhere.'''
+        if self.vectorised:
+            return numpy.where( mask , values , 0 )
+        return [ value if taken else 0 for value , taken in zip( values , mask ) ]
+
+
+    def __groups__(self, keys , ids , weights=None , mask=None):
+        '''Returns { key: { id: ( sum , count ) } } of the weights (or 1s) grouped by key and id.
+
+        :param: keys: project index of each row.
+        :param: ids: value id of each row. Rows with no id (MISSING) are left out.
+        :param: mask: rows to take (all, if missing).
+        '''
+        groups = {}
+        if self.vectorised:
+            taken = ids != self.MISSING
+            if mask is not None:
+                taken &= mask
+            pairs = numpy.stack( [ keys[ taken ] , ids[ taken ] ] , axis=1 )
+            if not len(pairs):
+                return groups
+            unique , inverse , counts = numpy.unique( pairs , axis=0 , return_inverse=True , return_counts=True )
+            sums = numpy.bincount( inverse.reshape(-1) , weights=None if weights is None else weights[ taken ] , minlength=len(unique) )
+            for ( key , value ) , total , count in zip( unique.tolist() , sums.tolist() , counts.tolist() ):
+                groups.setdefault( key , {} )[ value ] = ( total , count )
+            return groups
+        for n , ( key , value ) in enumerate( zip( keys , ids ) ):
+            if self.MISSING == value or (mask is not None and not mask[ n ]):
+                continue
+            total , count = groups.setdefault( key , {} ).get( value , ( 0 , 0 ) )
+            groups[ key ][ value ] = ( total + (1 if weights is None else weights[ n ]) , count + 1 )
+        return groups
+
+
+    def stats(self):
+        '''Returns the stats of each project, by project.'''
+        columns  = self.__columns__()
+        size , s , r = len(self.projects) , columns['stories'] , columns['roles']
+        defined  = self.__sums__( s['project'] , s['points'] , size )
+        closed   = self.__sums__( s['project'] , self.__masked__( s['points'] , s['closed'] )   , size )
+        assigned = self.__sums__( s['project'] , self.__masked__( s['points'] , s['assigned'] ) , size )
+        in_sprints = self.__sums__( s['project'] , s['speed'] , size )
+
+        per_role = { 'defined_points'  : self.__groups__( r['project'] , r['role'] , r['value'] )
+                   , 'closed_points'   : self.__groups__( r['project'] , r['role'] , r['value'] , r['closed'] )
+                   , 'assigned_points' : self.__groups__( r['project'] , r['role'] , r['value'] , r['assigned'] )
+                   }
+
+        output = {}
+        for index , project in enumerate( self.projects ):
+            basics  = self.basics[ index ]
+            sprints = basics.get( 'total_closed_milestones' ) or 0
+            stats   = { 'name'             : basics.get( 'name' )
+                      , 'total_milestones' : basics.get( 'total_milestones' )
+                      , 'total_points'     : basics.get( 'total_story_points' )
+                      , 'defined_points'   : defined[ index ]
+                      , 'closed_points'    : closed[ index ]
+                      , 'assigned_points'  : assigned[ index ]
+                      , 'speed'            : in_sprints[ index ] / sprints if sprints else 0
+                      }
+            for field , groups in per_role.items():
+                stats[ field + '_per_role' ] = { str(role): total for role , ( total , count ) in sorted( groups.get( index , {} ).items() ) }
+            output[ project ] = stats
+        return output
+
+
+    def issues_stats(self):
+        '''Returns the issues_stats of each project whose issues were added, by project.'''
+        size , i = len(self.projects) , self.__columns__()['issues']
+        total  = self.__sums__( i['project'] , None , size )
+        closed = self.__sums__( i['project'] , i['closed'] , size )
+
+        breakdowns = { name: self.__groups__( i['project'] , i[ field ] )
+                       for name , field , listed in self.BREAKDOWN
+                     }
+        output = {}
+        for index , project in enumerate( self.projects ):
+            if index not in self.issued:
+                continue
+            stats = { 'total_issues'  : int( total[ index ] )
+                    , 'opened_issues' : int( total[ index ] - closed[ index ] )
+                    , 'closed_issues' : int( closed[ index ] )
+                    }
+            for name , groups in breakdowns.items():
+                stats[ name ] = { str(value): dict( self.names.get( ( name , value ) , {} ) , id=value , count=count )
+                                  for value , ( weight , count ) in sorted( groups.get( index , {} ).items() ) }
+            output[ project ] = stats
+        return output
+
+
+    @staticmethod
+    def differences(local , served , tolerance=1e-9):
+        '''Returns the differences between local and served stats (or issues_stats) of a project.
+
+        Only what both have is compared: numbers (with a relative tolerance), and the counts (or
+        amounts) of the breakdowns.
+
+        :returns: a dict of ( local , served ) values by field (by 'field.value' for breakdowns).
+        '''
+        def same( a , b ):
+            if isinstance( a , ( int , float ) ) and isinstance( b , ( int , float ) ):
+                return math.isclose( a , b , rel_tol=tolerance , abs_tol=tolerance )
+            return a == b
+
+        output = {}
+        for field , value in local.items():
+            if field not in served or 'name' == field:
+                continue
+            other = served[ field ]
+            if isinstance( value , dict ) and isinstance( other , dict ):
+                for key in set( value ) | set( other ):
+                    a , b = value.get( key ) , other.get( key )
+                    a = a['count'] if isinstance( a , dict ) else a
+                    b = b['count'] if isinstance( b , dict ) else b
+                    if not same( a , b ):
+                        output[ '{}.{}'.format( field , key ) ] = ( a , b )
+            elif not same( value , other ):
+                output[ field ] = ( value , other )
+        return output
+
+
+    def cross_check(self, served_stats=None , served_issues_stats=None):
+        '''Returns the differences with the served values (see differences), by project.
+
+        :param: served_stats , served_issues_stats: dicts of the values served by Taiga, by project.
+                Served issues_stats are only checked for the projects whose issues were added.
+        :returns: a dict with the differences of the projects that have any.
+        '''
+        output = {}
+        for computed , served in ( ( self.stats() , served_stats or {} ) , ( self.issues_stats() , served_issues_stats or {} ) ):
+            for project , values in computed.items():
+                if served.get( project ):
+                    differences = self.differences( values , served[ project ] )
+                    if differences:
+                        output.setdefault( project , {} ).update( differences )
+        return output
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Computes the stats of mirrored projects (see taiga_mirror.py).' )
+    parser.add_argument( 'database' )
+    parser.add_argument( '--projects' , nargs='+' , help='projects to compute (all mirrored ones, if missing).' )
+    parser.add_argument( '--check' , action='store_true' , help='print the differences with the mirrored (served) stats instead.' )
+    parser.add_argument( '--no-numpy' , dest='vectorised' , action='store_false' , default=None )
+    args = parser.parse_args()
+
+    with TaigaMirror( args.database ) as mirror:
+        engine = TaigaStats.from_mirror( mirror , args.projects , args.vectorised )
+        if args.check:
+            print( json.dumps( engine.cross_check( { p: mirror.item( 'stats' , p ) for p in engine.projects } ) , indent=2 ) )
+        else:
+            print( json.dumps( engine.stats() , indent=2 ) )
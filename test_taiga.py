@@ -28,18 +28,32 @@
 # Pending:
 #   - More TCs:
 #     - More mocked proj TCs.
-#     - Expired token => HTTP 301?
 #   - readfile shold be shared with gitlab (remove when integrating and ask for it to be moved).
 #----------------------------------------------------------------------------------------------------------------------
 
 import unittest                       # common usage.
 import configparser                   # common usage. 
 import httpretty as mock, os , json   # for TestTaigaClientAgainstMockServer.
+import tempfile , base64              # for token cache tests.
+import threading                      # for concurrency tests.
+import urllib.request                 # for local endpoint tests.
+
+from taiga_standin import TaigaStandIn  # for TestTaigaClientAgainstLocalServer.
+from taiga_datagen import TaigaDataGen  # for TestTaigaClientAgainstLocalServer.
+import bench_taiga                      # for TestTaigaClientAgainstLocalServer.
+from taiga_sim import SimClock , simulate  # for simulated time.
+from taiga_cassette import TaigaCassette , TaigaCassetteResponse  # for TestTaigaClientAgainstCassette.
+import requests                         # for transport errors.
+from taiga_mirror import TaigaMirror      # for TestTaigaClientAgainstLocalServer.
+import taiga_stats                        # for TestTaigaClientAgainstLocalServer.
+from taiga_stats import TaigaStats        # for TestTaigaClientAgainstLocalServer.
+import taiga_columns                      # for TestTaigaClientAgainstLocalServer.
+from taiga_columns import TaigaColumns , timestamp_ms  # for TestTaigaClientAgainstLocalServer.
+from taiga_analytics import TaigaAnalytics  # for TestTaigaClientAgainstLocalServer.
 
 import pkg_resources
 pkg_resources.declare_namespace('perceval.backends')
 
-from grimoirelab_toolkit.datetime import datetime_utcnow
 
 # for common usage:
 from perceval.backends.core.taiga import TaigaMinClient as TaigaClient
@@ -98,7 +112,113 @@ class TestTaigaCommand(unittest.TestCase):
         self.assertEqual( TST_URL , pa.url       )
         self.assertEqual( TST_TKN , pa.api_token )
         self.assertEqual( TST_TAG , pa.tag       )
+        
+        # TC03: projected:
+        args = [ '--url'       , TST_URL
+               , '--api-token' , TST_TKN
+               , '--include'   , 'tasks:subject'
+               , '--exclude'   , 'wiki:content'
+               , '--exclude'   , 'epics:color'
+               , TST_ORI
+               ]
+        
+        pa = parser.parse(*args)
+        
+        self.assertEqual( [ 'tasks:subject' ]                 , pa.include )
+        self.assertEqual( [ 'wiki:content' , 'epics:color' ]  , pa.exclude )
 
+    
+    
+    @mock.activate
+    def test_metrics_file(self):
+        """Client metrics are dumped at the end of the run if requested."""
+        
+        TST_URL = 'https://a.taiga.instance/API/V9/'
+        projects , expected = Utilities.mock_full_projects( TST_URL )
+        
+        with tempfile.TemporaryDirectory() as folder:
+            metrics_file = os.path.join( folder , 'metrics.json' )
+            args = [ '--url'          , TST_URL
+                   , '--api-token'    , 'a_token'
+                   , '--category'     , 'tasks'
+                   , '--no-archive'
+                   , '--json-line'
+                   , '--output'       , os.path.join( folder , 'items.json' )
+                   , '--metrics-file' , metrics_file
+                   , '01'
+                   ]
+            TaigaCommand( *args ).run()
+            
+            with open( metrics_file ) as f:
+                metrics = json.load( f )
+        
+        self.assertEqual(  3 , metrics['tasks']['requests'] )
+        self.assertEqual(  3 , metrics['tasks']['pages']    )
+        self.assertEqual( 81 , metrics['tasks']['items']    )
+        self.assertEqual( 81 , metrics['tasks']['emitted']  )
+        self.assertEqual(  3 , metrics['tasks']['latency']['count'] )
+    
+    
+    @mock.activate
+    def test_profile(self):
+        """CPU and memory profiles are written beside the output if requested."""
+        
+        TST_URL = 'https://a.taiga.instance/API/V9/'
+        projects , expected = Utilities.mock_full_projects( TST_URL )
+        
+        with tempfile.TemporaryDirectory() as folder:
+            output = os.path.join( folder , 'items.json' )
+            args = [ '--url'       , TST_URL
+                   , '--api-token' , 'a_token'
+                   , '--category'  , 'tasks'
+                   , '--no-archive'
+                   , '--output'    , output
+                   , '--profile'
+                   , '01'
+                   ]
+            TaigaCommand( *args ).run()
+            
+            for suffix in ( '.prof' , '.memory.txt' , '.profile.txt' ):
+                self.assertTrue( os.path.isfile( output + suffix ) )
+            with open( output + '.profile.txt' ) as f:
+                summary = f.read()
+            
+            # the thread prefetching wouldn't be profiled:
+            with self.assertRaises( UsageError ):
+                TaigaCommand( *args[ :-1 ] , '--prefetch' , '2' , '01' )
+        
+        for phase , markers in TaigaProfiler.PHASES:
+            self.assertIn( phase , summary )
+        self.assertIn( 'Peak traced memory' , summary )
+    
+    
+    @mock.activate
+    def test_raw(self):
+        """Raw runs write the items as served, within the same envelopes as usual runs."""
+        
+        TST_URL = 'https://a.taiga.instance/API/V9/'
+        projects , expected = Utilities.mock_full_projects( TST_URL )
+        
+        with tempfile.TemporaryDirectory() as folder:
+            lines = {}
+            for mode in ( '--json-line' , '--raw' ):
+                output = os.path.join( folder , mode.strip('-') + '.json' )
+                args = [ '--url'       , TST_URL
+                       , '--api-token' , 'a_token'
+                       , '--category'  , 'tasks'
+                       , '--no-archive'
+                       , mode
+                       , '--output'    , output
+                       , '01'
+                       ]
+                TaigaCommand( *args ).run()
+                with open( output ) as f:
+                    lines[ mode ] = [ json.loads( line ) for line in f ]
+        
+        self.assertEqual( 81 , len(lines['--raw']) )
+        for usual , raw in zip( lines['--json-line'] , lines['--raw'] ):
+            self.assertLessEqual( usual.pop( 'timestamp' ) , raw.pop( 'timestamp' ) )
+            self.assertEqual( usual , raw )
 
 
 
@@ -758,14 +878,122 @@ class TestTaigaClientAgainstMockServer(unittest.TestCase):
             bah = tc.get_lst_data_from_api( 'stats' , 'id' )
     
     
+    @mock.activate
+    def test_token_refresh(self):
+        '''An expired token is refreshed once and the rejected request retried.'''
+        
+        # test config:
+        TST_QUERY   = 'a_query'
+        TST_EXPIRED = '{ "_error_message": "Invalid token", "_error_type": "taiga.base.exceptions.NotAuthenticated" }'
+        
+        # test setup:
+        mock.register_uri( mock.POST
+                         , self.API_URL + 'auth'
+                         , responses=[ mock.Response( body='{ "auth_token":"a_token" }'       , status=self.http_code_nr( 'OK' ) )
+                                     , mock.Response( body='{ "auth_token":"a_fresh_token" }' , status=self.http_code_nr( 'OK' ) )
+                                     ]
+                         )
+        mock.register_uri( mock.GET
+                         , self.API_URL + TST_QUERY
+                         , responses=[ mock.Response( body=TST_EXPIRED     , status=self.http_code_nr( 'Unauthorized' ) )
+                                     , mock.Response( body='[ {"id": 1} ]' , status=self.http_code_nr( 'OK'           ) )
+                                     ]
+                         )
+        tc = TaigaClient( url=self.API_URL , user='a_user' , pswd='a_pswd' )
+        tc.login()
+        
+        # AC1: the request succeeds transparently:
+        record = tc.rq( TST_QUERY )
+        self.assertEqual( 1 , len(record) )
+        
+        # AC2: with a fresh token:
+        self.assertEqual( 'a_fresh_token' , tc.get_token() )
+        self.assertEqual( 'Bearer a_fresh_token' , mock.last_request().headers['Authorization'] )
+    
+    
+    @mock.activate
+    def test_token_refresh_then_throttling(self):
+        '''A request retried with a fresh token keeps it when retried again for throttling.'''
+        
+        # test config:
+        TST_QUERY     = 'a_query'
+        TST_EXPIRED   = '{ "_error_message": "Invalid token", "_error_type": "taiga.base.exceptions.NotAuthenticated" }'
+        TST_THROTTLED = '{ "_error_message": "Request was throttled.Expected available in 2 seconds.", "_error_type": "taiga.base.exceptions.Throttled" }'
+        
+        # test setup:
+        logins = []
+        def login( request , uri , headers ):
+            logins.append( 'token_{}'.format( len(logins) + 1 ) )
+            return ( 200 , headers , '{{ "auth_token": "{}" }}'.format( logins[-1] ) )
+        mock.register_uri( mock.POST , self.API_URL + 'auth' , body=login )
+        mock.register_uri( mock.GET
+                         , self.API_URL + TST_QUERY
+                         , responses=[ mock.Response( body=TST_EXPIRED     , status=self.http_code_nr( 'Unauthorized'      ) )
+                                     , mock.Response( body=TST_THROTTLED   , status=self.http_code_nr( 'Too Many Requests' ) )
+                                     , mock.Response( body='[ {"id": 1} ]' , status=self.http_code_nr( 'OK'                ) )
+                                     ]
+                         )
+        clock = SimClock()
+        tc = TaigaClient( url=self.API_URL , user='a_user' , pswd='a_pswd' , clock=clock , sleeper=clock.sleep )
+        tc.login()
+        
+        # AC1: the request succeeds, with the fresh token after waiting:
+        self.assertEqual( [ {"id": 1} ] , tc.rq( TST_QUERY ) )
+        self.assertEqual( 2 , clock.slept )
+        self.assertEqual( [ 'Bearer token_1' , 'Bearer token_2' , 'Bearer token_2' ]
+                        , [ r.headers['Authorization'] for r in mock.latest_requests() if 'GET' == r.method ] )
+    
+    
+    @mock.activate
+    def test_token_cache(self):
+        '''Token cached by a client is reused by the next ones.'''
+        
+        # test setup:
+        mock.register_uri( mock.POST
+                         , self.API_URL + 'auth'
+                         , responses=[ mock.Response( body='{ "auth_token":"a_token" }' , status=self.http_code_nr( 'OK'           ) )
+                                     , mock.Response( body='{ "etc":"etc" }'            , status=self.http_code_nr( 'Unauthorized' ) )
+                                     ]
+                         )
+        with tempfile.TemporaryDirectory() as folder:
+            cache = TaigaTokenCache( os.path.join( folder , 'tokens.json' ) )
+            
+            # AC1: the first client logs in and caches its token in a private file:
+            tc1 = TaigaClient( url=self.API_URL , user='a_user' , pswd='a_pswd' , token_cache=cache )
+            tc1.login()
+            self.assertEqual( 'a_token' , cache.get( self.API_URL , 'a_user' ) )
+            self.assertEqual( 0o600 , os.stat( cache.path ).st_mode & 0o777 )
+            self.assertEqual( [ 'tokens.json' ] , os.listdir( folder ) )
+            
+            # AC2: the next one reuses it without asking the API (which would deny it):
+            tc2 = TaigaClient( url=self.API_URL , user='a_user' , pswd='a_pswd' , token_cache=cache )
+            tc2.login()
+            self.assertEqual( 'a_token' , tc2.get_token() )
+            
+            # AC3: tokens are kept by instance and user:
+            self.assertEqual( None , cache.get( self.API_URL , 'another_user' ) )
+            self.assertEqual( None , cache.get( 'https://another.instance/' , 'a_user' ) )
+            
+            # AC4: expired tokens are ignored:
+            claims  = base64.urlsafe_b64encode( b'{"exp": 1}' ).decode().rstrip( '=' )
+            cache.put( self.API_URL , 'a_user' , 'header.{}.signature'.format( claims ) )
+            self.assertEqual( None , cache.get( self.API_URL , 'a_user' ) )
+            
+            # AC5: files planted where temporary ones could be expected aren't written through:
+            victim = os.path.join( folder , 'victim' )
+            with open( victim , 'w' ) as f:
+                f.write( 'untouched' )
+            os.symlink( victim , '{}.{}.tmp'.format( cache.path , os.getpid() ) )
+            cache.put( self.API_URL , 'a_user' , 'a_token' )
+            with open( victim ) as f:
+                self.assertEqual( 'untouched' , f.read() )
+            self.assertEqual( 'a_token' , cache.get( self.API_URL , 'a_user' ) )
+    
+    
     @mock.activate
     def test_throttling(self):
         '''Taiga blocks reporting throttling.'''
         
-        def gl_now():
-            ''' gets and formats current time'''
-            return datetime_utcnow().replace(microsecond=0).timestamp()
-        
         # test config:
         TST_QUERY = 'a_query'
         TST_DELAY = 2
@@ -784,16 +1012,261 @@ class TestTaigaClientAgainstMockServer(unittest.TestCase):
                                                     )
                                      ]
                          )
-        tc = self.TST_DTC
+        clock = SimClock()
+        tc = TaigaClient( url=self.API_URL , token=self.API_TKN , clock=clock , sleeper=clock.sleep )
         
         # test:
-        started = gl_now()
+        started = clock()
         tc.rq( TST_QUERY )
-        finished = gl_now()
+        finished = clock()
         
         # check:
         elapsed = finished - started
         self.assertLessEqual( TST_DELAY , elapsed )
+        self.assertEqual( TST_DELAY , clock.slept )
+    
+    
+    def test_throttling_simulation(self):
+        '''Hours of throttled crawling are simulated in no time.'''
+        
+        # AC1: a plain client waits for whatever each throttled window has left, and its retry gets through:
+        figures = simulate( 350 , limit=100 , window=60 , latency=0.1 )
+        self.assertEqual( 3 , figures['throttled'] )
+        self.assertEqual( 0 , figures['failed'] )
+        self.assertLessEqual( 3 * 60 , figures['seconds'] )
+        self.assertLess( figures['seconds'] , 3 * 60 + 50 * 0.1 + 3 * 2 )        # + last window's requests + rounding.
+        
+        # AC2: a token rate within the limit avoids throttling:
+        self.assertEqual( 0 , simulate( 350 , rate=90 / 60 , limit=100 , window=60 )['throttled'] )
+        
+        # AC3: pooled tokens multiply throughput:
+        single = simulate( 10000 , tokens=1 , limit=100 , window=60 )
+        pooled = simulate( 10000 , tokens=4 , limit=100 , window=60 )
+        self.assertLess( 3.5 , pooled['throughput'] / single['throughput'] )
+        
+        # AC4: pools never fail requests a single token finishes (retries landing on throttled tokens included):
+        self.assertEqual( 0 , single['failed'] )
+        self.assertEqual( 0 , pooled['failed'] )
+        self.assertLess( pooled['seconds'] , single['seconds'] )
+    
+    
+    @mock.activate
+    def test_token_pool(self):
+        '''A pooled client doesn't wait for a throttled token while others are available.'''
+        
+        # test config:
+        TST_QUERY = 'a_query'
+        TST_DELAY = 60
+        TST_ERROR_MSG = '{' + ''' "_error_message": "Request was throttled.Expected available in {} seconds."
+                                , "_error_type"   : "taiga.base.exceptions.Throttled"
+                              '''.format( TST_DELAY ) + '}'
+        
+        # test setup:
+        mock.register_uri( mock.GET
+                         , self.API_URL + TST_QUERY
+                         , responses=[ mock.Response( status=self.http_code_nr( 'Too Many Requests' ) , body=TST_ERROR_MSG )
+                                     , mock.Response( status=self.http_code_nr( 'OK' ) , body='[ {"id": 1} ]' )
+                                     ]
+                         )
+        tc = TaigaClient( url=self.API_URL , token=[ 'token_1' , 'token_2' ] )
+        
+        # AC1: the request is retried at once with the other token:
+        started = time.monotonic()
+        record  = tc.rq( TST_QUERY )
+        self.assertGreater( TST_DELAY , time.monotonic() - started )
+        self.assertEqual( 1 , len(record) )
+        self.assertEqual( 'Bearer token_2' , mock.last_request().headers['Authorization'] )
+        
+        # AC2: when every token is throttled, the retries wait for the first one available again:
+        mock.register_uri( mock.GET
+                         , self.API_URL + TST_QUERY
+                         , responses=[ mock.Response( status=self.http_code_nr( 'Too Many Requests' ) , body=TST_ERROR_MSG ) ] * 2
+                                   + [ mock.Response( status=self.http_code_nr( 'OK' ) , body='[ {"id": 1} ]' ) ]
+                         )
+        clock = SimClock()
+        tc = TaigaClient( url=self.API_URL , token=[ 'token_1' , 'token_2' ] , clock=clock , sleeper=clock.sleep )
+        self.assertEqual( [ {"id": 1} ] , tc.rq( TST_QUERY ) )
+        self.assertEqual( TST_DELAY , clock.slept )
+        self.assertEqual( 'Bearer token_1' , mock.last_request().headers['Authorization'] )
+        
+        # AC3: requests are spread across the tokens:
+        pool = TaigaTokenPool( [ 'token_1' , 'token_2' , 'token_3' ] )
+        self.assertEqual( [ 'token_1' , 'token_2' , 'token_3' , 'token_1' ] , [ pool.acquire() for i in range(4) ] )
+        
+        # AC4: throttled tokens are skipped:
+        pool.throttled( 'token_2' , TST_DELAY )
+        self.assertEqual( [ 'token_3' , 'token_1' , 'token_3' ] , [ pool.acquire() for i in range(3) ] )
+    
+    
+    @mock.activate
+    def test_single_flight(self):
+        '''Concurrent identical requests of single_flight clients share a single one.'''
+        
+        # test config:
+        TST_QUERY   = 'projects/id/stats'
+        TST_CALLERS = 5
+        
+        # test setup:
+        served = []
+        def slow_stats( request , uri , headers ):
+            served.append( uri )
+            time.sleep( 0.3 )
+            return ( 200 , headers , '{ "total_points": 1 }' )
+        mock.register_uri( mock.GET , self.API_URL + TST_QUERY , body=slow_stats )
+        
+        metrics = TaigaClientMetrics()
+        fired   = []
+        results = []
+        def caller( **settings ):
+            tc = TaigaClient( url=self.API_URL , token=self.API_TKN , metrics=metrics , **settings )
+            tc.add_hook( 'headers' , lambda url , timing: fired.append( timing['status'] ) )
+            results.append( tc.rq( TST_QUERY ) )
+        def concurrently( *settings ):
+            threads = [ threading.Thread( target=caller , kwargs=kwargs ) for kwargs in settings ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        
+        concurrently( *[ { 'single_flight': True } ] * TST_CALLERS )
+        
+        # AC1: all callers got the result from a single request:
+        self.assertEqual( TST_CALLERS , len(results) )
+        self.assertEqual( 1 , len(served) )
+        for result in results:
+            self.assertEqual( { 'total_points': 1 } , result )
+        
+        # AC2: the callers that waited are counted and fire their hooks too:
+        self.assertEqual( 1 , metrics.snapshot()['stats']['requests'] )
+        self.assertEqual( TST_CALLERS - 1 , metrics.snapshot()['stats']['shared'] )
+        self.assertEqual( [ 200 ] * TST_CALLERS , fired )
+        
+        # AC3: landed requests aren't reused:
+        self.TST_DTC.rq( TST_QUERY )
+        self.assertEqual( 2 , len(served) )
+        
+        # AC4: clients whose results would differ don't share (nor clients without single_flight, the default):
+        concurrently( { 'single_flight': True } , { 'single_flight': True , 'decoder': lambda content: json.loads( content ) } , { 'single_flight': True , 'records': True } , {} )
+        self.assertEqual( 2 + 4 , len(served) )
+    
+    
+    @mock.activate
+    def test_circuit_breaker(self):
+        '''Clients fail fast while their Taiga instance is down.'''
+        
+        # test config:
+        TST_URL       = 'https://a.broken.instance/API/V9/'
+        TST_QUERY     = 'projects/id'
+        TST_THRESHOLD = 2
+        TST_COOL_DOWN = 30
+        
+        # test setup:
+        served = []
+        def down( request , uri , headers ):
+            served.append( uri )
+            return ( 503 , headers , '{ "etc":"etc" }' )
+        mock.register_uri( mock.GET , TST_URL + TST_QUERY , body=down )
+        clock = SimClock()
+        tc = TaigaClient( url=TST_URL , token=self.API_TKN , failure_threshold=TST_THRESHOLD , cool_down=TST_COOL_DOWN
+                        , clock=clock
+                        )
+        
+        # AC1: failures reach the server until the threshold:
+        for attempt in range( TST_THRESHOLD ):
+            self.assertEqual( 503 , tc.basic_rq( TST_QUERY ).status_code )
+        self.assertEqual( 'open' , tc.stats()['circuit_breaker']['state'] )
+        
+        # AC2: then requests fail fast, for any client of the instance:
+        with self.assertRaises( Circuit_Open ):
+            tc.basic_rq( TST_QUERY )
+        with self.assertRaises( Circuit_Open ):
+            TaigaClient( url=TST_URL , token='another_token' ).rq( TST_QUERY )
+        self.assertEqual( TST_THRESHOLD , len(served) )
+        
+        # AC3: after the cool down a probe goes through and closes the circuit if successful:
+        clock.sleep( TST_COOL_DOWN - 1 )
+        with self.assertRaises( Circuit_Open ):
+            tc.basic_rq( TST_QUERY )
+        clock.sleep( 1 )
+        mock.register_uri( mock.GET , TST_URL + TST_QUERY , body='{ "id": 1 }' )
+        self.assertEqual( { 'id': 1 } , tc.rq( TST_QUERY ) )
+        self.assertEqual( 'closed' , tc.stats()['circuit_breaker']['state'] )
+    
+    
+    def test_circuit_breaker_probe_errors(self):
+        '''Probes failing with any error open the circuit again, instead of leaving it half open.'''
+        
+        # test setup:
+        TST_URL = 'https://a.flaky.instance/API/V9/'
+        class Transport():
+            '''Fails as told, or replies a 503.'''
+            error = None
+            def get( self , url , **kwargs ):
+                if self.error:
+                    raise self.error
+                return TaigaCassetteResponse( 503 , {} , b'{}' , 'get' , url , kwargs )
+        transport = Transport()
+        clock = SimClock()
+        tc = TaigaClient( url=TST_URL , token=self.API_TKN , failure_threshold=1 , cool_down=1 , clock=clock , transport=transport )
+        self.assertEqual( 503 , tc.basic_rq( 'projects/id' ).status_code )
+        
+        # AC1: a probe failing with any error opens the circuit again:
+        for error in ( requests.exceptions.ChunkedEncodingError( 'broken body' ) , ValueError( 'broken transport' ) ):
+            clock.sleep( 1 )
+            transport.error = error
+            with self.assertRaises( type(error) ):
+                tc.basic_rq( 'projects/id' )
+            self.assertEqual( 'open' , tc.stats()['circuit_breaker']['state'] )
+        
+        # AC2: so that later probes go through:
+        clock.sleep( 100 )
+        transport.error = None
+        self.assertEqual( 503 , tc.basic_rq( 'projects/id' ).status_code )
+        
+        # AC3: failing hooks don't take the probe:
+        def failing( url , timing ):
+            raise RuntimeError( 'broken hook' )
+        tc.add_hook( 'request' , failing )
+        clock.sleep( 1 )
+        with self.assertRaises( RuntimeError ):
+            tc.basic_rq( 'projects/id' )
+        tc.remove_hook( 'request' , failing )
+        self.assertEqual( 503 , tc.basic_rq( 'projects/id' ).status_code )
+        
+        # AC4: nor those running between the headers and the body:
+        tc.add_hook( 'headers' , failing )
+        clock.sleep( 1 )
+        with self.assertRaises( RuntimeError ):
+            tc.basic_rq( 'projects/id' )
+        self.assertEqual( 'open' , tc.stats()['circuit_breaker']['state'] )
+        tc.remove_hook( 'headers' , failing )
+        clock.sleep( 1 )
+        self.assertEqual( 503 , tc.basic_rq( 'projects/id' ).status_code )
+    
+    
+    def test_headers_hook(self):
+        '''The headers hook runs before the body of the response is read.'''
+        
+        # test setup:
+        events = []
+        class Response( TaigaCassetteResponse ):
+            '''Tells when its body is read.'''
+            @property
+            def content(self):
+                events.append( 'body' )
+                return b'{ "id": 1 }'
+            @content.setter
+            def content(self, value):
+                pass
+        class Transport():
+            def get( self , url , **kwargs ):
+                return Response( 200 , {} , None , 'get' , url , kwargs )
+        tc = TaigaClient( url='https://a.streaming.instance/API/V9/' , token=self.API_TKN , transport=Transport() )
+        tc.add_hook( 'headers' , lambda url , timing: events.append( 'headers' ) )
+        
+        # AC1: headers first:
+        self.assertEqual( { 'id': 1 } , tc.rq( 'projects/1' ) )
+        self.assertEqual( [ 'headers' , 'body' ] , events[ :2 ] )
     
     
     @mock.activate
@@ -829,6 +1302,142 @@ class TestTaigaClientAgainstMockServer(unittest.TestCase):
         self.assertGreaterEqual( TST_AVAILABLE * TST_PER_PAGE , len(record) )           
     
     
+    @mock.activate
+    def test_metrics(self):
+        '''Clients count requests, pages, items and bytes by endpoint category.'''
+        
+        # test setup:
+        self.mock_pages( 'pj01_tasks' , self.API_URL + 'tasks?project=01' , 3 )
+        mock.register_uri( mock.GET , self.API_URL + 'projects/01/stats' , body='{ "total_points": 1 }' )
+        tc = TaigaClient( url=self.API_URL , token=self.API_TKN )
+        
+        tc.rq( 'tasks?project=01' )
+        tc.rq( 'projects/01/stats' )
+        metrics = tc.stats()['metrics']
+        
+        # AC1: counters by category:
+        self.assertEqual(  3 , metrics['tasks']['requests'] )
+        self.assertEqual(  3 , metrics['tasks']['pages']    )
+        self.assertEqual( 81 , metrics['tasks']['items']    )
+        self.assertLess(   0 , metrics['tasks']['bytes']    )
+        self.assertEqual(  0 , metrics['tasks']['throttled'] )
+        self.assertEqual(  1 , metrics['stats']['requests'] )
+        
+        # AC2: latency histograms:
+        self.assertEqual( 3 , metrics['tasks']['latency']['count'] )
+        self.assertEqual( 3 , metrics['tasks']['latency']['buckets']['+Inf'] )
+        
+        # AC3: endpoint categories:
+        for url , category in ( ( 'projects/1'                , 'basics'       )
+                              , ( 'projects/1/issues_stats'   , 'issues_stats' )
+                              , ( 'wiki?project=1&page=2'     , 'wiki'         )
+                              , ( 'auth'                      , 'auth'         )
+                              ):
+            self.assertEqual( category , tc.endpoint_category( self.API_URL + url ) )
+    
+    
+    @mock.activate
+    def test_hooks(self):
+        '''Hooks are called along the lifecycle of requests.'''
+        
+        # test setup:
+        self.mock_pages( 'pj01_tasks' , self.API_URL + 'tasks?project=01' , 3 )
+        mock.register_uri( mock.GET
+                         , self.API_URL + 'a_query'
+                         , responses=[ mock.Response( status=self.http_code_nr( 'Too Many Requests' )
+                                                    , body='{ "_error_message": "Request was throttled.Expected available in 1 seconds." }'
+                                                    )
+                                     , mock.Response( status=self.http_code_nr( 'OK' ) , body='[]' )
+                                     ]
+                         )
+        fired = []
+        def recorder( event ):
+            return lambda url , timing: fired.append( ( event , url , timing ) )
+        tc = TaigaClient( url=self.API_URL , token=self.API_TKN )
+        for event in TaigaClient.HOOK_EVENTS:
+            tc.add_hook( event , recorder( event ) )
+        
+        # AC1: request, headers and decoded for each page:
+        tc.rq( 'tasks?project=01' )
+        self.assertEqual( [ 'request' , 'headers' , 'decoded' ] * 3 , [ f[0] for f in fired ] )
+        self.assertEqual( self.API_URL + 'tasks?project=01' , fired[0][1] )
+        self.assertEqual( 200 , fired[1][2]['status'] )
+        self.assertEqual(  30 , fired[2][2]['items']  )
+        self.assertLessEqual( 0 , fired[2][2]['decode'] )
+        
+        # AC2: throttle and retry:
+        del fired[:]
+        tc.rq( 'a_query' )
+        self.assertEqual( [ 'request' , 'headers' , 'throttle' , 'retry' , 'request' , 'headers' , 'decoded' ] , [ f[0] for f in fired ] )
+        self.assertEqual( 1 , fired[2][2]['sleep'] )
+        
+        # AC3: unknown events are rejected:
+        with self.assertRaises( UsageError ):
+            tc.add_hook( 'unknown' , print )
+    
+    
+    @mock.activate
+    def test_progress(self):
+        '''Progress of paginated requests is reported at most once per interval.'''
+        
+        # test setup:
+        self.mock_pages( 'pj01_tasks' , self.API_URL + 'tasks?project=01' , 3 )
+        reports = []
+        
+        # AC1: without limit, every page is reported:
+        tc = TaigaClient( url=self.API_URL , token=self.API_TKN , progress=TaigaProgress( reports.append , interval=0 ) )
+        tc.rq( 'tasks?project=01' )
+        self.assertEqual( [ 30 , 60 , 81 ] , [ r['done'] for r in reports ] )
+        self.assertEqual( 81 , reports[-1]['total'] )
+        self.assertEqual(  0 , reports[-1]['eta']   )
+        
+        # AC2: otherwise, just the first and the last ones:
+        del reports[:]
+        tc = TaigaClient( url=self.API_URL , token=self.API_TKN , progress=TaigaProgress( reports.append , interval=3600 ) )
+        tc.rq( 'tasks?project=01' )
+        self.assertEqual( [ 30 , 81 ] , [ r['done'] for r in reports ] )
+        
+        # AC3: totals account for page limits:
+        del reports[:]
+        tc.rq( 'tasks?project=01' , 2 )
+        self.assertEqual( 60 , reports[-1]['total'] )
+    
+    
+    def test_openmetrics(self):
+        '''Metrics are exposed in OpenMetrics format, in a file and through a local endpoint.'''
+        
+        # test setup:
+        metrics = TaigaClientMetrics()
+        metrics.count( 'tasks' , requests=3 , emitted=81 )
+        metrics.latency( 'tasks' , 0.2 )
+        metrics.http_error( 'stats' , 403 )
+        exposition = TaigaOpenMetrics( metrics )
+        
+        # AC1: rendering:
+        text = exposition.render()
+        self.assertIn( 'taiga_client_requests_total{category="tasks"} 3'                     , text )
+        self.assertIn( 'taiga_client_items_emitted_total{category="tasks"} 81'               , text )
+        self.assertIn( 'taiga_client_in_flight_requests{category="tasks"} 0'                 , text )
+        self.assertIn( 'taiga_client_http_errors_total{category="stats",code="403"} 1'       , text )
+        self.assertIn( 'taiga_client_request_latency_seconds_bucket{category="tasks",le="0.25"} 1' , text )
+        self.assertTrue( text.endswith( '# EOF\n' ) )
+        
+        # AC2: file and endpoint:
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join( folder , 'taiga.prom' )
+            exposition.start_file( path , interval=60 )
+            host , port = exposition.start_http( 0 )
+            try:
+                with open( path ) as f:
+                    self.assertEqual( text , f.read() )
+                self.assertEqual( [ 'taiga.prom' ] , os.listdir( folder ) )
+                with urllib.request.urlopen( 'http://{}:{}/metrics'.format( host , port ) ) as rs:
+                    self.assertEqual( text , rs.read().decode( 'utf-8' ) )
+                    self.assertIn( 'openmetrics-text' , rs.headers['Content-Type'] )
+            finally:
+                exposition.stop()
+    
+    
     @mock.activate
     def test_pj_stats(self):
         '''proj_stats retrieves the expected elements.
@@ -967,6 +1576,529 @@ class TestTaigaClientAgainstMockServer(unittest.TestCase):
 
 
 
+class TestTaigaClientAgainstLocalServer(unittest.TestCase):
+    """Load testing basics.
+
+    Usage..: just run. Neither network nor httpretty are needed.
+
+    Design.: + Taiga API client tested against a local stand-in server (see taiga_standin.py).
+               + it serves the same recorded responses as the mock server, but through real sockets.
+             + Each test starts its own stand-in, so that it can inject its own faults.
+    """
+    
+    def standin(self, **faults ):
+        '''Returns a started stand-in and its url. It will be stopped on cleanup.'''
+        server = TaigaStandIn.from_fixtures( **faults )
+        url = server.start()
+        self.addCleanup( server.stop )
+        return server , url
+    
+    
+    def test_rq(self):
+        '''Paginated and single responses are served as recorded.'''
+        
+        server , url = self.standin()
+        tc = TaigaClient( url=url , token='a_token' )
+        
+        self.assertEqual( 81 , len(tc.rq( 'tasks?project=01' ))      )
+        self.assertEqual( 60 , len(tc.rq( 'tasks?project=01' , 2 ))  )
+        self.assertEqual( 37 , len(tc.rq( 'epics?project=353209' ))  )
+        self.assertEqual(  0 , len(tc.rq( 'wiki?project=02' ))       )
+        self.assertEqual( 11 , len(tc.rq( 'projects/01/stats' ))     )
+        self.assertEqual( 3 + 2 + 2 + 1 + 1 , server.served )
+        
+        with self.assertRaises( Unexpected_HTTPcode ):
+            tc.rq( 'projects/99' )
+    
+    
+    def test_proj(self):
+        '''A whole project is served.'''
+        
+        server , url = self.standin()
+        data = TaigaClient( url=url , token='a_token' ).proj( '02' )
+        
+        self.assertEqual(  7 , len(data['tasks'])       )
+        self.assertEqual( 38 , len(data['userstories']) )
+        self.assertEqual(  0 , len(data['wiki'])        )
+    
+    
+    def test_login(self):
+        '''Login works and other tokens are rejected.'''
+        
+        server , url = self.standin( tokens=[ 'a_standin_token' ] )
+        
+        with self.assertRaises( Unexpected_HTTPcode ):
+            TaigaClient( url=url , token='wrong_token' ).rq( 'projects/01' )
+        tc = TaigaClient( url=url , user='a_user' , pswd='a_pswd' )
+        tc.login()
+        self.assertEqual( 'a_standin_token' , tc.get_token() )
+        self.assertEqual( 81 , len(tc.rq( 'tasks?project=01' )) )
+    
+    
+    def test_throttling(self):
+        '''The client waits as told when throttled.'''
+        
+        server , url = self.standin( throttle=( 2 , 1 ) )
+        tc = TaigaClient( url=url , token='a_token' )
+        
+        self.assertEqual( 81 , len(tc.rq( 'tasks?project=01' )) )
+        self.assertEqual( { 200: 3 , 429: 1 } , server.replies )
+        self.assertEqual( 1 , tc.stats()['metrics']['tasks']['throttled'] )
+    
+    
+    def test_faults(self):
+        '''Injected errors and latency reach the client.'''
+        
+        server , url = self.standin( error_rate=1 , error_code=502 , latency=0.05 )
+        tc = TaigaClient( url=url , token='a_token' )
+        
+        started = time.monotonic()
+        with self.assertRaises( Unexpected_HTTPcode ):
+            tc.rq( 'projects/01/stats' )
+        self.assertLessEqual( 0.05 , time.monotonic() - started )
+        self.assertEqual( { 502: 1 } , server.replies )
+    
+    
+    def test_synthetic_project(self):
+        '''Synthetic projects are reproducible, consistent and served as recorded ones.'''
+        
+        # test setup:
+        SIZES = { 'tasks': 95 , 'userstories': 12 , 'wiki': 3 , 'large_wiki': 1 , 'wiki_size': 10000 }
+        data = TaigaDataGen( seed=7 ).project( 5 , **SIZES )
+        
+        # AC1: same seed, same data:
+        self.assertEqual( data , TaigaDataGen( seed=7 ).project( 5 , **SIZES ) )
+        
+        # AC2: consistent items:
+        stories = { story['id'] for story in data['userstories'] }
+        for task in data['tasks']:
+            self.assertLessEqual( task['created_date'] , task['modified_date'] )
+            self.assertTrue( task['user_story'] is None or task['user_story'] in stories )
+        self.assertEqual( 10000 , len(data['wiki'][0]['content']) )
+        
+        # AC3: served:
+        server = TaigaStandIn( { '5': data } )
+        tc = TaigaClient( url=server.start() , token='a_token' )
+        self.addCleanup( server.stop )
+        self.assertEqual( 95 , len(tc.rq( 'tasks?project=5' )) )
+        self.assertEqual( 4  , server.served )
+    
+    
+    def test_prefetch(self):
+        '''Pages are fetched ahead of the consumer, but no more than requested.'''
+        
+        # test setup:
+        data   = TaigaDataGen( seed=3 ).project( 6 , tasks=300 )
+        server = TaigaStandIn( { '6': data } , per_page=10 )
+        url    = server.start()
+        self.addCleanup( server.stop )
+        
+        # AC1: same items:
+        expected = list( Taiga( '6' , url=url , api_token='a_token' ).fetch( category='tasks' ) )
+        items    = Taiga( '6' , url=url , api_token='a_token' , prefetch=3 ).fetch( category='tasks' )
+        first    = next( items )
+        self.assertEqual( [ item['data'] for item in expected ] , [ first['data'] ] + [ item['data'] for item in items ] )
+        
+        # AC2: backpressure. Besides the page taken by the consumer: 3 queued plus 1 waiting to be:
+        class Counting():
+            '''Sends the requests, counting them. Holds all but the first one until the consumer has it.'''
+            requests = 0
+            taken    = threading.Event()
+            def get(self, url , **kwargs):
+                self.requests += 1
+                if 1 < self.requests:
+                    self.taken.wait()
+                return requests.get( url , **kwargs )
+        class Watched( TaigaPrefetcher ):
+            '''Tells when the producer finds the queue full (and will wait for the consumer).'''
+            waiting = threading.Event()
+            def __put__(self, page , error=None):
+                if self.queue.full():
+                    self.waiting.set()
+                return super().__put__( page , error )
+        transport = Counting()
+        pages = iter( Watched( TaigaClient( url=url , token='a_token' , transport=transport ).pages( 'tasks?project=6' ) , 3 ) )
+        next( pages )
+        transport.taken.set()
+        self.assertTrue( Watched.waiting.wait( 5 ) )
+        self.assertEqual( 1 + 3 + 1 , transport.requests )
+        self.assertEqual( 300 // 10 - 1 , len( list( pages ) ) )
+        self.assertEqual( 300 // 10 , transport.requests )
+        
+        # AC3: errors reach the consumer, after the pages fetched before them:
+        pages = iter( TaigaPrefetcher( iter([ [ 1 ] , [ 2 ] , None ]) , 1 ) )
+        self.assertEqual( [ 1 ] , next( pages ) )
+        self.assertEqual( [ 2 ] , next( pages ) )
+        self.assertIsNone( next( pages ) )
+        
+        def failing():
+            yield [ 1 ]
+            raise ValueError( 'a failure' )
+        pages = iter( TaigaPrefetcher( failing() , 2 ) )
+        self.assertEqual( [ 1 ] , next( pages ) )
+        with self.assertRaises( ValueError ):
+            next( pages )
+        
+        server , url = self.standin( error_rate=1 , error_code=502 )
+        with self.assertRaises( Unexpected_HTTPcode ):
+            list( Taiga( '01' , url=url , api_token='a_token' , prefetch=3 ).fetch( category='tasks' ) )
+        
+        with self.assertRaises( UsageError ):
+            TaigaPrefetcher( iter([]) , 0 )
+    
+    
+    def test_mirror(self):
+        '''Projects are mirrored locally and then synced incrementally.'''
+        
+        # test setup:
+        data   = TaigaDataGen( seed=5 ).project( 8 , tasks=70 , userstories=12 , wiki=2 )
+        server = TaigaStandIn( { '8': data } , per_page=30 )
+        url    = server.start()
+        self.addCleanup( server.stop )
+        mirror = TaigaMirror( ':memory:' , TaigaClient( url=url , token='a_token' ) )
+        self.addCleanup( mirror.close )
+        
+        # AC1: first syncs are full:
+        fetched = mirror.sync( '8' )
+        self.assertEqual( { 'basics': 1 , 'stats': 1 , 'issues_stats': 1 , 'epics': 0 , 'userstories': 12 , 'tasks': 70 , 'wiki': 2 } , fetched )
+        self.assertEqual( data['tasks'] , list( mirror.items( 'tasks' , project='8' ) ) )
+        self.assertEqual( data['stats'] , mirror.item( 'stats' , '8' ) )
+        self.assertEqual( [ '8' ] , list( mirror.projects() ) )
+        
+        # AC2: later ones only get what changed since (and what changed right then):
+        latest = mirror.high_water( 'tasks' , '8' )
+        task   = data['tasks'][3]
+        task.update( subject='Changed' , modified_date='2030-01-01T00:00:00.000Z' )
+        served  = server.served
+        fetched = mirror.sync( '8' , categories=[ 'tasks' ] )
+        self.assertEqual( 1 + sum( t['modified_date'] == latest for t in data['tasks'] ) , fetched['tasks'] )
+        self.assertEqual( 1 , server.served - served )
+        self.assertEqual( 'Changed' , mirror.item( 'tasks' , task['id'] )['subject'] )
+        self.assertEqual( [ task ] , list( mirror.items( 'tasks' , since='2029-12-31' ) ) )
+        
+        # AC3: full syncs notice deletions:
+        del data['tasks'][0]
+        self.assertEqual( 70 , mirror.count( 'tasks' , '8' ) )
+        mirror.sync( '8' , categories=[ 'tasks' ] , full=True )
+        self.assertEqual( 69 , mirror.count( 'tasks' ) )
+        
+        with self.assertRaises( UsageError ):
+            mirror.count( 'no_such_category' )
+    
+    
+    def test_local_stats(self):
+        '''Stats computed from mirrored items match the served ones.'''
+        
+        server , url = self.standin()
+        mirror = TaigaMirror( ':memory:' , TaigaClient( url=url , token='a_token' ) )
+        self.addCleanup( mirror.close )
+        for project in ( '01' , '02' ):
+            mirror.sync( project , categories=[ 'basics' , 'stats' , 'issues_stats' , 'userstories' ] )
+        served = server.served
+        
+        # AC1: same as Taiga's, with no further requests:
+        engine = TaigaStats.from_mirror( mirror , vectorised=False )
+        self.assertEqual( {} , engine.cross_check( { p: mirror.item( 'stats' , p ) for p in engine.projects } ) )
+        self.assertEqual( 41.0 , engine.stats()['02']['closed_points'] )
+        self.assertEqual( served , server.served )
+        
+        # AC1b: mirrors have no issues, thus no issues_stats to check:
+        self.assertEqual( {} , engine.issues_stats() )
+        self.assertEqual( {} , engine.cross_check( served_issues_stats={ p: mirror.item( 'issues_stats' , p ) for p in engine.projects } ) )
+        
+        # AC2: differences are told:
+        wrong = dict( mirror.item( 'stats' , '02' ) , closed_points=40 )
+        self.assertEqual( { 'closed_points': ( 41.0 , 40 ) } , engine.differences( engine.stats()['02'] , wrong ) )
+        
+        # AC3: issues are broken down:
+        issues = [ { 'is_closed': n < 2 , 'status': 10 + n % 2 , 'priority': None , 'severity': 3 , 'type': 4
+                   , 'owner': 5 , 'assigned_to': None } for n in range( 5 ) ]
+        engine.add( 'issues' , { 'issue_statuses': [ { 'id': 10 , 'name': 'New' , 'color': '#fff' } ] } , issues=issues )
+        self.assertEqual( [ 'issues' ] , list( engine.issues_stats() ) )
+        self.assertIn( 'issues' , engine.stats() )                               # columns are rebuilt after adding.
+        stats = engine.issues_stats()['issues']
+        self.assertEqual( ( 5 , 3 , 2 ) , ( stats['total_issues'] , stats['opened_issues'] , stats['closed_issues'] ) )
+        self.assertEqual( { '10': { 'id': 10 , 'name': 'New' , 'color': '#fff' , 'count': 3 } , '11': { 'id': 11 , 'count': 2 } }
+                        , stats['issues_per_status'] )
+        self.assertEqual( {} , stats['issues_per_priority'] )
+        
+        # AC4: vectorised, the same:
+        if taiga_stats.numpy:
+            vectorised = TaigaStats.from_mirror( mirror , vectorised=True )
+            vectorised.add( 'issues' , { 'issue_statuses': [ { 'id': 10 , 'name': 'New' , 'color': '#fff' } ] } , issues=issues )
+            self.assertEqual( engine.stats()        , vectorised.stats()        )
+            self.assertEqual( engine.issues_stats() , vectorised.issues_stats() )
+        else:
+            with self.assertRaises( UsageError ):
+                TaigaStats( vectorised=True )
+    
+    
+    @unittest.skipUnless( taiga_columns.numpy , 'numpy is not installed.' )
+    def test_columns(self):
+        '''Exported columns load back memory-mapped, typed and with nulls marked.'''
+        
+        data = TaigaDataGen( seed=9 ).project( 4 , tasks=50 , userstories=10 )
+        with tempfile.TemporaryDirectory() as folder:
+            self.assertEqual( 50 , TaigaColumns.export( iter( data['tasks'] ) , 'tasks' , folder ) )
+            self.assertEqual( 10 , TaigaColumns.export( data['userstories'] , 'userstories' , folder ) )
+            tasks   = TaigaColumns.load( folder , 'tasks' )
+            stories = TaigaColumns.load( folder , 'userstories' , [ 'id' , 'total_points' , 'finish_date' ] )
+            
+            # AC1: memory mapped, typed:
+            self.assertIsInstance( tasks['id'] , taiga_columns.numpy.memmap )
+            self.assertEqual( 'int64' , str( tasks['modified_date'].dtype ) )
+            self.assertEqual( 'bool'  , str( tasks['is_closed'].dtype ) )
+            self.assertEqual( [ 'finish_date' , 'id' , 'total_points' ] , sorted( stories ) )
+            
+            # AC2: same values:
+            self.assertEqual( [ t['id'] for t in data['tasks'] ] , tasks['id'].tolist() )
+            self.assertEqual( [ timestamp_ms( t['modified_date'] ) for t in data['tasks'] ] , tasks['modified_date'].tolist() )
+            self.assertEqual( [ t['user_story'] or TaigaColumns.MISSING for t in data['tasks'] ] , tasks['user_story'].tolist() )
+            self.assertEqual( [ s['is_closed'] for s in data['userstories'] ] , [ f != TaigaColumns.MISSING for f in stories['finish_date'].tolist() ] )
+            self.assertEqual( 1477040305509 , timestamp_ms( '2016-10-21T08:58:25.509Z' ) )
+        
+        with self.assertRaises( UsageError ):
+            TaigaColumns.export( [] , 'stats' , '.' )
+    
+    
+    @unittest.skipUnless( taiga_columns.numpy , 'numpy is not installed.' )
+    def test_analytics(self):
+        '''Vectorised flow metrics match those computed looping over the items.'''
+        
+        # test setup:
+        generator = TaigaDataGen( seed=4 )
+        stories , tasks = [] , []
+        for project in ( 1 , 2 ):
+            data = generator.project( project , userstories=30 , tasks=90 )
+            for n , story in enumerate( data['userstories'] ):
+                story['milestone'] = project * 10 + n % 3 if n % 4 else None
+            stories.extend( data['userstories'] )
+            tasks.extend( data['tasks'] )
+        with tempfile.TemporaryDirectory() as folder:
+            TaigaColumns.export( stories , 'userstories' , folder )
+            TaigaColumns.export( tasks , 'tasks' , folder )
+            columns = { category: TaigaColumns.load( folder , category ) for category in ( 'userstories' , 'tasks' ) }
+            rows    = { category: [ dict( zip( values , row ) ) for row in zip( *( column.tolist() for column in values.values() ) ) ]
+                        for category , values in columns.items() }
+            
+            analytics = TaigaAnalytics( columns['userstories'] , columns['tasks'] )
+            lead , cycle , burndowns = bench_taiga.looping( rows['userstories'] , rows['tasks'] )
+            
+            # AC1: lead and cycle times:
+            numpy = taiga_columns.numpy
+            self.assertTrue( numpy.allclose( lead  , analytics.lead_times()  , equal_nan=True ) )
+            self.assertTrue( numpy.allclose( cycle , analytics.cycle_times() , equal_nan=True ) )
+            self.assertLess( 0 , numpy.count_nonzero( ~numpy.isnan( analytics.cycle_times() ) ) )
+            
+            # AC2: summaries by project:
+            summary = analytics.per_project( analytics.lead_times() )
+            self.assertEqual( [ 1 , 2 ] , summary['project'].tolist() )
+            for n , project in enumerate( ( 1 , 2 ) ):
+                values = [ l for l , s in zip( lead , stories ) if s['project'] == project and l == l ]
+                self.assertEqual( len(values) , summary['count'][ n ] )
+                self.assertAlmostEqual( numpy.median( values ) , summary['median'][ n ] )
+                self.assertAlmostEqual( numpy.percentile( values , 85 ) , summary['p85'][ n ] )
+            
+            # AC3: burndowns:
+            burndown = analytics.burndown()
+            self.assertEqual( sorted( burndowns ) , burndown['milestone'].tolist() )
+            for n , milestone in enumerate( burndown['milestone'].tolist() ):
+                expected = burndowns[ milestone ]
+                self.assertTrue( numpy.allclose( expected , burndown['remaining'][ n , :len(expected) ] ) )
+        
+        # AC4: the benchmark runs:
+        results = bench_taiga.analytics( [ 20 ] , projects=2 , repeat=1 )
+        self.assertEqual( [ 40 ] , [ r['userstories'] for r in results ] )
+    
+    
+    def test_benchmark(self):
+        '''The benchmark runs every scenario.'''
+        
+        results = bench_taiga.benchmark( [ 40 ] , repeat=1 , isolated=False )
+        
+        self.assertEqual( list( bench_taiga.SCENARIOS ) , [ r['scenario'] for r in results ] )
+        self.assertEqual( [ 40 , 40 + 8 + 0 + 1 + 3 , 40 , 40 , 40 , 40 ] , [ r['items'] for r in results ] )
+        self.assertEqual( [  2 , 2 + 1 + 1 + 1 + 3 , 2 ,  0 ,  2 ,  2 ] , [ r['requests'] for r in results ] )
+        # only item by item scenarios have a first item before the rest:
+        self.assertEqual( [ 'fetch' , 'lines' , 'raw' ] , [ r['scenario'] for r in results if r['time_to_first_item'] is not None ] )
+        for line in bench_taiga.compare( results , results ):
+            self.assertIn( '+0.0%' , line )
+
+
+
+class TestTaigaClientAgainstCassette(unittest.TestCase):
+    """Replay testing.
+
+    Usage..: just run. Neither network nor httpretty are needed.
+
+    Design.: + Taiga API client tested against the recorded responses, replayed from memory by a
+               TaigaCassette (see taiga_cassette.py) plugged in as its transport.
+             + The recordings are read once for the whole TestCase.
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        '''Set up the cassette.'''
+        cls.CASSETTE = TaigaCassette()
+        cls.TST_DTC  = TaigaClient( url=cls.CASSETTE.base_url , token='a_token' , transport=cls.CASSETTE )
+    
+    
+    def test_rq(self):
+        '''Pages are replayed as recorded, whatever the order of the query parameters.'''
+        
+        self.assertEqual( 81 , len(self.TST_DTC.rq( 'tasks?project=01' ))       )
+        self.assertEqual( 38 , len(self.TST_DTC.rq( 'tasks?project=297174' ))   )
+        self.assertEqual( 36 , len(self.TST_DTC.rq( 'wiki?project=361447' ))    )
+        self.assertEqual( self.CASSETTE.key( 'https://h/p?b=2&a=1' ) , self.CASSETTE.key( 'https://h/p?a=1&b=2' ) )
+        
+        with self.assertRaises( Unexpected_HTTPcode ):
+            self.TST_DTC.rq( 'tasks?project=99' )
+    
+    
+    def test_proj(self):
+        '''Whole projects are replayed.'''
+        
+        EXPECTED = { '01': { 'basics': 76 , 'stats': 11 , 'issues_stats': 10 , 'epics': 1 , 'userstories': 29 , 'tasks': 81 , 'wiki': 2 }
+                   , '02': { 'basics': 76 , 'stats': 11 , 'issues_stats': 10 , 'epics': 1 , 'userstories': 38 , 'tasks':  7 , 'wiki': 0 }
+                   }
+        for project , sizes in EXPECTED.items():
+            data = self.TST_DTC.proj( project )
+            self.assertEqual( sizes , { category: len(value) for category , value in data.items() } )
+    
+    
+    def test_login(self):
+        '''Logins are replayed too.'''
+        
+        tc = TaigaClient( url=self.CASSETTE.base_url , user='a_user' , pswd='a_pswd' , transport=self.CASSETTE )
+        tc.login()
+        self.assertEqual( 'a_Mocked_Token' , tc.get_token() )
+    
+    
+    def test_records(self):
+        '''Compact records read and convert back as the items they hold.'''
+        
+        tc = TaigaClient( url=self.CASSETTE.base_url , token='a_token' , transport=self.CASSETTE , records=True )
+        
+        for category , record_class in ( ( 'tasks' , TaigaTask ) , ( 'userstories' , TaigaUserStory )
+                                       , ( 'epics' , TaigaEpic ) , ( 'wiki' , TaigaWikiPage )
+                                       ):
+            items   = self.TST_DTC.rq( '{}?project=01'.format( category ) )
+            records = tc.rq( '{}?project=01'.format( category ) )
+            
+            # AC1: same items:
+            self.assertEqual( items , [ record.to_dict() for record in records ] )
+            
+            # AC2: read like dicts, hot and cold fields alike:
+            record , item = records[-1] , items[-1]
+            self.assertIsInstance( record , record_class )
+            self.assertEqual( item['id']            , record['id']            )
+            self.assertEqual( item['project_extra_info'] , record['project_extra_info'] )
+            self.assertEqual( item.get( 'subject' ) , record.get( 'subject' ) )
+            self.assertNotIn( 'no_such_field' , record )
+            with self.assertRaises( AttributeError ):
+                record.no_such_field = 1
+            
+            # AC3: the backend can tell them:
+            self.assertEqual( category , Taiga.metadata_category( record ) )
+            self.assertEqual( Taiga.metadata_updated_on( item ) , Taiga.metadata_updated_on( record ) )
+        
+        # AC4: dicts are left as dicts:
+        self.assertIsInstance( tc.rq( 'projects/01/stats' ) , dict )
+    
+    
+    def test_flyweight(self):
+        '''Equal nested values are shared across the pages of a crawl, and items look the same.'''
+        
+        flyweight = TaigaFlyweight()
+        tc = TaigaClient( url=self.CASSETTE.base_url , token='a_token' , transport=self.CASSETTE , flyweight=flyweight )
+        
+        # AC1: same items:
+        items = self.TST_DTC.rq( 'tasks?project=01' )
+        tasks = tc.rq( 'tasks?project=01' )
+        self.assertEqual( items , tasks )
+        self.assertEqual( json.dumps( items ) , json.dumps( tasks ) )
+        
+        # AC2: nested values are shared, across pages too:
+        first , last = tasks[0] , tasks[-1]
+        self.assertIs( first['project_extra_info'] , last['project_extra_info'] )
+        seen = {}
+        for task in tasks:
+            owner = task['owner_extra_info']
+            self.assertIs( seen.setdefault( json.dumps( owner ) , owner ) , owner )
+        self.assertLess( len(seen) , len(tasks) )
+        self.assertLess( 0 , flyweight.snapshot()['shared'] )
+        
+        # AC3: types are told apart:
+        self.assertIsNot( flyweight.share( { 'a': 1 } )[0] , flyweight.share( { 'a': True } )[0] )
+        self.assertIs(    flyweight.share( { 'a': [ 1 ] } )[0] , flyweight.share( { 'a': [ 1 ] } )[0] )
+    
+    
+    def test_projection(self):
+        '''Projected items keep the chosen fields and the identifying ones.'''
+        
+        projection = TaigaProjection.from_specs( [ 'tasks:subject, status' ] , [ 'wiki:content,html,id' , 'stats:speed' ] )
+        tc = TaigaClient( url=self.CASSETTE.base_url , token='a_token' , transport=self.CASSETTE , projection=projection )
+        
+        # AC1: included fields (plus the identifying ones):
+        KEPT = { 'id' , 'modified_date' , 'user_story' , 'milestone' , 'subject' , 'status' }
+        for task in tc.rq( 'tasks?project=01' ):
+            self.assertEqual( KEPT , set( task ) )
+        
+        # AC2: excluded fields (but the identifying ones):
+        for page in tc.rq( 'wiki?project=361447' ):
+            self.assertEqual( { 'id' , 'content' } , { 'id' , 'content' , 'html' } & set( page ) )
+        self.assertNotIn( 'speed' , tc.rq( 'projects/01/stats' ) )
+        self.assertEqual( 'wiki' , Taiga.metadata_category( tc.rq( 'wiki?project=361447' )[0] ) )
+        
+        # AC3: untouched categories:
+        self.assertEqual( self.TST_DTC.rq( 'epics?project=01' ) , tc.rq( 'epics?project=01' ) )
+        
+        # AC4: wrong specs:
+        with self.assertRaises( UsageError ):
+            TaigaProjection.from_specs( [ 'tasks' ] )
+        with self.assertRaises( UsageError ):
+            TaigaProjection( include={ 'no_category': [ 'id' ] } )
+    
+    
+    def test_decoders(self):
+        '''Every JSON decoder gets the same items.'''
+        
+        items = self.TST_DTC.rq( 'tasks?project=01' )
+        for name in TaigaClient.DECODERS:
+            tc = TaigaClient( url=self.CASSETTE.base_url , token='a_token' , transport=self.CASSETTE , decoder=name )
+            self.assertEqual( items , tc.rq( 'tasks?project=01' ) )
+        
+        decoded = []
+        def spy( content ):
+            decoded.append( type(content) )
+            return json.loads( content )
+        tc = TaigaClient( url=self.CASSETTE.base_url , token='a_token' , transport=self.CASSETTE , decoder=spy )
+        self.assertEqual( items , tc.rq( 'tasks?project=01' ) )
+        self.assertEqual( [ bytes ] * 3 , decoded )
+        
+        with self.assertRaises( UsageError ):
+            TaigaClient( url=self.CASSETTE.base_url , token='a_token' , decoder='no_such_decoder' )
+    
+    
+    def test_split_items(self):
+        '''Raw pages split into the text of their items.'''
+        
+        pages = list( self.TST_DTC.pages( 'tasks?project=01' , raw=True ) )
+        self.assertEqual( 3 , len(pages) )
+        self.assertIsInstance( pages[0] , str )
+        
+        items = self.TST_DTC.rq( 'tasks?project=01' )
+        split = [ pair for page in pages for pair in TaigaClient.split_items( page ) ]
+        self.assertEqual( items , [ item for text , item in split ] )
+        self.assertEqual( items , [ json.loads( text ) for text , item in split ] )
+        
+        self.assertEqual( [ ( '{"a": [1, {"b": "]"}]}' , { 'a': [ 1 , { 'b': ']' } ] } ) , ( '{}' , {} ) ]
+                        , list( TaigaClient.split_items( ' [ {"a": [1, {"b": "]"}]} ,\n{} ]\n' ) ) )
+        self.assertEqual( [] , list( TaigaClient.split_items( '[]' ) ) )
+        self.assertEqual( [ ( '{"id": 1}' , { 'id': 1 } ) ] , list( TaigaClient.split_items( '{"id": 1}' ) ) )
+
+
+
 class TestsUnderConstruction(unittest.TestCase):
     '''Tests Under Construction.
 